@@ -2,20 +2,51 @@ import streamlit as st
 import pandas as pd
 import datetime
 import os
+import hmac
+import hashlib
 import tempfile
-from PIL import Image
-from io import BytesIO
-import requests
 
 # Import custom modules
-from passport_service import (load_passport_data, validate_phone_number,
-                              clean_phone_number, get_todays_birthdays,
-                              get_future_birthdays, get_expiring_passports)
+from passport_service import (load_passport_data, format_phone_status,
+                              PHONE_VALID, get_todays_birthdays,
+                              get_future_birthdays, get_expiring_passports,
+                              search_passports, find_duplicate_customers,
+                              collapse_duplicate_customers, load_passport_sources,
+                              SOURCE_COLUMN)
 from whatsapp_service import send_whatsapp_message
 from data_visualization import (plot_birthday_calendar,
                                 plot_expiration_distribution,
                                 plot_notification_history)
 from message_templates import get_templates, generate_message, save_template
+from notification_store import get_store, log_notification
+from notification_ledger import get_ledger, event_digests
+from passport_diff import refresh_passport_data
+from dataset_store import get_dataset_store
+from passport_index import get_search_index
+from data_cache import file_content_hash
+from asset_cache import get_asset_cache
+import instrumentation
+
+# Notifications shown per page of the history table
+HISTORY_PAGE_SIZES = [25, 50, 100, 500]
+
+# Remote images, served through the local asset cache
+HEADER_IMAGE_URL = "https://cdn.pixabay.com/photo/2013/07/13/12/18/passport-159592_1280.png"
+BIRTHDAY_IMAGE_URL = "https://pixabay.com/get/ge074a2a90545a21e5cef579dc454ed3b150efcbec38793a434b2e7ace2a96d0ef99c07e11e3868e2e13644897bfb50683ce8cae2763c4aff4c4c7a018aca0f03_1280.jpg"
+
+# Secret (or environment variable) holding the admin token; the admin tools
+# are shown when the page is opened with ?admin=<token>
+ADMIN_TOKEN_SETTING = "PASSPORT_ADMIN_TOKEN"
+
+# Rows per page of the birthday and expiry lists
+LIST_PAGE_SIZES = [10, 25, 50, 100]
+
+# Search index field for each search option
+SEARCH_OPTIONS = {
+    "Name": 'name',
+    "Passport Number": 'passport',
+    "Phone Number": 'phone',
+}
 
 # Set page configuration
 st.set_page_config(page_title="Passport Manager - Sanskruti Travels",
@@ -24,18 +55,47 @@ st.set_page_config(page_title="Passport Manager - Sanskruti Travels",
                    initial_sidebar_state="expanded")
 
 # Initialize session state variables if they don't exist
-if 'passport_data' not in st.session_state:
-    st.session_state.passport_data = None
-if 'notification_history' not in st.session_state:
-    st.session_state.notification_history = []
+# Sessions hold a handle on the shared dataset store instead of a DataFrame
+if 'dataset' not in st.session_state:
+    st.session_state.dataset = None
 if 'selected_template' not in st.session_state:
     st.session_state.selected_template = 'birthday'
 if 'custom_template' not in st.session_state:
     st.session_state.custom_template = ""
 if 'demo_mode' not in st.session_state:
     st.session_state.demo_mode = True
-if 'sent_messages' not in st.session_state:
-    st.session_state.sent_messages = []
+if 'last_refresh' not in st.session_state:
+    st.session_state.last_refresh = None
+
+
+def get_passport_data():
+    """
+    Get the passport data of this session from the shared dataset store
+
+    Returns:
+        pandas.DataFrame: Passport data, or None if nothing is loaded or the
+        dataset was evicted
+    """
+    handle = st.session_state.dataset
+    if handle is None:
+        return None
+    df = handle.get()
+    if df is None:
+        st.session_state.dataset = None
+    return df
+
+
+def set_passport_data(handle):
+    """
+    Point this session at another dataset, releasing the previous one
+
+    Args:
+        handle (DatasetHandle): Handle on the new dataset, or None
+    """
+    previous = st.session_state.dataset
+    if previous is not None and previous is not handle:
+        previous.release()
+    st.session_state.dataset = handle
 
 
 # Function to display header with images
@@ -52,9 +112,17 @@ def display_header():
             try:
                 sample_file = 'passports.xlsx'
                 if os.path.exists(sample_file):
-                    df = load_passport_data(sample_file)
+                    store = get_dataset_store()
+                    handle = store.acquire(file_content_hash(sample_file))
+                    if handle is None:
+                        df = load_passport_data(sample_file)
+                        if df is not None and not df.empty:
+                            get_search_index(df)
+                            handle = store.put(df, label=sample_file)
+                    df = handle.get() if handle is not None else None
                     if df is not None and not df.empty:
-                        st.session_state.passport_data = df
+                        set_passport_data(handle)
+                        st.session_state.last_refresh = None
                         st.success(
                             f"✅ Successfully loaded {len(df)} passport records from sample file!"
                         )
@@ -66,18 +134,14 @@ def display_header():
             except Exception as e:
                 st.error(f"❌ Error loading sample data: {e}")
 
-    # Display travel agency image
-    travel_agency_image_url = "https://cdn.pixabay.com/photo/2013/07/13/12/18/passport-159592_1280.png"
-
-    try:
-        response = requests.get(travel_agency_image_url)
-        image = Image.open(BytesIO(response.content))
+    # Display travel agency image, from the asset cache so the page never
+    # waits for the network; left out until it is downloaded
+    image = get_asset_cache().image(HEADER_IMAGE_URL, width=800)
+    if image is not None:
         st.image(
             image,
             width=800,
             caption="Sanskruti Travels - Your Journey, Our Responsibility")
-    except Exception as e:
-        st.warning(f"Unable to load header image: {e}")
 
     st.markdown("---")
 
@@ -86,8 +150,14 @@ def display_header():
 def upload_excel_file():
     st.subheader("📋 Import Passport Data")
 
-    uploaded_file = st.file_uploader("Upload an Excel file with passport data",
-                                     type=['xlsx', 'xls'])
+    uploaded_files = st.file_uploader("Upload Excel files with passport data, e.g. one per branch",
+                                      type=['xlsx', 'xls'], accept_multiple_files=True)
+    all_sheets = st.checkbox("Load every sheet with passport data (one sheet per branch)",
+                             key="upload_all_sheets")
+
+    if uploaded_files and (len(uploaded_files) > 1 or all_sheets):
+        return upload_workbooks(uploaded_files, all_sheets)
+    uploaded_file = uploaded_files[0] if uploaded_files else None
 
     if uploaded_file is not None:
         try:
@@ -97,16 +167,44 @@ def upload_excel_file():
                 tmp_file.write(uploaded_file.getvalue())
                 tmp_file_path = tmp_file.name
 
-            # Load the data from the temporary file
-            df = load_passport_data(tmp_file_path)
+            # Identical uploads share the dataset already in the store
+            store = get_dataset_store()
+            current = st.session_state.dataset
+            key = file_content_hash(tmp_file_path)
+            diff = None
+            if current is not None and current.key == key and current.get() is not None:
+                handle = current
+            else:
+                handle = store.acquire(key)
+
+            if handle is None:
+                # Load the data from the temporary file, patching the data
+                # already loaded when the workbook is a new version of it
+                current_df = get_passport_data()
+                df, diff = refresh_passport_data(current_df, tmp_file_path)
+                if df is not None and not df.empty:
+                    get_search_index(df)
+                    handle = store.put(df, label=uploaded_file.name, key=key)
+            df = handle.get() if handle is not None else None
 
             # Clean up temporary file
             os.unlink(tmp_file_path)
 
             if df is not None and not df.empty:
-                st.session_state.passport_data = df
+                set_passport_data(handle)
                 st.success(
                     f"✅ Successfully loaded {len(df)} passport records!")
+                if diff is not None:
+                    summary = diff.summary()
+                    st.session_state.last_refresh = summary
+                    st.info(
+                        f"🔄 Compared with the loaded data: {summary['added']} added, "
+                        f"{summary['changed']} changed, {summary['removed']} removed, "
+                        f"{summary['unchanged']} unchanged.")
+                    if diff.size:
+                        with st.expander("View changed records"):
+                            st.dataframe(diff.details(current_df, df),
+                                         use_container_width=True)
                 return True
             else:
                 st.error("❌ No valid data found in the uploaded file.")
@@ -116,13 +214,58 @@ def upload_excel_file():
     return False
 
 
+# Load several uploaded workbooks, or every sheet of them, in parallel
+def upload_workbooks(uploaded_files, all_sheets):
+    sheets = None if all_sheets else [0]
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Keep the file names, they label the rows of each workbook
+            paths = []
+            for position, uploaded_file in enumerate(uploaded_files):
+                name = os.path.basename(uploaded_file.name)
+                path = os.path.join(tmp_dir, name)
+                if path in paths:
+                    path = os.path.join(tmp_dir, f"{position + 1}-{name}")
+                with open(path, 'wb') as f:
+                    f.write(uploaded_file.getvalue())
+                paths.append(path)
+
+            # The same uploads share the dataset already in the store
+            store = get_dataset_store()
+            key = hashlib.sha256("|".join([str(sheets)] + [file_content_hash(path) for path in paths])
+                                 .encode()).hexdigest()
+            handle = store.acquire(key)
+            if handle is None:
+                df = load_passport_sources(paths, sheets=sheets)
+                if df is not None and not df.empty:
+                    get_search_index(df)
+                    label = ", ".join(uploaded_file.name for uploaded_file in uploaded_files)
+                    handle = store.put(df, label=label, key=key)
+            df = handle.get() if handle is not None else None
+    except Exception as e:
+        st.error(f"❌ Error processing files: {e}")
+        return False
+
+    if df is None or df.empty:
+        st.error("❌ No valid data found in the uploaded files.")
+        return False
+
+    set_passport_data(handle)
+    st.session_state.last_refresh = None
+    sources = df[SOURCE_COLUMN].value_counts(sort=False)
+    st.success(f"✅ Successfully loaded {len(df)} passport records from {len(sources)} sources!")
+    skipped = df.attrs.get('skipped_sources', [])
+    if skipped:
+        st.warning(f"Skipped {len(skipped)} sheets without passport data: {', '.join(skipped)}")
+    return True
+
+
 # Function to display data overview
 def display_data_overview():
-    if st.session_state.passport_data is not None:
+    df = get_passport_data()
+    if df is not None:
         st.subheader("📊 Data Overview")
 
-        df = st.session_state.passport_data
-
         # Display statistics
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -137,20 +280,195 @@ def display_data_overview():
             expiring_soon = get_expiring_passports(df, days=90)
             st.metric("Expiring in 90 Days", len(expiring_soon))
 
+        # Changes applied by the last re-upload
+        refresh = st.session_state.last_refresh
+        if refresh is not None:
+            st.caption(f"🔄 Last update: {refresh['added']} added, "
+                       f"{refresh['changed']} changed, {refresh['removed']} removed")
+
         # Sample data preview
         with st.expander("🔍 Preview Data"):
             st.dataframe(df.head(10))
 
+        # Data combined from several workbooks or sheets
+        if SOURCE_COLUMN in df.columns:
+            with st.expander("🏢 Records per Source"):
+                counts = df[SOURCE_COLUMN].value_counts(sort=False)
+                st.dataframe(counts.rename_axis("Source").reset_index(name="Records"),
+                             hide_index=True, use_container_width=True)
+
+        # Customers entered more than once only get one message per event
+        with st.expander("👥 Possible Duplicate Customers"):
+            duplicates = find_duplicate_customers(df)
+            if duplicates.empty:
+                st.info("No duplicate customers found.")
+            else:
+                st.write(f"{duplicates['Cluster'].nunique()} customers appear in "
+                         f"{len(duplicates)} records. Send flows message one record per customer.")
+                st.dataframe(duplicates[["Cluster", "Confidence", "Name", "DOB",
+                                         "Passport", "PhoneDigits"]],
+                             use_container_width=True)
+
+
+# Function to show page controls and slice out the current page of a result set
+def paginate_results(results, key):
+    """
+    Show page size and page controls for a result set and return the current page
+
+    Only the rows of the current page are rendered by the caller, so a rerun
+    costs O(page size) whatever the number of results.
+
+    Args:
+        results (pandas.DataFrame): Full result set
+        key (str): Widget key prefix, unique per list
+
+    Returns:
+        pandas.DataFrame: Rows of the current page
+    """
+    total = len(results)
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        page_size = st.selectbox("Rows per page:", LIST_PAGE_SIZES,
+                                 key=f"{key}_page_size")
+    page_count = max((total + page_size - 1) // page_size, 1)
+
+    # A smaller result set or a larger page size may leave fewer pages
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = page_count
+    with col2:
+        page = st.number_input("Page:", min_value=1, max_value=page_count,
+                               key=page_key)
+
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    with col3:
+        st.caption(f"Showing {start + 1}-{end} of {total} (page {page} of {page_count})")
+    return results.iloc[start:end]
+
+
+def _selection_key(key, index, passport_number):
+    return f"{key}_select_{index}_{passport_number}"
+
+
+def _set_selection(selection_keys, value):
+    for selection_key in selection_keys:
+        st.session_state[selection_key] = value
+
+
+# Function to show the bulk actions of a page of results
+def bulk_select_controls(page_df, key, selectable, action_label):
+    """
+    Show select all / clear buttons and a bulk action button for one page
+
+    Args:
+        page_df (pandas.DataFrame): Rows of the current page
+        key (str): Widget key prefix of the list
+        selectable (numpy.ndarray): Boolean mask of rows that can be selected
+        action_label (str): Label of the bulk action button
+
+    Returns:
+        pandas.DataFrame: Selected rows if the bulk action was clicked, else None
+    """
+    selection_keys = [_selection_key(key, index, row.get("Passport", "N/A"))
+                      for (index, row), can_select in zip(page_df.iterrows(), selectable)
+                      if can_select]
+    selected = [st.session_state.get(selection_key, False) for selection_key in selection_keys]
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        st.button("☑️ Select all on page", key=f"{key}_select_all",
+                  on_click=_set_selection, args=(selection_keys, True),
+                  disabled=not selection_keys)
+    with col2:
+        st.button("✖️ Clear selection", key=f"{key}_clear",
+                  on_click=_set_selection, args=(selection_keys, False),
+                  disabled=not any(selected))
+    with col3:
+        clicked = st.button(f"{action_label} ({sum(selected)})", key=f"{key}_bulk",
+                            disabled=not any(selected))
+
+    if not clicked:
+        return None
+    # The rows are acted on now, their checkboxes are not rendered yet
+    _set_selection(selection_keys, False)
+    selectable_rows = page_df[selectable]
+    return selectable_rows[selected]
+
+
+def send_event_message(event, event_date, row, message_template, fields):
+    """
+    Send a birthday or expiry message to one customer, claiming the event in
+    the ledger first so reruns and other sessions cannot send it again
+
+    Args:
+        event (str): 'Birthday' or 'Expiry'
+        event_date (str): Event date as 'YYYY-MM-DD'
+        row (pandas.Series): Passport record
+        message_template (str): Template of the message
+        fields (dict): Template data
+
+    Returns:
+        bool: True if sent, False if the send failed, None if the customer
+        was already notified for this event
+    """
+    ledger = get_ledger()
+    if not ledger.claim(event, event_date, row["Passport"], row["PhoneE164"]):
+        return None
+
+    phone = f"+{row['PhoneE164']}"
+    success = False
+    try:
+        message = generate_message(message_template, fields)
+
+        # Send WhatsApp message
+        success = send_whatsapp_message(phone, message)
+
+        # Log notification
+        log_notification(row["Name"], phone, event, 'Sent' if success else 'Failed')
+    except Exception as e:
+        st.error(f"❌ Error: {e}")
+    if not success:
+        # Allow a retry
+        ledger.release(event, event_date, row["Passport"], row["PhoneE164"])
+    return success
+
+
+def _bulk_send_summary(outcomes):
+    sent = sum(outcome is True for outcome in outcomes)
+    failed = sum(outcome is False for outcome in outcomes)
+    skipped = sum(outcome is None for outcome in outcomes)
+    if failed:
+        st.error(f"❌ {failed} messages failed, {sent} sent, {skipped} already notified.")
+    else:
+        st.success(f"✅ {sent} messages sent, {skipped} already notified.")
+
+
+def _birthday_template():
+    template_name = st.session_state.selected_template
+    if template_name == 'custom':
+        return st.session_state.custom_template
+    templates = get_templates()
+    return templates.get(template_name, templates['birthday'])
+
+
+def _message_fields(row):
+    return {
+        'name': row["Name"],
+        'passport': row.get("Passport", "N/A"),
+        'expiry': row["Expiry"].strftime("%d-%m-%Y") if pd.notna(row["Expiry"]) else "N/A",
+    }
+
 
 # Function to show and manage birthday notifications
 def birthday_notifications():
-    if st.session_state.passport_data is None:
+    df = get_passport_data()
+    if df is None:
         st.warning("⚠️ Please upload passport data first.")
         return
 
     st.subheader("🎂 Birthday Notifications")
 
-    df = st.session_state.passport_data
 
     # Option to check today or future date
     option = st.radio(
@@ -158,112 +476,79 @@ def birthday_notifications():
         ["Today's Birthdays", "Check Future Date", "Monthly View"])
 
     if option == "Today's Birthdays":
-        birthday_df = get_todays_birthdays(df)
+        birthday_df, duplicates = collapse_duplicate_customers(df, get_todays_birthdays(df))
 
         if birthday_df.empty:
             st.info("🎂 No birthdays today.")
         else:
             st.success(f"🎉 Found {len(birthday_df)} birthdays today!")
+            if duplicates:
+                st.caption(f"👥 {duplicates} duplicate records of the same customers are hidden.")
+
+            page_df = paginate_results(birthday_df, "birthdays")
+
+            # Customers already sent today's birthday message in any session,
+            # looked up for the rows on this page only
+            event_date = datetime.date.today().isoformat()
+            notified = get_ledger().contains_many(
+                event_digests('Birthday', event_date, page_df["Passport"],
+                              page_df["PhoneE164"]))
+            selectable = (page_df["PhoneStatus"] == PHONE_VALID).to_numpy() & ~notified
+
+            bulk_rows = bulk_select_controls(page_df, "birthdays", selectable,
+                                             "📱 Send WhatsApp to selected")
+            if bulk_rows is not None:
+                message_template = _birthday_template()
+                _bulk_send_summary([
+                    send_event_message('Birthday', event_date, row, message_template,
+                                       _message_fields(row))
+                    for _, row in bulk_rows.iterrows()])
+
+            birthday_image = get_asset_cache().image(BIRTHDAY_IMAGE_URL, width=100)
 
             # Display birthday people
-            for _, row in birthday_df.iterrows():
+            for (index, row), already_notified, can_select in zip(
+                    page_df.iterrows(), notified, selectable):
                 with st.container():
                     col1, col2, col3 = st.columns([2, 1, 1])
 
-                    name = row["Name"]
-                    passport_number = row.get("Passport", "N/A")
-                    expiry = row["Expiry"].strftime("%d-%m-%Y") if pd.notna(
-                        row["Expiry"]) else "N/A"
-                    phone_raw = str(row.get("Phone", "")).strip()
-
-                    # Validate and format phone number
-                    phone_digits = clean_phone_number(phone_raw)
-                    phone_status = validate_phone_number(phone_digits)
+                    fields = _message_fields(row)
+                    name = fields['name']
+                    passport_number = fields['passport']
+                    # Phone numbers are normalised once at load time
+                    phone_status = format_phone_status(row["PhoneStatus"],
+                                                       row["PhoneE164"])
 
                     with col1:
-                        st.write(f"👤 **{name}**")
+                        st.checkbox(f"👤 **{name}**",
+                                    key=_selection_key("birthdays", index, passport_number),
+                                    disabled=not can_select)
                         st.write(f"📞 {phone_status}")
                         st.write(f"🛂 Passport: {passport_number}")
-                        st.write(f"⌛ Expiry: {expiry}")
+                        st.write(f"⌛ Expiry: {fields['expiry']}")
 
                     with col2:
-                        # Only enable sending if the phone is valid
-                        disabled = "Valid" not in phone_status
+                        # Only enable sending if the phone is valid and not sent yet
+                        if already_notified:
+                            st.caption("✅ Already sent today")
 
                         if st.button("Send WhatsApp 📱",
-                                     key=f"send_{name}",
-                                     disabled=disabled):
-                            try:
-                                phone = "+91" + phone_digits
-                                template_name = st.session_state.selected_template
-                                templates = get_templates()
-
-                                if template_name == 'custom':
-                                    message_template = st.session_state.custom_template
-                                else:
-                                    message_template = templates.get(
-                                        template_name, templates['birthday'])
-
-                                message = generate_message(
-                                    message_template, {
-                                        'name': name,
-                                        'passport': passport_number,
-                                        'expiry': expiry
-                                    })
-
-                                # Send WhatsApp message
-                                success = send_whatsapp_message(phone, message)
-
-                                if success:
-                                    st.success(
-                                        f"✅ Message sent to {name} at {phone}")
-
-                                    # Log notification
-                                    st.session_state.notification_history.append(
-                                        {
-                                            'date':
-                                            datetime.datetime.now().strftime(
-                                                "%Y-%m-%d %H:%M:%S"),
-                                            'name':
-                                            name,
-                                            'phone':
-                                            phone,
-                                            'type':
-                                            'Birthday',
-                                            'status':
-                                            'Sent'
-                                        })
-                                else:
-                                    st.error(
-                                        f"❌ Failed to send message to {phone}")
-
-                                    # Log failed notification
-                                    st.session_state.notification_history.append(
-                                        {
-                                            'date':
-                                            datetime.datetime.now().strftime(
-                                                "%Y-%m-%d %H:%M:%S"),
-                                            'name':
-                                            name,
-                                            'phone':
-                                            phone,
-                                            'type':
-                                            'Birthday',
-                                            'status':
-                                            'Failed'
-                                        })
-                            except Exception as e:
-                                st.error(f"❌ Error: {e}")
+                                     key=f"send_{index}_{passport_number}",
+                                     disabled=not can_select):
+                            phone = f"+{row['PhoneE164']}"
+                            outcome = send_event_message('Birthday', event_date, row,
+                                                         _birthday_template(), fields)
+                            if outcome is None:
+                                st.info(f"ℹ️ {name} was already sent today's birthday message.")
+                            elif outcome:
+                                st.success(f"✅ Message sent to {name} at {phone}")
+                            else:
+                                st.error(f"❌ Failed to send message to {phone}")
 
                     with col3:
-                        # Get a birthday celebration image
-                        birthday_image_url = "https://pixabay.com/get/ge074a2a90545a21e5cef579dc454ed3b150efcbec38793a434b2e7ace2a96d0ef99c07e11e3868e2e13644897bfb50683ce8cae2763c4aff4c4c7a018aca0f03_1280.jpg"
-                        try:
-                            response = requests.get(birthday_image_url)
-                            image = Image.open(BytesIO(response.content))
-                            st.image(image, width=100)
-                        except:
-                            pass
+                        # Birthday celebration image, one cached thumbnail for all rows
+                        if birthday_image is not None:
+                            st.image(birthday_image, width=100)
 
                 st.markdown("---")
 
@@ -275,9 +560,14 @@ def birthday_notifications():
                                         datetime.date.today())
 
         with col2:
+            # Keep showing the checked date while paging through its results
             if st.button("Check Birthdays"):
+                st.session_state.future_birthday_date = future_date
+            checked = st.session_state.get('future_birthday_date') == future_date
+
+            if checked:
                 future_birthdays = get_future_birthdays(
-                    df, future_date.day, future_date.month)
+                    df, future_date.day, future_date.month, future_date.year)
 
                 if future_birthdays.empty:
                     st.info(
@@ -288,20 +578,15 @@ def birthday_notifications():
                         f"🎈 Found {len(future_birthdays)} birthdays on {future_date.strftime('%d-%m-%Y')}!"
                     )
 
-                    # Display future birthdays
-                    for _, row in future_birthdays.iterrows():
-                        name = row["Name"]
-                        passport_number = row.get("Passport", "N/A")
-                        expiry = row["Expiry"].strftime(
-                            "%d-%m-%Y") if pd.notna(row["Expiry"]) else "N/A"
-                        phone_raw = str(row.get("Phone", "")).strip()
-
-                        # Validate phone
-                        phone_digits = clean_phone_number(phone_raw)
-                        phone_status = validate_phone_number(phone_digits)
+                    # Display one page of future birthdays
+                    for _, row in paginate_results(future_birthdays,
+                                                   "future_birthdays").iterrows():
+                        fields = _message_fields(row)
+                        phone_status = format_phone_status(
+                            row["PhoneStatus"], row["PhoneE164"])
 
                         st.write(
-                            f"👤 **{name}** | 📞 {phone_status} | 🛂 {passport_number} | ⌛ Expiry: {expiry}"
+                            f"👤 **{fields['name']}** | 📞 {phone_status} | 🛂 {fields['passport']} | ⌛ Expiry: {fields['expiry']}"
                         )
                         st.markdown("---")
 
@@ -314,15 +599,21 @@ def birthday_notifications():
             st.warning("No data available to display calendar.")
 
 
+def _expiry_fields(row, now):
+    fields = _message_fields(row)
+    fields['days_left'] = (row["Expiry"] - now).days
+    return fields
+
+
 # Function to show and manage passport expirations
 def passport_expirations():
-    if st.session_state.passport_data is None:
+    df = get_passport_data()
+    if df is None:
         st.warning("⚠️ Please upload passport data first.")
         return
 
     st.subheader("⏳ Passport Expirations")
 
-    df = st.session_state.passport_data
 
     # Filter options
     col1, col2 = st.columns(2)
@@ -336,7 +627,8 @@ def passport_expirations():
         st.plotly_chart(fig, use_container_width=True)
 
     # Get expiring passports
-    expiring_df = get_expiring_passports(df, days=days_to_expire)
+    expiring_df, duplicates = collapse_duplicate_customers(
+        df, get_expiring_passports(df, days=days_to_expire))
 
     if expiring_df.empty:
         st.info(f"📄 No passports expiring within {days_to_expire} days.")
@@ -344,135 +636,101 @@ def passport_expirations():
         st.warning(
             f"⚠️ Found {len(expiring_df)} passports expiring within {days_to_expire} days!"
         )
+        if duplicates:
+            st.caption(f"👥 {duplicates} duplicate records of the same customers are hidden.")
+
+        page_df = paginate_results(expiring_df, "expirations")
+
+        # Customers already reminded about this expiry date in any session,
+        # looked up for the rows on this page only
+        event_dates = page_df["Expiry"].dt.strftime("%Y-%m-%d").astype(object)
+        notified = get_ledger().contains_many(
+            event_digests('Expiry', event_dates, page_df["Passport"],
+                          page_df["PhoneE164"]))
+        selectable = (page_df["PhoneStatus"] == PHONE_VALID).to_numpy() & ~notified
+        templates = get_templates()
+        now = pd.Timestamp.now()
+
+        bulk_rows = bulk_select_controls(page_df, "expirations", selectable,
+                                         "📱 Send reminders to selected")
+        if bulk_rows is not None:
+            _bulk_send_summary([
+                send_event_message('Expiry', event_date, row, templates['expiry'],
+                                   _expiry_fields(row, now))
+                for (_, row), event_date in zip(bulk_rows.iterrows(),
+                                                event_dates.loc[bulk_rows.index])])
 
         # Display expiring passports
-        for _, row in expiring_df.iterrows():
+        for (index, row), event_date, already_notified, can_select in zip(
+                page_df.iterrows(), event_dates, notified, selectable):
             with st.container():
                 col1, col2 = st.columns([3, 1])
 
-                name = row["Name"]
-                passport_number = row.get("Passport", "N/A")
-                expiry = row["Expiry"].strftime("%d-%m-%Y") if pd.notna(
-                    row["Expiry"]) else "N/A"
-                phone_raw = str(row.get("Phone", "")).strip()
-
-                # Validate phone
-                phone_digits = clean_phone_number(phone_raw)
-                phone_status = validate_phone_number(phone_digits)
-
-                days_left = (row["Expiry"] - pd.Timestamp.now()).days
+                fields = _expiry_fields(row, now)
+                name = fields['name']
+                passport_number = fields['passport']
+                phone_status = format_phone_status(row["PhoneStatus"],
+                                                   row["PhoneE164"])
 
                 with col1:
-                    st.write(f"👤 **{name}**")
+                    st.checkbox(f"👤 **{name}**",
+                                key=_selection_key("expirations", index, passport_number),
+                                disabled=not can_select)
                     st.write(f"📞 {phone_status}")
                     st.write(f"🛂 Passport: {passport_number}")
-                    st.write(f"⌛ Expires on: {expiry} ({days_left} days left)")
+                    st.write(f"⌛ Expires on: {fields['expiry']} ({fields['days_left']} days left)")
 
                 with col2:
-                    # Only enable sending if the phone is valid
-                    disabled = "Valid" not in phone_status
+                    # Only enable sending if the phone is valid and not sent yet
+                    if already_notified:
+                        st.caption("✅ Reminder already sent")
 
                     if st.button("Send Reminder 📱",
-                                 key=f"remind_{name}",
-                                 disabled=disabled):
-                        try:
-                            phone = "+91" + phone_digits
-                            template_name = 'expiry'
-                            templates = get_templates()
-
-                            message_template = templates.get(
-                                template_name, templates['expiry'])
-
-                            message = generate_message(
-                                message_template, {
-                                    'name': name,
-                                    'passport': passport_number,
-                                    'expiry': expiry,
-                                    'days_left': days_left
-                                })
-
-                            # Send WhatsApp message
-                            success = send_whatsapp_message(phone, message)
-
-                            if success:
-                                st.success(
-                                    f"✅ Reminder sent to {name} at {phone}")
-
-                                # Log notification
-                                st.session_state.notification_history.append({
-                                    'date':
-                                    datetime.datetime.now().strftime(
-                                        "%Y-%m-%d %H:%M:%S"),
-                                    'name':
-                                    name,
-                                    'phone':
-                                    phone,
-                                    'type':
-                                    'Expiry',
-                                    'status':
-                                    'Sent'
-                                })
-                            else:
-                                st.error(
-                                    f"❌ Failed to send reminder to {phone}")
-
-                                # Log failed notification
-                                st.session_state.notification_history.append({
-                                    'date':
-                                    datetime.datetime.now().strftime(
-                                        "%Y-%m-%d %H:%M:%S"),
-                                    'name':
-                                    name,
-                                    'phone':
-                                    phone,
-                                    'type':
-                                    'Expiry',
-                                    'status':
-                                    'Failed'
-                                })
-                        except Exception as e:
-                            st.error(f"❌ Error: {e}")
+                                 key=f"remind_{index}_{passport_number}",
+                                 disabled=not can_select):
+                        phone = f"+{row['PhoneE164']}"
+                        outcome = send_event_message('Expiry', event_date, row,
+                                                     templates['expiry'], fields)
+                        if outcome is None:
+                            st.info(f"ℹ️ {name} was already reminded about this expiry.")
+                        elif outcome:
+                            st.success(f"✅ Reminder sent to {name} at {phone}")
+                        else:
+                            st.error(f"❌ Failed to send reminder to {phone}")
 
             st.markdown("---")
 
 
 # Function to search passport records
 def search_passport_records():
-    if st.session_state.passport_data is None:
+    df = get_passport_data()
+    if df is None:
         st.warning("⚠️ Please upload passport data first.")
         return
 
     st.subheader("🔍 Search Passport Records")
 
-    df = st.session_state.passport_data
-
     # Search options
     search_option = st.selectbox("Search by:",
                                  ["Name", "Passport Number", "Phone Number"])
 
     search_term = st.text_input("Enter search term:")
 
+    limit = st.number_input("Maximum results:", min_value=10,
+                            max_value=1000, value=100, step=10)
+
     if search_term:
-        # Initialize results as empty DataFrame with same columns as df
-        results = pd.DataFrame(columns=df.columns)
-
-        if search_option == "Name":
-            results = df[df["Name"].str.contains(search_term,
-                                                 case=False,
-                                                 na=False)]
-        elif search_option == "Passport Number":
-            results = df[df["Passport"].astype(str).str.contains(search_term,
-                                                                 case=False,
-                                                                 na=False)]
-        elif search_option == "Phone Number":
-            results = df[df["Phone"].astype(str).str.contains(search_term,
-                                                              case=False,
-                                                              na=False)]
+        # Served by the search index of the loaded data, best matches first
+        field = SEARCH_OPTIONS[search_option]
+        results, total = search_passports(df, field, search_term, int(limit))
 
         if results.empty:
             st.info(f"No records found matching '{search_term}'.")
         else:
-            st.success(f"Found {len(results)} matching records!")
+            if total > len(results):
+                st.success(f"Found {total} matching records, showing the best {len(results)}.")
+            else:
+                st.success(f"Found {total} matching records!")
             st.dataframe(results)
 
 
@@ -550,36 +808,60 @@ def manage_templates():
 def notification_history():
     st.subheader("📜 Notification History")
 
-    if not st.session_state.notification_history:
+    store = get_store()
+
+    # Filters run on indexed columns in the store
+    col1, col2 = st.columns(2)
+    with col1:
+        type_filter = st.selectbox("Type:", ["All"] + store.distinct_values('type'))
+    with col2:
+        status_filter = st.selectbox("Status:", ["All"] + store.distinct_values('status'))
+
+    filters = {
+        'type': None if type_filter == "All" else type_filter,
+        'status': None if status_filter == "All" else status_filter
+    }
+
+    total = store.count_notifications(**filters)
+
+    if total == 0:
         st.info("No notification history available.")
     else:
-        # Create a DataFrame from notification history
-        history_df = pd.DataFrame(st.session_state.notification_history)
-
         # Notification statistics
         col1, col2 = st.columns(2)
 
         with col1:
-            st.metric("Total Notifications", len(history_df))
+            st.metric("Total Notifications", total)
 
             # Count by status
-            sent_count = len(history_df[history_df['status'] == 'Sent'])
-            failed_count = len(history_df[history_df['status'] == 'Failed'])
-
-            st.metric("Successfully Sent", sent_count)
-            st.metric("Failed", failed_count)
+            status_counts = store.status_counts(**filters)
+            st.metric("Successfully Sent", status_counts.get('Sent', 0))
+            st.metric("Failed", status_counts.get('Failed', 0))
 
         with col2:
             # Notification history chart
-            fig = plot_notification_history(history_df)
+            fig = plot_notification_history(store.daily_status_counts(**filters))
             st.plotly_chart(fig, use_container_width=True)
 
-        # Display notification history table
+        # Display one page of the notification history table
+        col1, col2 = st.columns(2)
+        with col1:
+            page_size = st.selectbox("Rows per page:", HISTORY_PAGE_SIZES)
+        with col2:
+            page_count = (total + page_size - 1) // page_size
+            page = st.number_input("Page:", min_value=1, max_value=page_count, value=1)
+
+        history_df = store.query_notifications(limit=page_size,
+                                               offset=(page - 1) * page_size,
+                                               **filters)
         st.dataframe(history_df)
+        st.caption(f"Page {page} of {page_count}")
 
         # Export option
         if st.button("Export History to CSV"):
-            csv = history_df.to_csv(index=False)
+            chunks = store.iter_notifications(**filters)
+            csv = "".join(chunk.to_csv(index=False, header=(i == 0))
+                          for i, chunk in enumerate(chunks))
             st.download_button("Download CSV File",
                                csv,
                                "notification_history.csv",
@@ -587,6 +869,95 @@ def notification_history():
                                key="download-csv")
 
 
+# Admin view of the datasets shared by all sessions
+def is_admin():
+    """
+    Check whether this session may use the admin tools
+
+    Returns:
+        bool: True if an admin token is configured and the page was opened
+        with it in the admin query parameter
+    """
+    try:
+        token = st.secrets.get(ADMIN_TOKEN_SETTING)
+    except FileNotFoundError:
+        token = None
+    token = token or os.environ.get(ADMIN_TOKEN_SETTING)
+    given = st.query_params.get("admin")
+    if not token or not given:
+        return False
+    return hmac.compare_digest(str(given).encode(), str(token).encode())
+
+def dataset_store_admin():
+    # Evicting a dataset affects every session using it
+    if not is_admin():
+        return
+    store = get_dataset_store()
+    with st.sidebar.expander("🗄️ Shared datasets (admin)"):
+        entries = store.entries()
+        st.caption(f"{len(entries)} datasets, "
+                   f"{store.total_bytes() / 1024 / 1024:.1f} MB in memory")
+        if not entries:
+            return
+
+        current = st.session_state.dataset
+        table = pd.DataFrame(entries)
+        table['MB'] = (table['bytes'] / 1024 / 1024).round(1)
+        table['last_used'] = pd.to_datetime(table['last_used'], unit='s').dt.strftime("%H:%M:%S")
+        st.dataframe(table[['label', 'rows', 'MB', 'refs', 'last_used']],
+                     hide_index=True, use_container_width=True)
+
+        labels = {entry['key']: f"{entry['label']} ({entry['key'][:8]})" for entry in entries}
+        key = st.selectbox("Dataset", list(labels), format_func=labels.get,
+                           key="dataset_admin_key")
+        if st.button("Evict dataset", key="dataset_admin_evict"):
+            store.evict(key)
+            if current is not None and current.key == key:
+                set_passport_data(None)
+            st.rerun()
+
+
+# Stage timings of this process, see instrumentation
+def toggle_instrumentation():
+    if st.session_state.instrumentation_enabled:
+        instrumentation.enable()
+    else:
+        instrumentation.disable()
+
+def performance_panel():
+    # Recording is switched for the whole process, so for every session
+    if not is_admin():
+        return
+    with st.sidebar.expander("⏱️ Performance (admin)"):
+        # Show the current process setting, only a click changes it
+        st.session_state.instrumentation_enabled = instrumentation.is_enabled()
+        st.checkbox("Record timings", key="instrumentation_enabled",
+                    on_change=toggle_instrumentation,
+                    help="Applies to every session of this server")
+
+        stages = instrumentation.summary()
+        if not stages:
+            st.caption("No timings recorded yet")
+            return
+
+        table = pd.DataFrame(stages)
+        table['rows'] = table['rows'].astype('Int64')
+        st.dataframe(table.round(1), hide_index=True, use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Prometheus", instrumentation.export_prometheus(),
+                               "passport_metrics.prom", "text/plain",
+                               key="instrumentation_prometheus")
+        with col2:
+            st.download_button("JSON", instrumentation.export_json(),
+                               "passport_metrics.json", "application/json",
+                               key="instrumentation_json")
+        if st.button("Reset timings", key="instrumentation_reset"):
+            instrumentation.reset()
+            st.rerun()
+
+
 # Main application
 def main():
     display_header()
@@ -599,6 +970,8 @@ def main():
         "Notification History"
     ])
 
+    dataset_store_admin()
+
     # Sidebar info
     with st.sidebar.expander("About this app"):
         st.info("""
@@ -608,28 +981,31 @@ def main():
         """)
 
     # Display selected page
-    if page == "Import Data":
-        upload_excel_file()
-
-    elif page == "Dashboard":
-        if st.session_state.passport_data is None:
+    with instrumentation.stage(f"render.page.{page}"):
+        if page == "Import Data":
             upload_excel_file()
-        display_data_overview()
 
-    elif page == "Birthday Notifications":
-        birthday_notifications()
+        elif page == "Dashboard":
+            if get_passport_data() is None:
+                upload_excel_file()
+            display_data_overview()
+
+        elif page == "Birthday Notifications":
+            birthday_notifications()
+
+        elif page == "Passport Expirations":
+            passport_expirations()
 
-    elif page == "Passport Expirations":
-        passport_expirations()
+        elif page == "Search Records":
+            search_passport_records()
 
-    elif page == "Search Records":
-        search_passport_records()
+        elif page == "Message Templates":
+            manage_templates()
 
-    elif page == "Message Templates":
-        manage_templates()
+        elif page == "Notification History":
+            notification_history()
 
-    elif page == "Notification History":
-        notification_history()
+    performance_panel()
 
 
 if __name__ == "__main__":
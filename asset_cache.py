@@ -0,0 +1,239 @@
+import os
+import io
+import time
+import hashlib
+import tempfile
+import threading
+import concurrent.futures
+
+# Directory holding downloaded images and their thumbnails
+ASSET_DIR = ".asset_cache"
+
+# Downloaded images older than this are refreshed in the background
+REFRESH_AFTER = 7 * 24 * 3600
+
+# A failed download is not retried before this many seconds
+RETRY_AFTER = 300
+
+# Timeout of one download in seconds
+FETCH_TIMEOUT = 10
+
+# Some image hosts refuse requests without a browser-like user agent
+USER_AGENT = "Mozilla/5.0 (compatible; PassportManager/1.0)"
+
+ORIGINAL_SUFFIX = ".original"
+THUMBNAIL_SUFFIX = ".thumb"
+
+def _url_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()[:24]
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def make_thumbnail(data, width):
+    """
+    Resize an encoded image to a given width, never enlarging it
+
+    Args:
+        data (bytes): Encoded image
+        width (int): Target width in pixels, None to keep the size
+
+    Returns:
+        bytes: PNG for images with transparency, JPEG otherwise
+    """
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if width is not None and image.width > width:
+        height = max(round(image.height * width / image.width), 1)
+        image = image.resize((width, height), Image.LANCZOS)
+
+    output = io.BytesIO()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image.save(output, format='PNG', optimize=True)
+    else:
+        image.convert('RGB').save(output, format='JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
+class AssetCache:
+    """
+    Local cache of remote images
+
+    Images are downloaded once on a background thread and stored on disk
+    together with thumbnails in the sizes they are shown at. Thumbnails are
+    served from memory, so a rerun never waits for the network: until an
+    image is downloaded, or when there is no network, no image is returned
+    and the caller leaves it out. Downloads older than refresh_after are
+    refreshed in the background while the cached copy keeps being served.
+    """
+
+    def __init__(self, cache_dir=ASSET_DIR, refresh_after=REFRESH_AFTER,
+                 retry_after=RETRY_AFTER, timeout=FETCH_TIMEOUT):
+        """
+        Args:
+            cache_dir (str): Directory for downloaded images and thumbnails
+            refresh_after (float): Age in seconds after which a download is refreshed
+            retry_after (float): Seconds before a failed download is retried
+            timeout (float): Timeout of one download in seconds
+        """
+        self.cache_dir = cache_dir
+        self.refresh_after = refresh_after
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self._memory = {}
+        self._failures = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="asset-fetch")
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url, suffix):
+        return os.path.join(self.cache_dir, _url_key(url) + suffix)
+
+    def _thumbnail_path(self, url, width):
+        return self._path(url, f".{width or 'full'}{THUMBNAIL_SUFFIX}")
+
+    def image(self, url, width=None):
+        """
+        Get an image for display without waiting for the network
+
+        Args:
+            url (str): Image URL
+            width (int): Width the image is shown at, None for the full size
+
+        Returns:
+            bytes: Encoded image, or None while the URL is not downloaded
+        """
+        with self._lock:
+            data = self._memory.get((url, width))
+        if data is None:
+            data = self._load_thumbnail(self._path(url, ORIGINAL_SUFFIX),
+                                        self._thumbnail_path(url, width), (url, width))
+
+        self._refresh_if_stale(url)
+        return data
+
+    def _load_thumbnail(self, original, thumbnail, key):
+        """
+        Read a thumbnail from disk into memory, making it from the original
+        image if it is missing or older than the original
+        """
+        original_time = _mtime(original)
+        if original_time is None:
+            return None
+
+        try:
+            thumbnail_time = _mtime(thumbnail)
+            if thumbnail_time is not None and thumbnail_time >= original_time:
+                with open(thumbnail, 'rb') as f:
+                    data = f.read()
+            else:
+                with open(original, 'rb') as f:
+                    data = make_thumbnail(f.read(), key[1])
+                _write_atomic(thumbnail, data)
+        except Exception as e:
+            print(f"Error reading cached image {original}: {e}")
+            return None
+
+        with self._lock:
+            self._memory[key] = data
+        return data
+
+    def _refresh_if_stale(self, url):
+        fetched = _mtime(self._path(url, ORIGINAL_SUFFIX))
+        now = time.time()
+        if fetched is not None and now - fetched < self.refresh_after:
+            return
+        with self._lock:
+            if url in self._pending or now - self._failures.get(url, 0) < self.retry_after:
+                return
+            self._pending.add(url)
+        self._executor.submit(self._fetch, url)
+
+    def _fetch(self, url):
+        # urllib is enough for a plain GET and keeps requests out of the app process
+        import urllib.request
+        from PIL import Image
+
+        try:
+            request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                content = response.read()
+            # Only keep content that decodes as an image
+            Image.open(io.BytesIO(content)).verify()
+            _write_atomic(self._path(url, ORIGINAL_SUFFIX), content)
+            with self._lock:
+                for key in [key for key in self._memory if key[0] == url]:
+                    del self._memory[key]
+                self._failures.pop(url, None)
+        except Exception as e:
+            print(f"Error fetching image {url}: {e}")
+            with self._lock:
+                self._failures[url] = time.time()
+        finally:
+            with self._lock:
+                self._pending.discard(url)
+
+    def prefetch(self, urls):
+        """
+        Start downloading images that are missing or stale
+
+        Args:
+            urls (list): Image URLs
+        """
+        for url in urls:
+            self._refresh_if_stale(url)
+
+    def wait(self, timeout=None):
+        """
+        Wait for the downloads in progress, e.g. before shutting down
+
+        Args:
+            timeout (float): Longest wait in seconds, None to wait until done
+
+        Returns:
+            bool: True if no download is in progress anymore
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+
+_asset_cache = None
+_asset_cache_lock = threading.Lock()
+
+def get_asset_cache():
+    """
+    Get the process-wide asset cache
+
+    Returns:
+        AssetCache: Cache shared by all sessions of this process
+    """
+    global _asset_cache
+    with _asset_cache_lock:
+        if _asset_cache is None:
+            _asset_cache = AssetCache()
+        return _asset_cache
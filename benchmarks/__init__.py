@@ -0,0 +1,9 @@
+"""
+Benchmarks of the passport manager, run from the repository root:
+
+    python -m benchmarks.import_budget
+    python -m benchmarks.suite [--sizes 1k 10k 100k 1m] [--compare <results.json>]
+
+The suite runs on synthetic workbooks from benchmarks.workbook, cached in
+benchmarks/.workbooks/, and writes its results to benchmarks/results/.
+"""
@@ -0,0 +1,212 @@
+"""
+Import-time budget of the Streamlit app pages
+
+Usage:
+    python -m benchmarks.import_budget [--page "Dashboard"] [--json results.json]
+
+Each page is rendered in a fresh interpreter started with
+`python -X importtime`, through Streamlit's AppTest with the sample workbook
+loaded. The imports of the first run of the app (startup) and of the switch
+to the page are summed and checked against the page's budget, and pages
+that draw no chart must not import the charting library.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Pages of the app, as listed in its sidebar
+PAGES = [
+    "Import Data", "Dashboard", "Birthday Notifications",
+    "Passport Expirations", "Search Records", "Message Templates",
+    "Notification History",
+]
+
+# Longest import time allowed per page in milliseconds, startup included
+PAGE_BUDGETS_MS = {
+    "Import Data": 1000,
+    "Dashboard": 1000,
+    "Birthday Notifications": 1000,
+    "Search Records": 1000,
+    "Message Templates": 1000,
+    "Passport Expirations": 1500,
+    "Notification History": 1500,
+}
+
+# Libraries only some pages may load, with the pages allowed to load them.
+# A library counts as loaded when the package or any of its modules is
+# imported while the page runs
+LAZY_MODULES = {
+    'plotly': {"Passport Expirations", "Notification History"},
+    'requests': set(),
+}
+
+# Markers written to stderr between the phases of a page run
+_STARTUP = "@@startup"
+_LOAD = "@@load"
+_PAGE = "@@page"
+_END = "@@end"
+# Prefix of the lines reporting an exception raised by the page
+_EXCEPTION = "@@exception "
+
+def parse_importtime(text):
+    """
+    Parse the output of python -X importtime
+
+    Args:
+        text (str): Lines written to stderr
+
+    Returns:
+        list: (module, cumulative microseconds, nesting depth) per import
+    """
+    imports = []
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), int(cumulative), depth))
+    return imports
+
+def _section(text, start, end):
+    return text.split(start, 1)[1].split(end, 1)[0]
+
+def _summarize(imports):
+    top = [(module, cumulative) for module, cumulative, depth in imports if depth == 0]
+    return {
+        'import_ms': sum(cumulative for _, cumulative in top) / 1000,
+        'slowest': sorted(top, key=lambda item: -item[1])[:5],
+        'modules': {module for module, _, _ in imports},
+    }
+
+def measure_page(page, root=".", timeout=300):
+    """
+    Measure the imports done when opening a page in a fresh interpreter
+
+    Args:
+        page (str): One of PAGES
+        root (str): Repository root, the app runs from there
+        timeout (float): Longest run in seconds
+
+    Returns:
+        dict: page, startup_ms, page_ms, import_ms (their sum), slowest
+        top-level imports, the lazy modules that were loaded and the
+        exceptions the app raised while rendering
+
+    Raises:
+        RuntimeError: If the child process failed without reporting why
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "benchmarks.import_budget", "--child", page],
+        cwd=root, capture_output=True, text=True, timeout=timeout)
+    exceptions = [json.loads(line[len(_EXCEPTION):]) for line in result.stderr.splitlines()
+                  if line.startswith(_EXCEPTION)]
+    if _END not in result.stderr or (result.returncode != 0 and not exceptions):
+        raise RuntimeError(f"Page {page!r} did not render (exit code {result.returncode}):\n"
+                           f"{result.stderr[-2000:]}")
+
+    startup = _summarize(parse_importtime(_section(result.stderr, _STARTUP, _LOAD)))
+    opened = _summarize(parse_importtime(_section(result.stderr, _PAGE, _END)))
+    modules = startup['modules'] | opened['modules']
+    return {
+        'page': page,
+        'startup_ms': round(startup['import_ms'], 1),
+        'page_ms': round(opened['import_ms'], 1),
+        'import_ms': round(startup['import_ms'] + opened['import_ms'], 1),
+        'slowest': [[module, round(cumulative / 1000, 1)]
+                    for module, cumulative in sorted(startup['slowest'] + opened['slowest'],
+                                                     key=lambda item: -item[1])[:5]],
+        'lazy_loaded': sorted(name for name in LAZY_MODULES
+                              if any(module == name or module.startswith(name + ".")
+                                     for module in modules)),
+        'exceptions': exceptions,
+    }
+
+def check_budget(measurement):
+    """
+    Check a page measurement against its budget
+
+    Args:
+        measurement (dict): Output of measure_page
+
+    Returns:
+        list: Problems found, empty when the page is within budget
+    """
+    page = measurement['page']
+    problems = [f"{page}: raised {exception}" for exception in measurement['exceptions']]
+    budget = PAGE_BUDGETS_MS[page]
+    if measurement['import_ms'] > budget:
+        problems.append(f"{page}: imports took {measurement['import_ms']:.0f} ms, "
+                        f"budget {budget} ms")
+    for name in measurement['lazy_loaded']:
+        if page not in LAZY_MODULES[name]:
+            problems.append(f"{page}: imported {name}, which should load on first use")
+    return problems
+
+def _render_page(page):
+    """
+    Child process: render one page with the markers around each phase
+
+    Exceptions shown by the app after any phase are reported after the
+    end marker, and make the process exit with status 1.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    exceptions = []
+
+    def collect(app):
+        exceptions.extend(exception.message for exception in app.exception)
+
+    app = AppTest.from_file(os.path.abspath("app.py"), default_timeout=120)
+    sys.stderr.write(f"\n{_STARTUP}\n")
+    app.run()
+    collect(app)
+    sys.stderr.write(f"\n{_LOAD}\n")
+    load = [button for button in app.button if button.label.startswith("📂 Load Sample Data")]
+    if load:
+        load[0].click().run()
+        collect(app)
+    sys.stderr.write(f"\n{_PAGE}\n")
+    app.sidebar.radio[0].set_value(page).run()
+    collect(app)
+    sys.stderr.write(f"\n{_END}\n")
+    for message in dict.fromkeys(exceptions):
+        sys.stderr.write(f"{_EXCEPTION}{json.dumps(message)}\n")
+    sys.stderr.flush()
+    return 1 if exceptions else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.import_budget",
+                                     description="Check the import-time budget of each app page")
+    parser.add_argument("--page", choices=PAGES, action="append",
+                        help="Page to measure, may be repeated (default: all pages)")
+    parser.add_argument("--json", help="Write the measurements to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return _render_page(args.child)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    measurements = []
+    problems = []
+    for page in args.page or PAGES:
+        measurement = measure_page(page, root=root)
+        measurements.append(measurement)
+        problems.extend(check_budget(measurement))
+        print(f"{page:<24} {measurement['import_ms']:>8.1f} ms "
+              f"(startup {measurement['startup_ms']:.1f}, page {measurement['page_ms']:.1f}) "
+              f"budget {PAGE_BUDGETS_MS[page]} ms, lazy modules loaded: "
+              f"{', '.join(measurement['lazy_loaded']) or 'none'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(measurements, f, indent=2)
+
+    for problem in problems:
+        print(f"Failed: {problem}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
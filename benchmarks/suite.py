@@ -0,0 +1,319 @@
+"""
+Scaling benchmarks of the passport manager on synthetic workbooks
+
+Usage:
+    python -m benchmarks.suite [--sizes 1k 10k 100k 1m] [--repeat 5]
+                               [--output results.json] [--compare baseline.json]
+
+Each public function is timed on generated workbooks of each size (see
+benchmarks.workbook). The first call and the median and minimum of the
+repeated calls are written as JSON to benchmarks/results/, together with
+the commit and library versions, so a run can be compared with the run of
+another commit:
+
+    python -m benchmarks.suite --compare benchmarks/results/<baseline>.json
+
+The workbook dates are spread around a pinned reference date, recorded in
+the results; a comparison reuses the baseline's so both runs time the
+same data.
+
+Everything runs offline, in a temporary working directory so the cache,
+notification store and ledger of the checkout are left alone.
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+
+from benchmarks.workbook import (DEFAULT_SIZES, MAX_ROWS, REFERENCE_DATE, get_workbook,
+                                 parse_date)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+DEFAULT_REPEAT = 5
+
+# Most recipients of one bulk send, as a day's campaign rarely exceeds it
+DEFAULT_BULK_LIMIT = 5000
+
+# A median this many times slower than the baseline is a regression
+DEFAULT_TOLERANCE = 1.25
+
+# Timings faster than this in both runs are too noisy to compare
+MIN_COMPARED_MS = 1.0
+
+def parse_size(text):
+    """
+    Parse a workbook size such as 1000, 10k or 1m
+
+    Args:
+        text (str): Size, optionally with a k or m suffix
+
+    Returns:
+        int: Number of rows
+    """
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    try:
+        rows = int(float(text.rstrip('km')) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {text}")
+    if not 0 < rows <= MAX_ROWS:
+        raise argparse.ArgumentTypeError(f"size must be between 1 and {MAX_ROWS}")
+    return rows
+
+def time_call(func, repeat):
+    """
+    Time repeated calls of a function
+
+    Args:
+        func (callable): Function without arguments
+        repeat (int): Number of calls
+
+    Returns:
+        tuple: (timings dict with first_ms, median_ms, min_ms and runs,
+        result of the last call)
+    """
+    timings = []
+    result = None
+    for _ in range(max(repeat, 1)):
+        # The functions report progress with print, which is not timed work
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'first_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'runs': len(timings),
+    }, result
+
+def benchmark_workbook(path, repeat=DEFAULT_REPEAT, bulk_limit=DEFAULT_BULK_LIMIT):
+    """
+    Time the public functions on one workbook
+
+    Must run in a scratch working directory: the loads write the data cache
+    and the bulk send logs to the notification store.
+
+    Args:
+        path (str): Workbook path
+        repeat (int): Calls per function
+        bulk_limit (int): Most recipients of the bulk send
+
+    Returns:
+        dict: Timings per function name
+    """
+    from passport_service import (load_passport_data, get_todays_birthdays,
+                                  get_expiring_passports, search_passports,
+                                  find_duplicate_customers)
+    from passport_runner import build_recipients
+    from data_visualization import plot_birthday_calendar
+    from message_templates import DEFAULT_TEMPLATES
+    from whatsapp_service import send_bulk_messages
+    from streamlit import config as streamlit_config
+    from streamlit.logger import set_log_level
+
+    # Streamlit warns on every call made outside of a running app; the level
+    # is set once its configuration is parsed, so that it is not reset
+    streamlit_config.get_config_options()
+    set_log_level("error")
+
+    results = {}
+    # Every uncached load parses the workbook again
+    results['load_passport_data'], df = time_call(
+        lambda: load_passport_data(path, use_cache=False), repeat)
+    # The first cached load writes the cache, the others read it
+    results['load_passport_data_cached'], _ = time_call(
+        lambda: load_passport_data(path), repeat + 1)
+
+    results['get_todays_birthdays'], _ = time_call(lambda: get_todays_birthdays(df), repeat)
+    results['get_expiring_passports'], expiring = time_call(
+        lambda: get_expiring_passports(df, 90), repeat)
+    results['search_passports'], _ = time_call(
+        lambda: search_passports(df, "name", "shah"), repeat)
+    results['find_duplicate_customers'], _ = time_call(
+        lambda: find_duplicate_customers(df), repeat)
+    results['plot_birthday_calendar'], _ = time_call(lambda: plot_birthday_calendar(df), repeat)
+
+    recipients = build_recipients(expiring).head(bulk_limit).to_dict('records')
+    results['send_bulk_messages'], _ = time_call(
+        lambda: send_bulk_messages(recipients, DEFAULT_TEMPLATES['expiry']), repeat)
+    results['send_bulk_messages']['recipients'] = len(recipients)
+
+    results['rows'] = len(df)
+    return results
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+def environment():
+    """
+    Describe the commit and environment of a run
+
+    Returns:
+        dict: Commit, whether the tree had changes, and library versions
+    """
+    import numpy as np
+    import pandas as pd
+
+    return {
+        'commit': _git("rev-parse", "HEAD") or None,
+        'dirty': bool(_git("status", "--porcelain", "--untracked-files=no")),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+    }
+
+def run_suite(sizes, repeat=DEFAULT_REPEAT, bulk_limit=DEFAULT_BULK_LIMIT, seed=0,
+              reference_date=REFERENCE_DATE):
+    """
+    Run the benchmarks on workbooks of several sizes
+
+    Args:
+        sizes (list): Workbook sizes in rows
+        repeat (int): Calls per function
+        bulk_limit (int): Most recipients of the bulk send
+        seed (int): Seed of the generated workbooks
+        reference_date (datetime.date): Date the workbook dates are spread around
+
+    Returns:
+        dict: Environment of the run and timings per size
+    """
+    run = environment()
+    run.update({'repeat': repeat, 'bulk_limit': bulk_limit, 'seed': seed,
+                'reference_date': reference_date.isoformat(), 'sizes': {}})
+    paths = {}
+    for rows in sizes:
+        print(f"Generating workbook with {rows} rows...", flush=True)
+        paths[rows] = get_workbook(rows, seed=seed, reference_date=reference_date)
+
+    workdir = os.getcwd()
+    # The stores stay open until exit, so a leftover file must not fail the run
+    with tempfile.TemporaryDirectory(prefix="passport-bench-",
+                                     ignore_cleanup_errors=True) as scratch:
+        os.chdir(scratch)
+        try:
+            for rows, path in paths.items():
+                print(f"Benchmarking {os.path.basename(path)}...", flush=True)
+                run['sizes'][str(rows)] = benchmark_workbook(path, repeat, bulk_limit)
+        finally:
+            os.chdir(workdir)
+    return run
+
+def compare_runs(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare the median timings of two runs
+
+    Args:
+        current (dict): Output of run_suite
+        baseline (dict): Output of run_suite for an earlier commit
+        tolerance (float): Slowdown ratio counted as a regression
+
+    Returns:
+        list: (rows, function, baseline ms, current ms, ratio, regressed)
+        for every function timed in both runs
+    """
+    comparison = []
+    for rows, timings in current['sizes'].items():
+        before = baseline.get('sizes', {}).get(rows, {})
+        for name, timing in timings.items():
+            if not isinstance(timing, dict) or not isinstance(before.get(name), dict):
+                continue
+            old = before[name]['median_ms']
+            new = timing['median_ms']
+            ratio = new / old if old > 0 else float('inf')
+            regressed = ratio > tolerance and max(old, new) >= MIN_COMPARED_MS
+            comparison.append((int(rows), name, old, new, ratio, regressed))
+    return comparison
+
+def print_run(run):
+    print(f"\nCommit {run['commit'] or 'unknown'}{' (with changes)' if run['dirty'] else ''}, "
+          f"Python {run['python']}, pandas {run['pandas']}, numpy {run['numpy']}")
+    for rows, timings in run['sizes'].items():
+        print(f"\n{rows} rows ({timings['rows']} after cleaning)")
+        for name, timing in timings.items():
+            if isinstance(timing, dict):
+                print(f"  {name:28} first {timing['first_ms']:10.1f} ms   "
+                      f"median {timing['median_ms']:10.1f} ms   min {timing['min_ms']:10.1f} ms")
+
+def print_comparison(comparison, baseline, run):
+    print(f"\nCompared with commit {baseline.get('commit') or 'unknown'}")
+    for setting in ('seed', 'reference_date'):
+        if baseline.get(setting) != run.get(setting):
+            print(f"  Warning: the runs used different workbooks ({setting} "
+                  f"{baseline.get(setting)} vs {run.get(setting)})")
+    for rows, name, old, new, ratio, regressed in comparison:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"  {rows:>8} {name:28} {old:10.1f} ms -> {new:10.1f} ms  {ratio:5.2f}x{flag}")
+
+def default_output(run):
+    commit = (run['commit'] or "unknown")[:10]
+    stamp = run['created'].replace(":", "").replace("-", "")
+    return os.path.join(RESULTS_DIR, f"{stamp}-{commit}.json")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.suite",
+                                     description="Time the passport functions on synthetic workbooks")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=DEFAULT_SIZES,
+                        help="Workbook sizes in rows, e.g. 1k 10k 100k 1m")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Calls per function")
+    parser.add_argument("--bulk-limit", type=int, default=DEFAULT_BULK_LIMIT,
+                        help="Most recipients of the bulk send")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed of the generated workbooks (default: the baseline's, or 0)")
+    parser.add_argument("--reference-date", type=parse_date, default=None,
+                        help="Date the workbook dates are spread around, YYYY-MM-DD "
+                             f"(default: the baseline's, or {REFERENCE_DATE})")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    # Generate the same workbooks as the baseline unless told otherwise
+    seed = args.seed if args.seed is not None else baseline.get('seed', 0)
+    reference_date = args.reference_date
+    if reference_date is None:
+        reference_date = parse_date(baseline.get('reference_date', REFERENCE_DATE.isoformat()))
+
+    # The app modules are imported from the repository root
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    run = run_suite(args.sizes, args.repeat, args.bulk_limit, seed, reference_date)
+    print_run(run)
+
+    output = args.output or default_output(run)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        comparison = compare_runs(run, baseline, args.tolerance)
+        print_comparison(comparison, baseline, run)
+        if any(regressed for *_, regressed in comparison):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
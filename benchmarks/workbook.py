@@ -0,0 +1,244 @@
+"""
+Synthetic passport workbooks for benchmarks
+
+Usage:
+    python -m benchmarks.workbook --rows 100000 [--seed 0] [--output passports-100000.xlsx]
+
+The generated data looks like the real workbook: titled names, day-first
+text dates in several formats mixed with Excel date cells and serial
+numbers, phones typed in every possible way (some invalid or missing),
+partly missing passport data and customers entered more than once with
+spelling variants.
+"""
+import os
+import sys
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+
+# Bump whenever the generated data changes, so cached workbooks are rebuilt
+GENERATOR_VERSION = "1"
+
+# Workbook sizes benchmarked by default, up to the largest supported one
+DEFAULT_SIZES = [1000, 10000, 100000]
+MAX_ROWS = 1000000
+
+# Date the generated birthdays and expiry dates are spread around. Pinned so
+# runs on different days benchmark the same workbooks
+REFERENCE_DATE = datetime.date(2025, 1, 1)
+
+# Directory caching generated workbooks between runs
+WORKBOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".workbooks")
+
+# Share of rows with each kind of flaw
+BAD_PHONE_RATE = 0.08
+MISSING_PHONE_RATE = 0.3
+MISSING_PASSPORT_RATE = 0.4
+INVALID_DATE_RATE = 0.01
+DUPLICATE_RATE = 0.03
+
+TITLES = ["Mr. ", "Mr.", "Ms. ", "Ms.", "Mrs. ", ""]
+FIRST_NAMES = [
+    "Damji", "Mustufa", "Bhairavi", "Paridhi", "Jitendra", "Saakshi", "Suparna",
+    "Suvarna", "Rajesh", "Priya", "Amit", "Sneha", "Anand", "Kiran", "Meera",
+    "Rohan", "Girish", "Chandrakant", "Nitul", "Himanshu", "Mahesh", "José", "Zoë",
+]
+MIDDLE_NAMES = ["", "", "Rupshi ", "Narendra ", "Dilip ", "Gulab ", "Ramchandra "]
+LAST_NAMES = [
+    "Gada", "Chhatriwala", "Thakkar", "Agal", "Jain", "Dakshit", "Wankhade",
+    "Shah", "Patel", "Nagda", "Iyer", "Desai", "Sachdev", "Kanabar", "Sanghavi",
+    "Lad", "Müller",
+]
+
+# Text formats of the date cells, with their share of the rows; the rest
+# are Excel date cells and serial numbers
+DATE_FORMATS = {
+    '%d.%m.%Y': 0.4,
+    '%d/%m/%Y': 0.2,
+    '%d-%m-%Y': 0.1,
+    '%Y-%m-%d': 0.1,
+}
+EXCEL_DATE_RATE = 0.15
+
+EXCEL_EPOCH = np.datetime64('1899-12-30')
+
+def _format_dates(rng, days):
+    """
+    Turn day numbers into a mix of text dates, Excel dates and serial numbers
+    """
+    dates = days.astype('datetime64[D]')
+    text = pd.Series(dates)
+    cells = np.empty(len(days), dtype=object)
+
+    kinds = list(DATE_FORMATS) + ['excel', 'serial']
+    weights = list(DATE_FORMATS.values()) + [EXCEL_DATE_RATE]
+    weights.append(1.0 - sum(weights))
+    kind = rng.choice(len(kinds), size=len(days), p=weights)
+    for position, name in enumerate(kinds):
+        rows = kind == position
+        if name == 'excel':
+            cells[rows] = list(pd.to_datetime(dates[rows]).to_pydatetime())
+        elif name == 'serial':
+            cells[rows] = (dates[rows] - EXCEL_EPOCH).astype(np.int64)
+        else:
+            cells[rows] = text[rows].dt.strftime(name).to_numpy(dtype=object)
+
+    invalid = rng.random(len(days)) < INVALID_DATE_RATE
+    cells[invalid] = rng.choice(["31.02.1980", "unknown", "00/00/0000"], size=int(invalid.sum()))
+    return cells
+
+def _phones(rng, rows):
+    digits = (rng.integers(7, 10, rows) * 10**9 + rng.integers(0, 10**9, rows)).astype(str)
+    phones = pd.Series(digits, dtype=object)
+
+    # How the number was typed in
+    style = rng.integers(0, 5, rows)
+    phones[style == 1] = "+91 " + phones[style == 1].str[:5] + " " + phones[style == 1].str[5:]
+    phones[style == 2] = "0" + phones[style == 2]
+    phones[style == 3] = "91" + phones[style == 3]
+    numeric = np.flatnonzero(style == 4)
+    phones[numeric] = digits[numeric].astype(np.int64)
+
+    bad = rng.random(rows) < BAD_PHONE_RATE
+    phones[bad] = rng.choice(["12345", "98765 4321x", "1234567890", "n/a", "+1 555 0100"],
+                             size=int(bad.sum()))
+    missing = rng.random(rows) < MISSING_PHONE_RATE
+    phones[missing] = np.nan
+    return phones
+
+def _spelling_variants(rng, names):
+    """
+    Change names the way they get retyped: title, case, doubled letters
+    """
+    variant = rng.integers(0, 4, len(names))
+    names = names.copy()
+    names[variant == 0] = names[variant == 0].str.replace(r"^(Mr|Ms|Mrs)\.\s*", "", regex=True)
+    names[variant == 1] = names[variant == 1].str.upper()
+    names[variant == 2] = names[variant == 2].str.replace("a", "aa", n=1)
+    names[variant == 3] = names[variant == 3].str.replace("  ", " ").str.replace("h", "", n=1)
+    return names
+
+def generate_passport_frame(rows, seed=0, reference_date=REFERENCE_DATE):
+    """
+    Generate raw passport data in the layout of the real workbook
+
+    Args:
+        rows (int): Number of rows, at most MAX_ROWS
+        seed (int): Random seed, the same seed gives the same data
+        reference_date (datetime.date): Date the expiry dates and birthdays
+            are spread around
+
+    Returns:
+        pandas.DataFrame: Columns Name, DOB, Phone, Gmail, Passport and Expiry
+    """
+    if not 0 < rows <= MAX_ROWS:
+        raise ValueError(f"rows must be between 1 and {MAX_ROWS}")
+    rng = np.random.default_rng(seed)
+    today = np.datetime64(reference_date, 'D').astype(np.int64)
+
+    unique_rows = rows - int(rows * DUPLICATE_RATE)
+    names = pd.Series(rng.choice(TITLES, unique_rows), dtype=object)
+    names += pd.Series(rng.choice(FIRST_NAMES, unique_rows), dtype=object) + " "
+    names += pd.Series(rng.choice(MIDDLE_NAMES, unique_rows), dtype=object)
+    names += pd.Series(rng.choice(LAST_NAMES, unique_rows), dtype=object)
+
+    # Ages 1 to 90, expiry dates from one year ago to ten years ahead
+    dob_days = today - rng.integers(365, 90 * 365, unique_rows)
+    expiry_days = today + rng.integers(-365, 10 * 365, unique_rows)
+
+    frame = pd.DataFrame({
+        'Name': names,
+        'DOB': _format_dates(rng, dob_days),
+        'Phone': _phones(rng, unique_rows),
+        'Gmail': np.nan,
+        'Passport': pd.Series([f"{letter}{number:07d}" for letter, number in zip(
+            rng.choice(list("ABCJKLMNPRSTUVWZ"), unique_rows),
+            rng.integers(0, 10**7, unique_rows))], dtype=object),
+        'Expiry': _format_dates(rng, expiry_days),
+    })
+    no_passport = rng.random(unique_rows) < MISSING_PASSPORT_RATE
+    frame.loc[no_passport, ['Passport', 'Expiry']] = np.nan
+
+    # Customers entered again with the same date of birth and phone
+    duplicates = frame.iloc[rng.integers(0, unique_rows, rows - unique_rows)].copy()
+    duplicates['Name'] = _spelling_variants(rng, duplicates['Name'])
+    duplicates.loc[rng.random(len(duplicates)) < 0.5, ['Passport', 'Expiry']] = np.nan
+
+    frame = pd.concat([frame, duplicates], ignore_index=True)
+    return frame.iloc[rng.permutation(len(frame))].reset_index(drop=True)
+
+def write_workbook(df, path):
+    """
+    Write raw passport data to an Excel workbook
+
+    Args:
+        df (pandas.DataFrame): Output of generate_passport_frame
+        path (str): Path of the .xlsx file
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp.xlsx"
+    df.to_excel(tmp_path, index=False, engine='openpyxl')
+    os.replace(tmp_path, path)
+
+def get_workbook(rows, seed=0, reference_date=REFERENCE_DATE, workbook_dir=WORKBOOK_DIR):
+    """
+    Get the path of a synthetic workbook, generating it on first use
+
+    Workbooks are cached per size, seed, reference date and generator version.
+
+    Args:
+        rows (int): Number of rows
+        seed (int): Random seed
+        reference_date (datetime.date): Date the dates are spread around
+        workbook_dir (str): Directory caching the generated workbooks
+
+    Returns:
+        str: Path of the workbook
+    """
+    name = f"passports-v{GENERATOR_VERSION}-{rows}-{seed}-{reference_date:%Y%m%d}.xlsx"
+    path = os.path.join(workbook_dir, name)
+    if not os.path.exists(path):
+        write_workbook(generate_passport_frame(rows, seed=seed, reference_date=reference_date),
+                       path)
+    return path
+
+def parse_date(text):
+    """
+    Parse a reference date given as YYYY-MM-DD
+
+    Args:
+        text (str): Date
+
+    Returns:
+        datetime.date: Parsed date
+    """
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date, expected YYYY-MM-DD: {text}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.workbook",
+                                     description="Generate a synthetic passport workbook")
+    parser.add_argument("--rows", type=int, default=DEFAULT_SIZES[0], help="Number of rows")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--reference-date", type=parse_date, default=REFERENCE_DATE,
+                        help="Date the dates are spread around, YYYY-MM-DD")
+    parser.add_argument("--output", help="Workbook path (default: the benchmark cache)")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        write_workbook(generate_passport_frame(args.rows, seed=args.seed,
+                                               reference_date=args.reference_date),
+                       args.output)
+        path = args.output
+    else:
+        path = get_workbook(args.rows, seed=args.seed, reference_date=args.reference_date)
+    print(path)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+import numpy as np
+import pandas as pd
+
+# Value of df.attrs['layout'] for frames built by compact_passport_frame
+LAYOUT_COMPACT = 'compact'
+
+# Date columns stored as int32 days since 1970-01-01
+DATE_COLUMNS = ["DOB", "Expiry"]
+
+# Day number stored for missing dates
+MISSING_DAY = np.iinfo(np.int32).min
+
+# Passport numbers up to this many ASCII characters are packed into an int64
+PASSPORT_WIDTH = 8
+
+# Text columns with fewer distinct values than this share of rows become categoricals
+CATEGORY_MAX_RATIO = 0.5
+
+# Compact column keeping the workbook text of phones the digits do not reproduce
+PHONE_TEXT_COLUMN = "PhoneText"
+
+def is_compact(df):
+    """
+    Check whether a passport DataFrame uses the compact layout
+
+    Args:
+        df (pandas.DataFrame): Passport data
+
+    Returns:
+        bool: True for frames built by compact_passport_frame
+    """
+    return df.attrs.get('layout') == LAYOUT_COMPACT
+
+def pack_dates(values):
+    """
+    Convert dates to int32 days since 1970-01-01, MISSING_DAY for NaT
+
+    Args:
+        values (pandas.Series): Parsed dates
+
+    Returns:
+        numpy.ndarray: int32 day numbers
+    """
+    days = values.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    missing = np.isnat(days)
+    days = days.astype(np.int64)
+    days[missing] = MISSING_DAY
+    return days.astype(np.int32)
+
+def unpack_dates(days, index=None):
+    """
+    Convert int32 day numbers back to dates
+
+    Args:
+        days (numpy.ndarray or pandas.Series): Output of pack_dates
+        index (pandas.Index): Index of the result
+
+    Returns:
+        pandas.Series: datetime64[ns] dates with NaT for missing days
+    """
+    days = np.asarray(days)
+    values = days.astype('datetime64[D]').astype('datetime64[ns]')
+    values[days == MISSING_DAY] = np.datetime64('NaT')
+    return pd.Series(values, index=index)
+
+def date_column(df, column):
+    """
+    Get a date column as datetime64 whatever the layout of the frame
+
+    Args:
+        df (pandas.DataFrame): Passport data
+        column (str): 'DOB' or 'Expiry'
+
+    Returns:
+        pandas.Series: Parsed dates
+    """
+    if is_compact(df):
+        return unpack_dates(df[column], index=df.index)
+    return df[column]
+
+def pack_passports(values):
+    """
+    Pack passport numbers as fixed-width bytes viewed as int64, 0 when missing
+
+    Args:
+        values (pandas.Series): Passport numbers
+
+    Returns:
+        numpy.ndarray: int64 codes, or None if a number is not ASCII, longer
+        than PASSPORT_WIDTH, empty or padded with spaces, so would not
+        unpack to the same text
+    """
+    present = values.notna().to_numpy()
+    text = values.astype(object).where(values.notna(), "").astype(str)
+    stripped = text.str.strip()
+    if len(text) and stripped.str.len().max() > PASSPORT_WIDTH:
+        return None
+    if ((stripped == "") & present).any() or (stripped != text).any():
+        return None
+    text = stripped
+    try:
+        return np.array(text.tolist(), dtype=f"S{PASSPORT_WIDTH}").view(np.int64)
+    except UnicodeEncodeError:
+        return None
+
+def unpack_passports(codes):
+    """
+    Convert packed passport numbers back to text
+
+    Args:
+        codes (numpy.ndarray or pandas.Series): Output of pack_passports
+
+    Returns:
+        numpy.ndarray: object array of passport numbers, NaN when missing
+    """
+    codes = np.ascontiguousarray(codes, dtype=np.int64)
+    text = codes.view(f"S{PASSPORT_WIDTH}").astype(str).astype(object)
+    text[codes == 0] = np.nan
+    return text
+
+def _phone_numbers(digits):
+    """
+    Split phone digits into int64 numbers and the digits they do not reproduce
+
+    Args:
+        digits (pandas.Series): PhoneDigits column
+
+    Returns:
+        tuple: (int64 numbers, 0 when missing or not representable, and a
+        categorical of the digits with a leading 0 or more than 18 digits,
+        NaN elsewhere)
+    """
+    # More than 18 digits do not fit an int64 and are never a valid phone
+    usable = ((digits.str.len() > 0) & (digits.str.len() <= 18)
+              & ~digits.str.startswith("0"))
+    numbers = digits.where(usable, "0").astype(np.int64).to_numpy()
+    kept = digits.astype(object).where(~usable & (digits != ""))
+    return numbers, kept.astype('category')
+
+def _phone_digits(numbers, kept):
+    digits = pd.Series(numbers, index=kept.index).astype(str).where(numbers != 0, "")
+    kept = kept.astype(object)
+    return digits.where(kept.isna(), kept).astype(str)
+
+def _phone_text(phones, digits):
+    """
+    Get the workbook text of the phones that differ from their digits
+
+    Args:
+        phones (pandas.Series): Phone column of the regular layout
+        digits (pandas.Series): PhoneDigits column
+
+    Returns:
+        pandas.Series: Categorical of the differing text, NaN elsewhere
+    """
+    phones = phones.astype(object)
+    digits = digits.astype(object)
+    same = (phones == digits) | (phones.isna() & (digits == ""))
+    return phones.where(~same).astype('category')
+
+def compact_passport_frame(df):
+    """
+    Build the compact layout of cleaned passport data
+
+    Passport numbers become int64 packed bytes (or a categorical when they do
+    not fit), Phone the phone digits as int64 (0 when missing), PhoneE164
+    int64 (0 when not valid), dates int32 days since 1970-01-01, and repeated
+    text columns categoricals. Digits an int64 does not reproduce (a leading
+    0, more than 18 digits) stay in a PhoneDigits categorical and workbook
+    text differing from the digits in a PHONE_TEXT_COLUMN categorical, both
+    NaN for the other rows. Query functions expand the rows they return with
+    expand_passport_frame, which gives back the rows unchanged.
+
+    Args:
+        df (pandas.DataFrame): Output of clean_passport_frame
+
+    Returns:
+        pandas.DataFrame: Compact passport data with attrs['layout'] set
+    """
+    columns = {}
+    # Dtypes of the text columns turned into categoricals, restored on expansion
+    text_dtypes = {}
+    phones, kept_digits = _phone_numbers(df["PhoneDigits"])
+    for column in df.columns:
+        values = df[column]
+        if column in DATE_COLUMNS:
+            columns[column] = pack_dates(values)
+        elif column == "Passport":
+            packed = pack_passports(values)
+            columns[column] = packed if packed is not None else values.astype('category')
+            text_dtypes[column] = values.dtype
+        elif column == "Phone":
+            columns[column] = phones
+            columns[PHONE_TEXT_COLUMN] = _phone_text(values, df["PhoneDigits"])
+            text_dtypes[column] = values.dtype
+        elif column == "PhoneDigits":
+            columns[column] = kept_digits
+            text_dtypes[column] = values.dtype
+        elif column == "PhoneE164":
+            columns[column] = values.fillna(0).to_numpy(dtype=np.int64)
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            columns[column] = values
+        elif values.dtype == object or pd.api.types.is_string_dtype(values):
+            repeated = values.nunique() < CATEGORY_MAX_RATIO * len(values)
+            columns[column] = values.astype('category') if repeated else values
+            if repeated:
+                text_dtypes[column] = values.dtype
+        else:
+            columns[column] = values
+
+    compact = pd.DataFrame(columns, index=df.index)
+    compact.attrs = dict(df.attrs, layout=LAYOUT_COMPACT, text_dtypes=text_dtypes)
+    return compact
+
+def expand_passport_frame(df):
+    """
+    Convert compact passport rows back to the layout of clean_passport_frame
+
+    Args:
+        df (pandas.DataFrame): Rows of a compact frame
+
+    Returns:
+        pandas.DataFrame: Passport data in the regular layout
+    """
+    if not is_compact(df):
+        return df
+
+    text_dtypes = df.attrs.get('text_dtypes', {})
+    digits = None
+    if "PhoneDigits" in df.columns:
+        digits = _phone_digits(df["Phone"].to_numpy(), df["PhoneDigits"])
+
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column in DATE_COLUMNS:
+            columns[column] = unpack_dates(values, index=df.index)
+        elif column == "Passport" and values.dtype == np.int64:
+            columns[column] = unpack_passports(values)
+        elif column == "Phone":
+            text = df[PHONE_TEXT_COLUMN].astype(object)
+            columns[column] = text.where(text.notna(), digits.where(digits != "").astype(object))
+        elif column == PHONE_TEXT_COLUMN:
+            continue
+        elif column == "PhoneDigits":
+            columns[column] = digits
+        elif column == "PhoneE164":
+            columns[column] = values.astype('Int64').where(values != 0)
+        else:
+            columns[column] = values
+        if column in text_dtypes:
+            columns[column] = pd.Series(columns[column], index=df.index).astype(
+                text_dtypes[column])
+
+    expanded = pd.DataFrame(columns, index=df.index)
+    expanded.attrs = {key: value for key, value in df.attrs.items()
+                      if key not in ('layout', 'memory_report', 'text_dtypes')}
+    return expanded
+
+def bytes_per_row(df):
+    """
+    Measure the memory used per row, including the index and string contents
+
+    Args:
+        df (pandas.DataFrame): Any DataFrame
+
+    Returns:
+        float: Bytes per row
+    """
+    return float(df.memory_usage(deep=True).sum()) / max(len(df), 1)
+
+def memory_report(before, after):
+    """
+    Compare the memory used per row by two layouts of the same data
+
+    Args:
+        before (pandas.DataFrame): Regular layout
+        after (pandas.DataFrame): Compact layout
+
+    Returns:
+        dict: rows, before and after bytes per row, and per-column bytes per
+        row as (before, after) pairs
+    """
+    rows = max(len(before), 1)
+    usage_before = before.memory_usage(deep=True) / rows
+    usage_after = after.memory_usage(deep=True) / rows
+    return {
+        'rows': len(before),
+        'before': float(usage_before.sum()),
+        'after': float(usage_after.sum()),
+        'columns': {column: (round(float(usage_before.get(column, 0.0)), 1),
+                             round(float(usage_after.get(column, 0.0)), 1))
+                    for column in usage_before.index.union(usage_after.index, sort=False)},
+    }
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Directory holding one sub-directory per cached dataset
+CACHE_DIR = ".passport_cache"
+
+# Upper bound for the whole cache directory, oldest entries are evicted first
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Bump whenever the cleaning done by load_passport_data changes, so stale
+# entries produced by older code are never served
+CACHE_VERSION = "5"
+
+META_FILE = "meta.json"
+INDEX_FILE = "index.npy"
+
+def file_content_hash(file_path, block_size=1024 * 1024):
+    """
+    Compute the cache key for a workbook from its content
+
+    Args:
+        file_path (str): Path to the workbook
+        block_size (int): Number of bytes read per step
+
+    Returns:
+        str: Hex digest identifying the file content and cache version
+    """
+    digest = hashlib.sha256(CACHE_VERSION.encode())
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, key)
+
+def _entry_size(path):
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
+
+def _encode_column(series, path, position):
+    """
+    Write one column as .npy file(s) and return its metadata
+    """
+    dtype = series.dtype
+    base = os.path.join(path, str(position))
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        np.save(base + ".codes.npy", series.cat.codes.to_numpy())
+        categories = series.cat.categories
+        np.save(base + ".categories.npy", categories.to_numpy().astype(str))
+        return {'kind': 'category', 'ordered': bool(dtype.ordered)}
+
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufmM":
+        np.save(base + ".npy", series.to_numpy())
+        return {'kind': 'numpy'}
+
+    mask = series.isna().to_numpy()
+
+    if pd.api.types.is_extension_array_dtype(dtype) and dtype.kind in "biuf":
+        values = series.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+        np.save(base + ".npy", values)
+        np.save(base + ".mask.npy", mask)
+        return {'kind': 'masked', 'dtype': str(dtype)}
+
+    # Text is stored as UTF-8 bytes plus an offsets array, the layout of an
+    # Arrow string array, so it can be memory-mapped back without a copy
+    data, offsets = _text_buffers(series, mask)
+    np.save(base + ".npy", data)
+    np.save(base + ".offsets.npy", offsets)
+    np.save(base + ".mask.npy", mask)
+    return {'kind': 'text', 'dtype': str(dtype)}
+
+def _text_buffers(series, mask):
+    """
+    Get the UTF-8 bytes of a text column and the offset of each value
+
+    Raises:
+        TypeError: If the column holds anything else than text, which would
+            not read back with the same types
+    """
+    if getattr(series.dtype, 'storage', None) == 'pyarrow':
+        import pyarrow as pa
+
+        array = pa.array(series).cast(pa.large_string())
+        offsets = np.frombuffer(array.buffers()[1], dtype=np.int64)
+        offsets = offsets[array.offset:array.offset + len(array) + 1]
+        data = np.frombuffer(array.buffers()[2] or b"", dtype=np.uint8)
+        return data[offsets[0]:offsets[-1]], offsets - offsets[0]
+
+    cells = series.to_numpy(dtype=object)[~mask]
+    if not all(isinstance(value, str) for value in cells):
+        raise TypeError(f"column {series.name!r} mixes text with other values")
+    encoded = [value.encode('utf-8') for value in series.to_numpy(dtype=object, na_value="")]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+def _decode_column(meta, path, position):
+    """
+    Rebuild one column from its .npy file(s), memory-mapping where possible
+    """
+    base = os.path.join(path, str(position))
+    kind = meta['kind']
+
+    if kind == 'category':
+        codes = np.load(base + ".codes.npy", mmap_mode='r')
+        categories = np.load(base + ".categories.npy")
+        values = pd.Categorical.from_codes(codes, categories=categories,
+                                           ordered=meta['ordered'])
+        return pd.Series(values, copy=False)
+
+    if kind == 'numpy':
+        return pd.Series(np.load(base + ".npy", mmap_mode='r'), copy=False)
+
+    mask = np.load(base + ".mask.npy")
+    values = np.load(base + ".npy", mmap_mode='r')
+
+    if kind == 'masked':
+        return pd.Series(pd.array(values, dtype=meta['dtype'])).mask(mask)
+
+    offsets = np.load(base + ".offsets.npy", mmap_mode='r')
+    dtype = pd.api.types.pandas_dtype(meta['dtype'])
+    if getattr(dtype, 'storage', None) == 'pyarrow':
+        import pyarrow as pa
+
+        # Arrow reads the memory-mapped buffers in place
+        validity = pa.py_buffer(np.packbits(~mask, bitorder='little')) if mask.any() else None
+        array = pa.LargeStringArray.from_buffers(len(mask), pa.py_buffer(offsets),
+                                                 pa.py_buffer(values), validity)
+        return pd.Series(array, dtype=dtype, copy=False)
+
+    data = values.tobytes()
+    restored = np.empty(len(mask), dtype=object)
+    for position, (start, end) in enumerate(zip(offsets[:-1].tolist(), offsets[1:].tolist())):
+        restored[position] = data[start:end].decode('utf-8')
+    restored[mask] = np.nan
+    return pd.Series(restored, dtype=dtype, copy=False)
+
+def load_cached_frame(key, cache_dir=CACHE_DIR):
+    """
+    Load a cleaned passport DataFrame from the cache
+
+    Args:
+        key (str): Cache key from file_content_hash
+        cache_dir (str): Cache directory
+
+    Returns:
+        pandas.DataFrame: Cached data, or None if there is no usable entry
+    """
+    path = _entry_path(key, cache_dir)
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+
+        columns = {}
+        for position, column in enumerate(meta['columns']):
+            columns[column['name']] = _decode_column(column, path, position)
+
+        index = pd.Index(np.load(os.path.join(path, INDEX_FILE)))
+        df = pd.DataFrame(columns, copy=False)
+        if not columns:
+            df = pd.DataFrame(index=range(meta['rows']))
+        df.index = index
+        df.attrs.update(meta.get('attrs', {}))
+
+        # Mark the entry as recently used for eviction
+        now = time.time()
+        os.utime(path, (now, now))
+        return df
+    except Exception as e:
+        print(f"Error reading passport cache entry {key}: {e}")
+        return None
+
+def store_cached_frame(key, df, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """
+    Store a cleaned passport DataFrame in the cache and evict old entries
+
+    Args:
+        key (str): Cache key from file_content_hash
+        df (pandas.DataFrame): Cleaned passport data
+        cache_dir (str): Cache directory
+        max_bytes (int): Size budget for the whole cache directory
+
+    Returns:
+        bool: True if stored successfully, False otherwise
+    """
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        final_path = _entry_path(key, cache_dir)
+        if os.path.exists(final_path):
+            return True
+
+        # Write into a private directory first so readers never see a
+        # half-written entry
+        tmp_path = tempfile.mkdtemp(prefix=".tmp-", dir=cache_dir)
+        try:
+            columns = []
+            for position, name in enumerate(df.columns):
+                column = _encode_column(df[name], tmp_path, position)
+                column['name'] = name
+                columns.append(column)
+
+            np.save(os.path.join(tmp_path, INDEX_FILE), df.index.to_numpy())
+
+            meta = {
+                'rows': len(df),
+                'columns': columns,
+                'attrs': df.attrs,
+                'created': time.time()
+            }
+            with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+                json.dump(meta, f)
+
+            os.rename(tmp_path, final_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        evict_cache(cache_dir, max_bytes, keep=key)
+        return True
+    except Exception as e:
+        print(f"Error writing passport cache entry {key}: {e}")
+        return False
+
+def evict_cache(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, keep=None):
+    """
+    Delete least recently used cache entries until the cache fits its budget
+
+    Args:
+        cache_dir (str): Cache directory
+        max_bytes (int): Size budget for the whole cache directory
+        keep (str): Cache key that must not be evicted
+
+    Returns:
+        int: Number of entries removed
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(".tmp-") or not os.path.isdir(path):
+            continue
+        entries.append((os.path.getmtime(path), name, _entry_size(path)))
+
+    total = sum(size for _, _, size in entries)
+    removed = 0
+    for _, name, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        total -= size
+        removed += 1
+
+    return removed
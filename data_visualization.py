@@ -1,9 +1,14 @@
-import plotly.express as px
-import plotly.graph_objects as go
 import pandas as pd
 import calendar
 import datetime
 
+from passport_index import get_birthday_calendar
+from instrumentation import timed
+
+# Plotly is imported by the plotting functions on first use: it is the
+# slowest import of the app and most pages draw no chart
+
+@timed("render.birthday_calendar", rows=None)
 def plot_birthday_calendar(df):
     """
     Create a calendar heatmap of birthdays by month and day
@@ -14,39 +19,27 @@ def plot_birthday_calendar(df):
     Returns:
         plotly.graph_objects.Figure: Calendar heatmap
     """
-    # Create a list to store birthday count data
-    birthday_data = []
-    
-    # Get counts of birthdays for each day of the year
-    for month in range(1, 13):
-        days_in_month = calendar.monthrange(2023, month)[1]  # Use 2023 as a non-leap year
-        for day in range(1, days_in_month + 1):
-            count = len(df[(df['DOB'].dt.month == month) & (df['DOB'].dt.day == day)])
-            birthday_data.append({
-                'month': month,
-                'day': day,
-                'count': count
-            })
-    
-    # Convert list to DataFrame
-    birthday_counts = pd.DataFrame(birthday_data)
-    
-    # Convert month numbers to month names
-    birthday_counts['month_name'] = birthday_counts['month'].apply(lambda x: calendar.month_name[x])
+    import plotly.graph_objects as go
+
+    # Counts per (month, day), built in one pass and cached per dataset
+    counts = get_birthday_calendar(df)
+    month_names = [calendar.month_name[i] for i in range(1, 13)]
     
     # Create heatmap
-    fig = px.density_heatmap(
-        birthday_counts,
-        x='day',
-        y='month_name',
-        z='count',
-        title='Birthday Distribution Throughout the Year',
-        labels={'day': 'Day of Month', 'month_name': 'Month', 'count': 'Number of Birthdays'},
-        color_continuous_scale='YlOrRd'
-    )
+    fig = go.Figure(go.Heatmap(
+        z=counts,
+        x=list(range(1, 32)),
+        y=month_names,
+        colorscale='YlOrRd',
+        colorbar=dict(title='Number of Birthdays'),
+        hovertemplate='%{y} %{x}<br>Number of Birthdays: %{z}<extra></extra>'
+    ))
     
     # Update layout
     fig.update_layout(
+        title='Birthday Distribution Throughout the Year',
+        xaxis_title='Day of Month',
+        yaxis_title='Month',
         xaxis=dict(
             tickmode='linear',
             tick0=1,
@@ -61,6 +54,7 @@ def plot_birthday_calendar(df):
     
     return fig
 
+@timed("render.expiration_distribution", rows=None)
 def plot_expiration_distribution(df):
     """
     Create a bar chart of passport expirations by month
@@ -71,6 +65,9 @@ def plot_expiration_distribution(df):
     Returns:
         plotly.graph_objects.Figure: Bar chart of expirations
     """
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     # Filter valid expiry dates
     valid_expiry = df[df['Expiry'].notna()].copy()
     
@@ -132,16 +129,21 @@ def plot_expiration_distribution(df):
     
     return fig
 
+@timed("render.notification_history", rows=None)
 def plot_notification_history(history_df):
     """
     Create a stacked bar chart of notification history by date and status
     
     Args:
-        history_df (pandas.DataFrame): Notification history data
+        history_df (pandas.DataFrame): Notification history data, or counts
+            already aggregated per day with date_only, status and count columns
         
     Returns:
         plotly.graph_objects.Figure: Stacked bar chart
     """
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     if history_df.empty:
         # Return empty figure if no history data
         fig = go.Figure()
@@ -152,14 +154,20 @@ def plot_notification_history(history_df):
         )
         return fig
     
-    # Convert date column to datetime if it's not already
-    history_df['date'] = pd.to_datetime(history_df['date'])
-    
-    # Extract date part only
-    history_df['date_only'] = history_df['date'].dt.date
-    
-    # Group by date and status
-    notification_counts = history_df.groupby(['date_only', 'status']).size().reset_index(name='count')
+    if 'count' in history_df.columns:
+        # Already aggregated, e.g. by NotificationStore.daily_status_counts
+        notification_counts = history_df
+    else:
+        history_df = history_df.copy()
+
+        # Convert date column to datetime if it's not already
+        history_df['date'] = pd.to_datetime(history_df['date'])
+        
+        # Extract date part only
+        history_df['date_only'] = history_df['date'].dt.date
+        
+        # Group by date and status
+        notification_counts = history_df.groupby(['date_only', 'status']).size().reset_index(name='count')
     
     # Create stacked bar chart
     fig = px.bar(
@@ -0,0 +1,184 @@
+import time
+import weakref
+import threading
+from collections import OrderedDict
+
+# Memory budget for datasets no session holds a handle to
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+class _Entry:
+    def __init__(self, df, label):
+        self.df = df
+        self.label = label
+        self.refs = 0
+        self.nbytes = int(df.memory_usage(deep=True).sum())
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+
+class DatasetHandle:
+    """
+    A session's reference to a dataset in a DatasetStore
+
+    The reference is released by release() or when the handle is garbage
+    collected, e.g. when the session that kept it ends.
+    """
+
+    def __init__(self, store, key, entry):
+        self.store = store
+        self.key = key
+        self._entry = entry
+        self._finalizer = weakref.finalize(self, store._release, key, entry)
+
+    def get(self):
+        """
+        Returns:
+            pandas.DataFrame: The dataset, or None if it was evicted
+        """
+        return self.store._get(self.key, self._entry)
+
+    def release(self):
+        """
+        Drop the reference to the dataset, at most once
+        """
+        self._finalizer()
+
+class DatasetStore:
+    """
+    Process-wide store of passport datasets shared by all sessions
+
+    Datasets are keyed by the content hash of their workbook, so identical
+    uploads share one DataFrame. Each entry counts the handles sessions hold
+    on it; entries without handles are kept in least recently used order and
+    dropped once their total size exceeds the memory budget.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_bytes (int): Memory budget for datasets without handles
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def acquire(self, key):
+        """
+        Get a handle on a stored dataset
+
+        Args:
+            key (str): Content hash of the dataset
+
+        Returns:
+            DatasetHandle: Handle, or None if the dataset is not stored
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.refs += 1
+            entry.last_used = time.time()
+            self._entries.move_to_end(key)
+            return DatasetHandle(self, key, entry)
+
+    def put(self, df, label=None, key=None):
+        """
+        Store a dataset and get a handle on it
+
+        When a dataset with the same key is already stored, that one is
+        shared instead.
+
+        Args:
+            df (pandas.DataFrame): Passport data
+            label (str): Name shown to admins, e.g. the uploaded file name
+            key (str): Content hash, df.attrs['source_hash'] if None
+
+        Returns:
+            DatasetHandle: Handle on the stored dataset
+        """
+        key = key or df.attrs.get('source_hash') or f"frame-{id(df)}"
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = _Entry(df, label or key[:12])
+            handle = self.acquire(key)
+            self._trim()
+            return handle
+
+    def _get(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return None
+            entry.last_used = time.time()
+            self._entries.move_to_end(key)
+            return entry.df
+
+    def _release(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                entry.refs = max(entry.refs - 1, 0)
+                self._trim()
+
+    def _trim(self):
+        idle = [(key, entry) for key, entry in self._entries.items() if entry.refs == 0]
+        idle_bytes = sum(entry.nbytes for _, entry in idle)
+        for key, entry in idle:
+            if idle_bytes <= self.max_bytes:
+                break
+            del self._entries[key]
+            idle_bytes -= entry.nbytes
+
+    def evict(self, key):
+        """
+        Drop a dataset even if sessions still hold handles on it
+
+        Sessions see the dataset as unloaded from then on.
+
+        Args:
+            key (str): Content hash of the dataset
+
+        Returns:
+            bool: True if the dataset was stored
+        """
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def entries(self):
+        """
+        Describe the stored datasets, most recently used last
+
+        Returns:
+            list: Dicts with key, label, rows, bytes, refs, loaded_at and last_used
+        """
+        with self._lock:
+            return [{
+                'key': key,
+                'label': entry.label,
+                'rows': len(entry.df),
+                'bytes': entry.nbytes,
+                'refs': entry.refs,
+                'loaded_at': entry.loaded_at,
+                'last_used': entry.last_used,
+            } for key, entry in self._entries.items()]
+
+    def total_bytes(self):
+        """
+        Returns:
+            int: Memory used by all stored datasets
+        """
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+_dataset_store = None
+_dataset_store_lock = threading.Lock()
+
+def get_dataset_store():
+    """
+    Get the process-wide dataset store
+
+    Returns:
+        DatasetStore: Store shared by all sessions of this process
+    """
+    global _dataset_store
+    with _dataset_store_lock:
+        if _dataset_store is None:
+            _dataset_store = DatasetStore()
+        return _dataset_store
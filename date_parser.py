@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+# Text date formats recognised per cell, checked in this order
+DATE_PATTERNS = {
+    '%d/%m/%Y': r'\d{1,2}/\d{1,2}/\d{4}',
+    '%d.%m.%Y': r'\d{1,2}\.\d{1,2}\.\d{4}',
+    '%d-%m-%Y': r'\d{1,2}-\d{1,2}-\d{4}',
+    '%Y-%m-%d': r'\d{4}-\d{1,2}-\d{1,2}',
+}
+
+# Native datetimes (Excel date cells) come through as ISO text with a time
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATETIME_PATTERN = r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}'
+
+# Excel serial day numbers count from this date (with the 1900 leap year bug)
+EXCEL_EPOCH = '1899-12-30'
+EXCEL_SERIAL_PATTERN = r'\d+(?:\.\d+)?'
+EXCEL_SERIAL_MAX = 2958465  # 9999-12-31
+
+# Whole days datetime64[ns] can hold
+_NS_FIRST_DAY = np.datetime64('1677-09-22')
+_NS_LAST_DAY = np.datetime64('2262-04-11')
+
+def _as_ns(values):
+    """
+    Convert parsed dates to datetime64[ns], with NaT for dates outside its
+    range (years before 1677 or after 2262) instead of wrapped values
+    """
+    values = np.asarray(values)
+    if values.dtype == np.dtype('datetime64[ns]'):
+        return values
+    in_range = ((values >= _NS_FIRST_DAY.astype(values.dtype))
+                & (values < _NS_LAST_DAY.astype(values.dtype)))
+    return np.where(in_range, values, np.datetime64('NaT')).astype('datetime64[ns]')
+
+def _parse_excel_serial(numbers):
+    numbers = pd.to_numeric(numbers, errors='coerce')
+    numbers = numbers.where((numbers >= 1) & (numbers <= EXCEL_SERIAL_MAX))
+    return pd.to_datetime(numbers, unit='D', origin=EXCEL_EPOCH, errors='coerce')
+
+def parse_date_column(values):
+    """
+    Parse a column of dates that may mix several formats
+
+    Every cell is classified by format with vectorized regex matching over the
+    whole column, then each format group is parsed with a single
+    pd.to_datetime call. Text dates are day-first. Dates that do not fit
+    datetime64[ns] (years before 1677 or after 2262) count as invalid.
+
+    Args:
+        values (pandas.Series): Raw date values (text, Excel serial numbers or datetimes)
+
+    Returns:
+        tuple: (parsed dates as a datetime64[ns] Series, dict of per-format counts
+        including 'invalid' and 'missing')
+    """
+    counts = {}
+    n = len(values)
+
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        parsed = pd.Series(_as_ns(values), index=values.index, name=values.name)
+        missing = int(values.isna().sum())
+        counts['datetime'] = int(parsed.notna().sum())
+        counts['missing'] = missing
+        counts['invalid'] = n - missing - counts['datetime']
+        return parsed, counts
+
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        parsed = pd.Series(_as_ns(_parse_excel_serial(values)), index=values.index,
+                           name=values.name)
+        missing = int(values.isna().sum())
+        counts['excel_serial'] = int(parsed.notna().sum())
+        counts['missing'] = missing
+        counts['invalid'] = n - missing - counts['excel_serial']
+        return parsed, counts
+
+    missing_mask = values.isna().to_numpy().copy()
+    text = values.astype(object).where(~missing_mask, "").astype(str).str.strip()
+    missing_mask |= (text == "").to_numpy()
+
+    result = np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]')
+    unclassified = ~missing_mask
+
+    groups = list(DATE_PATTERNS.items())
+    groups.append((DATETIME_FORMAT, DATETIME_PATTERN))
+    groups.append(('excel_serial', EXCEL_SERIAL_PATTERN))
+
+    for fmt, pattern in groups:
+        if not unclassified.any():
+            break
+        matches = text.str.fullmatch(pattern).to_numpy(dtype=bool) & unclassified
+        if not matches.any():
+            continue
+        unclassified &= ~matches
+
+        if fmt == 'excel_serial':
+            parsed = _parse_excel_serial(text[matches])
+            label = fmt
+        else:
+            parsed = pd.to_datetime(text[matches], format=fmt, errors='coerce')
+            label = 'datetime' if fmt == DATETIME_FORMAT else fmt
+
+        parsed = _as_ns(parsed)
+        result[matches] = parsed
+        counts[label] = counts.get(label, 0) + int((~np.isnat(parsed)).sum())
+
+    parsed = pd.Series(result, index=values.index, name=values.name)
+    missing = int(missing_mask.sum())
+    counts['missing'] = missing
+    counts['invalid'] = n - missing - sum(
+        count for label, count in counts.items() if label != 'missing')
+    return parsed, counts
@@ -0,0 +1,304 @@
+import re
+from difflib import SequenceMatcher
+import numpy as np
+import pandas as pd
+
+from compact_layout import date_column, is_compact, unpack_passports
+from search_index import fold_names
+
+# Pairs scoring at least this confidence are the same customer
+DEFAULT_THRESHOLD = 0.85
+
+# Pairs whose names are less similar than this are never merged, unless
+# they share a passport number
+MIN_NAME_SIMILARITY = 0.6
+
+# Weight of each piece of evidence in the confidence of a pair
+NAME_WEIGHT = 0.6
+DOB_WEIGHT = 0.25
+PHONE_WEIGHT = 0.15
+
+# Each row is compared with this many following rows of its block, so large
+# blocks (common names) stay linear
+BLOCK_WINDOW = 10
+
+# Titles left out of name comparisons
+_TITLES = {'mr', 'mrs', 'ms', 'miss', 'dr', 'shri', 'smt', 'master', 'kumari'}
+
+# Spelling variants mapped to one sound, applied in order
+_PHONETIC_RULES = [
+    ("chh", "c"), ("ch", "c"), ("sh", "s"), ("ph", "f"), ("kh", "k"), ("gh", "g"),
+    ("th", "t"), ("dh", "d"), ("bh", "b"), ("jh", "j"), ("ck", "k"), ("q", "k"),
+    ("w", "v"), ("z", "j"), ("x", "ks"), ("y", "i"),
+]
+
+def phonetic_key(word):
+    """
+    Reduce a folded word to a key shared by its common spelling variants
+
+    Digraphs are mapped to one letter, vowels and 'h' after the first letter
+    are dropped and repeated letters collapsed, so e.g. 'Mustafa' and
+    'Mustufa' or 'Chhatriwala' and 'Chatriwalla' get the same key.
+
+    Args:
+        word (str): Folded word
+
+    Returns:
+        str: Phonetic key, '' for words without letters
+    """
+    word = re.sub(r"[^a-z]", "", word)
+    if not word:
+        return ""
+    for pattern, sound in _PHONETIC_RULES:
+        word = word.replace(pattern, sound)
+    rest = re.sub(r"[aeiouh]", "", word[1:])
+    return re.sub(r"(.)\1+", r"\1", word[0] + rest)
+
+def _name_words(name):
+    return [word for word in re.findall(r"[a-z0-9]+", name) if word not in _TITLES]
+
+def name_keys(names):
+    """
+    Get the comparable name and the phonetic key of each name
+
+    Args:
+        names (pandas.Series): Names
+
+    Returns:
+        tuple: (names without titles and punctuation, words sorted, and
+        phonetic keys of their words, sorted), both object arrays
+    """
+    folded = fold_names(names)
+    inverse, unique = pd.factorize(folded.to_numpy(dtype=object))
+    words = [_name_words(name) for name in unique]
+    comparable = np.array([" ".join(sorted(name)) for name in words], dtype=object)
+    keys = np.array([" ".join(sorted(phonetic_key(word) for word in name)) for name in words],
+                    dtype=object)
+    return comparable[inverse], keys[inverse]
+
+def name_similarity(left, right):
+    """
+    Compare two names from name_keys
+
+    Args:
+        left (str): First name
+        right (str): Second name
+
+    Returns:
+        float: Similarity between 0 and 1
+    """
+    if left == right:
+        return 1.0
+    if not left or not right:
+        return 0.0
+    return SequenceMatcher(None, left, right).ratio()
+
+def _text_column(values):
+    return values.astype(object).where(values.notna(), "").astype(str).str.strip()
+
+def _identity_columns(df):
+    if is_compact(df):
+        phones = df["Phone"].astype(str).where(df["Phone"] != 0, "")
+        passports = df["Passport"]
+        if passports.dtype == np.int64:
+            passports = pd.Series(unpack_passports(passports), index=df.index)
+    else:
+        phones = df["PhoneDigits"].astype(str)
+        passports = df["Passport"]
+    dob = date_column(df, "DOB").to_numpy(dtype='datetime64[D]').astype(np.int64)
+    return (dob, phones.to_numpy(dtype=object),
+            _text_column(passports).str.upper().to_numpy(dtype=object))
+
+def _block_pairs(block, order, usable):
+    """
+    Pair each row with the next BLOCK_WINDOW rows of the same block
+
+    Args:
+        block (numpy.ndarray): Block hash per row
+        order (numpy.ndarray): Rows sorted by block, then by closeness within it
+        usable (numpy.ndarray): Boolean mask of rows that have a block
+
+    Returns:
+        tuple: (left rows, right rows)
+    """
+    order = order[usable[order]]
+    blocks = block[order]
+    left = []
+    right = []
+    for distance in range(1, min(BLOCK_WINDOW, len(order) - 1) + 1):
+        same = blocks[:-distance] == blocks[distance:]
+        left.append(order[:-distance][same])
+        right.append(order[distance:][same])
+    if not left:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(left), np.concatenate(right)
+
+class DuplicateIndex:
+    """
+    Candidate duplicate pairs of a passport DataFrame with their confidence
+
+    Rows are blocked twice: by (date of birth, phone digits) and by the
+    phonetic key of the name, ordered by date of birth within the block.
+    Only rows close to each other within a block are compared, so the cost
+    grows with the number of rows rather than with its square.
+
+    A pair's confidence weighs name similarity with matching date of birth
+    and phone; a shared passport number is a certain match and two different
+    passport numbers rule a match out (twins and siblings often share a name
+    pattern, a date of birth and a parent's phone). Pairs sharing none of
+    date of birth, phone and passport number are not scored.
+    """
+
+    def __init__(self, df):
+        """
+        Find and score the candidate pairs
+
+        Args:
+            df (pandas.DataFrame): Passport data, in either layout
+        """
+        self.labels = df.index.to_numpy()
+        names, name_blocks = name_keys(df["Name"])
+        dob, phones, passports = _identity_columns(df)
+        rows = len(df)
+
+        pairs = []
+        has_dob = dob != np.iinfo(np.int64).min
+        contact = has_dob & (phones != "")
+        if contact.any():
+            block = pd.util.hash_array((pd.Series(phones) + "|" + pd.Series(dob).astype(str))
+                                       .to_numpy(dtype=object))
+            pairs.append(_block_pairs(block, np.lexsort((np.arange(rows), block)), contact))
+        named = name_blocks != ""
+        if named.any():
+            block = pd.util.hash_array(name_blocks)
+            name_order = pd.factorize(names, sort=True)[0]
+            pairs.append(_block_pairs(block, np.lexsort((name_order, dob, block)), named))
+
+        left = np.concatenate([pair[0] for pair in pairs]) if pairs else np.empty(0, np.int64)
+        right = np.concatenate([pair[1] for pair in pairs]) if pairs else np.empty(0, np.int64)
+        # The same pair may come from both blockings, either way round
+        low = np.minimum(left, right).astype(np.int64)
+        high = np.maximum(left, right).astype(np.int64)
+        packed = np.sort(low * max(rows, 1) + high)
+        if len(packed):
+            packed = packed[np.concatenate(([True], packed[1:] != packed[:-1]))]
+        left = packed // max(rows, 1)
+        right = packed % max(rows, 1)
+
+        # Names alone never make a match, the pair must also share a date of
+        # birth, a phone or a passport number
+        shared = ((dob[left] == dob[right])
+                  | ((phones[left] != "") & (phones[left] == phones[right]))
+                  | ((passports[left] != "") & (passports[left] == passports[right])))
+        self.left = left[shared]
+        self.right = right[shared]
+        self.passports = passports
+        self.scores = self._score(names, dob, phones, passports)
+
+    def _score(self, names, dob, phones, passports):
+        scores = np.zeros(len(self.left))
+        for at, (i, j) in enumerate(zip(self.left.tolist(), self.right.tolist())):
+            if passports[i] and passports[j]:
+                # Two passport numbers settle it either way
+                scores[at] = float(passports[i] == passports[j])
+                continue
+            similarity = name_similarity(names[i], names[j])
+            if similarity < MIN_NAME_SIMILARITY:
+                continue
+            same_phone = bool(phones[i]) and phones[i] == phones[j]
+            scores[at] = (NAME_WEIGHT * similarity + DOB_WEIGHT * (dob[i] == dob[j])
+                          + PHONE_WEIGHT * same_phone)
+        return scores
+
+    def clusters(self, threshold=DEFAULT_THRESHOLD):
+        """
+        Group the rows into clusters of the same customer
+
+        Pairs at or above the threshold are joined with a union-find, the
+        strongest pairs first. Two clusters holding different passport
+        numbers are never joined, even through rows without one. A
+        cluster's confidence is its weakest joining pair.
+
+        Args:
+            threshold (float): Minimum pair confidence
+
+        Returns:
+            pandas.DataFrame: Columns Cluster, Confidence and Size, indexed
+            by the row labels of the rows in clusters of two or more
+        """
+        accepted = np.flatnonzero(self.scores >= threshold)
+        accepted = accepted[np.argsort(-self.scores[accepted], kind='stable')]
+
+        parent = {}
+        confidence = {}
+        # Passport number held by each cluster root, if any
+        passport = {}
+
+        def find(row):
+            root = row
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while parent.get(row, row) != root:
+                parent[row], row = root, parent[row]
+            return root
+
+        for at in accepted.tolist():
+            first = find(int(self.left[at]))
+            second = find(int(self.right[at]))
+            if first == second:
+                continue
+            first_passport = passport.get(first, self.passports[first])
+            second_passport = passport.get(second, self.passports[second])
+            if first_passport and second_passport and first_passport != second_passport:
+                continue
+            root, child = min(first, second), max(first, second)
+            parent[child] = root
+            passport[root] = first_passport or second_passport
+            passport.pop(child, None)
+            confidence[root] = min(confidence.get(root, 1.0), confidence.pop(child, 1.0),
+                                   float(self.scores[at]))
+
+        if not parent:
+            return pd.DataFrame({'Cluster': pd.Series(dtype=np.int64),
+                                 'Confidence': pd.Series(dtype=float),
+                                 'Size': pd.Series(dtype=np.int64)})
+
+        rows = np.array(sorted(set(parent) | set(parent.values())))
+        roots = np.array([find(row) for row in rows.tolist()])
+        # Clusters are numbered by their first row
+        _, cluster, size = np.unique(roots, return_inverse=True, return_counts=True)
+        return pd.DataFrame({
+            'Cluster': cluster,
+            'Confidence': [round(confidence[root], 3) for root in roots.tolist()],
+            'Size': size[cluster],
+        }, index=self.labels[rows])
+
+def collapse_duplicates(selected, clusters, preferred=None):
+    """
+    Keep one row per duplicate cluster
+
+    Args:
+        selected (pandas.DataFrame): Rows picked for a send, indexed like
+            the frame the clusters were found in
+        clusters (pandas.DataFrame): Output of DuplicateIndex.clusters
+        preferred (numpy.ndarray): Boolean mask of rows to keep first, e.g.
+            rows with a valid phone; otherwise the first row is kept
+
+    Returns:
+        tuple: (selected without the other rows of each cluster, number of
+        rows dropped)
+    """
+    if selected.empty or clusters.empty:
+        return selected, 0
+
+    cluster = clusters["Cluster"].reindex(selected.index).to_numpy()
+    in_cluster = ~np.isnan(cluster)
+    if not in_cluster.any():
+        return selected, 0
+
+    if preferred is None:
+        preferred = np.ones(len(selected), dtype=bool)
+    order = np.lexsort((np.arange(len(selected)), ~np.asarray(preferred, dtype=bool)))
+    repeated = np.zeros(len(selected), dtype=bool)
+    repeated[order] = pd.Series(cluster[order]).duplicated().to_numpy() & in_cluster[order]
+    return selected[~repeated], int(repeated.sum())
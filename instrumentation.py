@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import functools
+import collections
+
+# Set to 1 to start with instrumentation enabled; it is off by default as
+# every stage then reads /proc for the memory of the process
+ENV_VAR = "PASSPORT_INSTRUMENTATION"
+
+# Number of stage records kept in memory, older ones are dropped
+RING_SIZE = 2000
+
+# Prefix of the exported Prometheus metrics
+METRIC_PREFIX = "passport_stage"
+
+_enabled = os.environ.get(ENV_VAR, "0").strip().lower() in ("1", "true", "yes", "on")
+_records = collections.deque(maxlen=RING_SIZE)
+# Per stage since start: calls, seconds, rows, errors
+_totals = {}
+_lock = threading.Lock()
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+# Descriptor of /proc/self/statm and the process it was opened in, reading
+# it again is much cheaper than opening it for every stage
+_statm = (None, None)
+
+def _rss_bytes():
+    """
+    Resident memory of the process, None where /proc is not available
+    """
+    global _statm
+    if _PAGE_SIZE is None:
+        return None
+    pid, fd = _statm
+    try:
+        # A forked child inherits the descriptor of its parent's file
+        if pid != os.getpid():
+            fd = os.open("/proc/self/statm", os.O_RDONLY)
+            _statm = (os.getpid(), fd)
+        return int(os.pread(fd, 128, 0).split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def enable():
+    """
+    Start recording stages
+    """
+    global _enabled
+    _enabled = True
+
+def disable():
+    """
+    Stop recording stages; the instrumented code then only pays for a flag check
+    """
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    """
+    Returns:
+        bool: True if stages are being recorded
+    """
+    return _enabled
+
+def count_rows(result):
+    """
+    Count the rows of a stage result: the length of a frame, array or list,
+    or of the first element of a tuple such as (records, total)
+
+    Args:
+        result: Value returned by the stage
+
+    Returns:
+        int: Number of rows, or None if the result has none
+    """
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, (str, bytes, dict)) or not hasattr(result, '__len__'):
+        return None
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+class Span:
+    """
+    Timing of one stage, recorded when the with block exits
+
+    Set rows (and details) inside the block to record what the stage
+    processed.
+    """
+
+    __slots__ = ('name', 'rows', 'details', '_start', '_started', '_memory')
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.details = {}
+
+    def __enter__(self):
+        self._started = time.time()
+        self._memory = _rss_bytes()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        memory = _rss_bytes()
+        record = {
+            'stage': self.name,
+            'started': self._started,
+            'seconds': seconds,
+            'rows': self.rows,
+            'memory_delta': None if memory is None or self._memory is None
+                            else memory - self._memory,
+            'error': None if exc_type is None else exc_type.__name__,
+        }
+        if self.details:
+            record['details'] = self.details
+        _record(record)
+        return False
+
+class _NullSpan:
+    """
+    Span handed out while instrumentation is disabled, it records nothing
+    """
+
+    __slots__ = ()
+    name = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    # Assignments inside the with block are ignored
+    def __setattr__(self, name, value):
+        pass
+
+    @property
+    def details(self):
+        return {}
+
+_NULL_SPAN = _NullSpan()
+
+def _record(record):
+    with _lock:
+        _records.append(record)
+        totals = _totals.setdefault(record['stage'], [0, 0.0, 0, 0])
+        totals[0] += 1
+        totals[1] += record['seconds']
+        totals[2] += record['rows'] or 0
+        totals[3] += record['error'] is not None
+
+def stage(name, rows=None):
+    """
+    Time a block of code as a stage
+
+    Usage:
+        with stage("load.read") as span:
+            df = pd.read_excel(path)
+            span.rows = len(df)
+
+    Args:
+        name (str): Stage name, dotted by area, e.g. 'load', 'index.birthday'
+        rows (int): Number of rows processed, if known upfront
+
+    Returns:
+        Span: Context manager recording the stage, or a no-op one while
+        instrumentation is disabled
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, rows)
+
+def timed(name, rows=count_rows):
+    """
+    Decorator timing every call of a function as a stage
+
+    Args:
+        name (str): Stage name
+        rows (callable): Function of the result giving the number of rows,
+            None to record no rows
+
+    Returns:
+        callable: Decorator
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name) as span:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    span.rows = rows(result)
+            return result
+        return wrapper
+    return decorator
+
+def records(stage_prefix=None):
+    """
+    Get the recorded stages, oldest first
+
+    Args:
+        stage_prefix (str): Only stages whose name starts with this
+
+    Returns:
+        list: Dicts with stage, started (epoch seconds), seconds, rows,
+        memory_delta (bytes), error and optionally details
+    """
+    with _lock:
+        entries = list(_records)
+    if stage_prefix:
+        entries = [entry for entry in entries if entry['stage'].startswith(stage_prefix)]
+    return entries
+
+def totals():
+    """
+    Get the totals per stage since start or the last reset
+
+    Returns:
+        dict: Stage name to dict with calls, seconds, rows and errors
+    """
+    with _lock:
+        return {name: {'calls': calls, 'seconds': seconds, 'rows': rows, 'errors': errors}
+                for name, (calls, seconds, rows, errors) in _totals.items()}
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+def summary():
+    """
+    Summarise the stages in the ring buffer
+
+    Returns:
+        list: Per stage, slowest total first: dicts with stage, calls,
+        last_ms, p50_ms, p95_ms, max_ms, rows (of the last call) and
+        memory_mb (largest memory delta)
+    """
+    by_stage = collections.defaultdict(list)
+    for entry in records():
+        by_stage[entry['stage']].append(entry)
+
+    rows = []
+    for name, entries in by_stage.items():
+        seconds = [entry['seconds'] for entry in entries]
+        deltas = [entry['memory_delta'] for entry in entries if entry['memory_delta'] is not None]
+        rows.append({
+            'stage': name,
+            'calls': len(entries),
+            'last_ms': seconds[-1] * 1000,
+            'p50_ms': _percentile(seconds, 0.5) * 1000,
+            'p95_ms': _percentile(seconds, 0.95) * 1000,
+            'max_ms': max(seconds) * 1000,
+            'rows': entries[-1]['rows'],
+            'memory_mb': max(deltas) / 1024 / 1024 if deltas else None,
+            '_total': sum(seconds),
+        })
+    rows.sort(key=lambda row: row.pop('_total'), reverse=True)
+    return rows
+
+def reset():
+    """
+    Forget all recorded stages and totals
+    """
+    with _lock:
+        _records.clear()
+        _totals.clear()
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def export_prometheus(path=None):
+    """
+    Export the stage totals and latest timings in the Prometheus text format
+
+    Args:
+        path (str): File to write, e.g. for the node exporter's textfile
+            collector; nothing is written if None
+
+    Returns:
+        str: Exported text
+    """
+    stage_totals = totals()
+    last = {entry['stage']: entry for entry in records()}
+    metrics = [
+        ('calls_total', 'counter', "Calls of the stage",
+         {name: total['calls'] for name, total in stage_totals.items()}),
+        ('seconds_total', 'counter', "Wall time spent in the stage",
+         {name: total['seconds'] for name, total in stage_totals.items()}),
+        ('rows_total', 'counter', "Rows processed by the stage",
+         {name: total['rows'] for name, total in stage_totals.items()}),
+        ('errors_total', 'counter', "Calls of the stage that raised",
+         {name: total['errors'] for name, total in stage_totals.items()}),
+        ('last_seconds', 'gauge', "Wall time of the latest call",
+         {name: entry['seconds'] for name, entry in last.items()}),
+        ('last_memory_delta_bytes', 'gauge', "Resident memory change of the latest call",
+         {name: entry['memory_delta'] for name, entry in last.items()
+          if entry['memory_delta'] is not None}),
+    ]
+
+    lines = []
+    for suffix, kind, help_text, values in metrics:
+        metric = f"{METRIC_PREFIX}_{suffix}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name in sorted(values):
+            lines.append(f"{metric}{{stage=\"{_label(name)}\"}} {values[name]:g}")
+    text = "\n".join(lines) + "\n"
+
+    if path is not None:
+        _write_atomic(path, text)
+    return text
+
+def export_json(path=None):
+    """
+    Export the recorded stages and totals as JSON
+
+    Args:
+        path (str): File to write; nothing is written if None
+
+    Returns:
+        str: Exported JSON document
+    """
+    text = json.dumps({'enabled': _enabled, 'totals': totals(), 'records': records()},
+                      default=str, indent=2)
+    if path is not None:
+        _write_atomic(path, text)
+    return text
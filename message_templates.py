@@ -1,5 +1,12 @@
 import os
 import json
+import string
+import tempfile
+import threading
+import functools
+import itertools
+import numpy as np
+import pandas as pd
 
 # Default templates
 DEFAULT_TEMPLATES = {
@@ -33,6 +40,82 @@ Contact us today for assistance.
 # File to store templates
 TEMPLATES_FILE = "message_templates.json"
 
+class TemplateRegistry:
+    """
+    In-process cache of the templates file, re-read only when the file's
+    mtime or size changes
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path to the templates JSON file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._templates = None
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def get(self):
+        """
+        Get the current templates
+
+        Returns:
+            dict: Message templates (a copy the caller may modify)
+        """
+        signature = self._stat_signature()
+        with self._lock:
+            if self._templates is None or signature != self._signature:
+                if signature is None:
+                    templates = DEFAULT_TEMPLATES
+                else:
+                    try:
+                        with open(self.path, 'r') as f:
+                            templates = json.load(f)
+                    except Exception:
+                        templates = DEFAULT_TEMPLATES
+                self._templates = dict(templates)
+                self._signature = signature
+            return dict(self._templates)
+
+    def save(self, templates):
+        """
+        Atomically replace the templates file
+
+        The data is written to a temporary file in the same directory and
+        renamed over the old file, so readers see either version in full.
+
+        Args:
+            templates (dict): Message templates
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".templates-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(templates, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates private files, keep the usual permissions
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            self._templates = dict(templates)
+            self._signature = self._stat_signature()
+
+_registry = TemplateRegistry(TEMPLATES_FILE)
+
 def get_templates():
     """
     Get message templates from file or use defaults
@@ -40,15 +123,7 @@ def get_templates():
     Returns:
         dict: Message templates
     """
-    try:
-        if os.path.exists(TEMPLATES_FILE):
-            with open(TEMPLATES_FILE, 'r') as f:
-                templates = json.load(f)
-            return templates
-        else:
-            return DEFAULT_TEMPLATES
-    except Exception:
-        return DEFAULT_TEMPLATES
+    return _registry.get()
 
 def save_template(templates):
     """
@@ -61,13 +136,173 @@ def save_template(templates):
         bool: True if saved successfully, False otherwise
     """
     try:
-        with open(TEMPLATES_FILE, 'w') as f:
-            json.dump(templates, f, indent=4)
+        _registry.save(templates)
         return True
     except Exception as e:
         print(f"Error saving templates: {e}")
         return False
 
+def _root(name):
+    return name.split(".")[0].split("[")[0]
+
+def _needs_format(field):
+    name, _, formatted = field
+    return formatted or "." in name or "[" in name
+
+def _format_value(field, value):
+    """
+    Format one placeholder value the way str.format would
+    """
+    name, placeholder, _ = field
+    if _needs_format(field):
+        # Conversions, format specs and attribute lookups need str.format
+        return ("{0" + placeholder[len(_root(name)) + 1:]).format(value)
+    return format(value)
+
+def _is_missing(value):
+    return value is None or (pd.api.types.is_scalar(value) and bool(pd.isna(value)))
+
+class CompiledTemplate:
+    """
+    Message template parsed once into literal text and placeholders, so it can
+    be rendered for many recipients without re-parsing
+    """
+
+    def __init__(self, template):
+        """
+        Parse a template
+
+        Args:
+            template (str): Message template with placeholders
+
+        Raises:
+            ValueError: If the template has unbalanced braces
+        """
+        self.template = template
+        self.literals = []
+        self.fields = []
+
+        pending = ""
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(template):
+            pending += literal
+            if field_name is None:
+                continue
+            placeholder = "{" + field_name
+            if conversion:
+                placeholder += "!" + conversion
+            if format_spec:
+                placeholder += ":" + format_spec
+            placeholder += "}"
+            self.literals.append(pending)
+            self.fields.append((field_name, placeholder, bool(conversion or format_spec)))
+            pending = ""
+        self.literals.append(pending)
+
+    @property
+    def field_names(self):
+        """Names of the placeholders in template order, without duplicates"""
+        return list(dict.fromkeys(name for name, _, _ in self.fields))
+
+    def render(self, data):
+        """
+        Render the template for one recipient
+
+        Values are formatted as render_batch formats them, and placeholders
+        whose value is missing (None, NaN, NA) are left in the message as-is.
+
+        Args:
+            data (dict): Data to fill placeholders
+
+        Returns:
+            str: Generated message
+
+        Raises:
+            KeyError: If a placeholder has no data
+        """
+        parts = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            name, placeholder, _ = field
+            value = data[_root(name)]
+            parts.append(placeholder if _is_missing(value) else _format_value(field, value))
+            parts.append(literal)
+        return "".join(parts)
+
+    def _render_field(self, field, values):
+        if not _needs_format(field) and values.dtype == "str":
+            # Text is its own rendering
+            return values.to_numpy(dtype=object)
+        return np.array([_format_value(field, value) for value in values.tolist()], dtype=object)
+
+    def render_batch(self, recipients):
+        """
+        Render the template for many recipients at once
+
+        Placeholders without data are left in the message as-is.
+
+        Args:
+            recipients (pandas.DataFrame or list): Recipient data, one row or
+                dict per recipient
+
+        Returns:
+            tuple: (numpy array of messages, numpy bool array marking rows with
+            missing placeholder data)
+        """
+        if not isinstance(recipients, pd.DataFrame):
+            recipients = pd.DataFrame.from_records(list(recipients))
+
+        n = len(recipients)
+        missing = np.zeros(n, dtype=bool)
+        pieces = [itertools.repeat(self.literals[0])]
+
+        for field, literal in zip(self.fields, self.literals[1:]):
+            name, placeholder, _ = field
+            root = _root(name)
+            text = np.full(n, placeholder, dtype=object)
+            if root not in recipients.columns:
+                missing[:] = True
+                pieces += [text, itertools.repeat(literal)]
+                continue
+
+            values = recipients[root]
+            absent = values.isna().to_numpy()
+            if not absent.all():
+                text[~absent] = self._render_field(field, values[~absent])
+            missing |= absent
+            pieces += [text, itertools.repeat(literal)]
+
+        # Join literal text and rendered values row by row in one C-level pass
+        messages = np.full(n, self.literals[0], dtype=object)
+        if self.fields:
+            messages[:] = list(map("".join, zip(*pieces)))
+
+        return messages, missing
+
+@functools.lru_cache(maxsize=64)
+def compile_template(template):
+    """
+    Get the compiled form of a template, parsing each distinct template once
+    
+    Args:
+        template (str): Message template with placeholders
+        
+    Returns:
+        CompiledTemplate: Parsed template
+    """
+    return CompiledTemplate(template)
+
+def generate_messages(template, recipients):
+    """
+    Generate messages for many recipients from one template
+    
+    Args:
+        template (str): Message template with placeholders
+        recipients (pandas.DataFrame or list): Recipient data, one row or dict per recipient
+        
+    Returns:
+        tuple: (numpy array of messages, numpy bool array marking rows with missing data)
+    """
+    return compile_template(template).render_batch(recipients)
+
 def generate_message(template, data):
     """
     Generate message from template and data
@@ -80,7 +315,7 @@ def generate_message(template, data):
         str: Generated message
     """
     try:
-        return template.format(**data)
+        return compile_template(template).render(data)
     except KeyError as e:
         print(f"Missing data for template: {e}")
         return f"Error generating message: Missing {e} data"
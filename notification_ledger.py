@@ -0,0 +1,223 @@
+import sqlite3
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+
+from notification_store import DB_FILE
+
+# Digests looked up or claimed per SQL statement
+LOOKUP_CHUNK_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    digest INTEGER PRIMARY KEY,
+    event TEXT NOT NULL,
+    event_date TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    sid TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_event_date ON ledger(event_date);
+"""
+
+def event_digests(event, event_dates, passports, phones):
+    """
+    Hash (passport, event type, event date) triples into 64-bit ledger keys
+
+    Rows without a passport number are keyed on their phone number instead.
+
+    Args:
+        event (str): Event type, e.g. 'Birthday' or 'Expiry'
+        event_dates (pandas.Series or str): Event dates as 'YYYY-MM-DD', or one date for all rows
+        passports (pandas.Series): Passport numbers
+        phones (pandas.Series): Phone numbers, aligned with passports
+
+    Returns:
+        numpy.ndarray: int64 digests, one per row
+    """
+    passports = pd.Series(passports).astype(object)
+    phones = pd.Series(phones, index=passports.index).astype(str)
+    identity = passports.where(passports.notna(), "tel:" + phones)
+    if not isinstance(event_dates, str):
+        event_dates = pd.Series(event_dates, index=passports.index).astype(str)
+    keys = (f"{event}\x1f" + event_dates + "\x1f" + identity.astype(str)).to_numpy(dtype=object)
+    return pd.util.hash_array(keys).view(np.int64)
+
+def _chunks(values):
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        yield values[start:start + LOOKUP_CHUNK_SIZE]
+
+class NotificationLedger:
+    """
+    Record of which customer was already notified for which event
+
+    Each (passport, event type, event date) triple is stored as a single
+    64-bit digest in an integer primary key, so checks are B-tree lookups on
+    a compact table. A send claims its digest first and releases it if the
+    send failed, which keeps concurrent sessions and reruns from sending the
+    same event twice.
+
+    The Messages API has no idempotency key, so a claim is only released
+    when the send certainly failed; one whose outcome is unknown stays
+    claimed for manual review rather than being sent again. Once the
+    provider accepted a message, its sid is stored with the claim.
+    """
+
+    def __init__(self, path=DB_FILE):
+        """
+        Open (and create if needed) the ledger
+
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # Ledgers created before sids were stored
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(ledger)")]
+        if 'sid' not in columns:
+            self._conn.execute("ALTER TABLE ledger ADD COLUMN sid TEXT")
+
+    def _existing(self, digests):
+        found = set()
+        for chunk in _chunks(digests):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(row[0] for row in self._conn.execute(
+                f"SELECT digest FROM ledger WHERE digest IN ({placeholders})", chunk))
+        return found
+
+    def contains_many(self, digests):
+        """
+        Check which digests are already recorded
+
+        Args:
+            digests (numpy.ndarray): Output of event_digests
+
+        Returns:
+            numpy.ndarray: Boolean mask, True where the event was already notified
+        """
+        digests = [int(digest) for digest in digests]
+        with self._lock:
+            found = self._existing(digests)
+        return np.fromiter((digest in found for digest in digests), dtype=bool,
+                           count=len(digests))
+
+    def claim_many(self, digests, event, event_dates):
+        """
+        Record digests that are not recorded yet, atomically
+
+        Args:
+            digests (numpy.ndarray): Output of event_digests
+            event (str): Event type, stored for pruning and inspection
+            event_dates (pandas.Series or str): Event dates aligned with digests, or one date
+
+        Returns:
+            numpy.ndarray: Boolean mask, True where this call recorded the digest
+        """
+        digests = [int(digest) for digest in digests]
+        if isinstance(event_dates, str):
+            event_dates = [event_dates] * len(digests)
+        else:
+            event_dates = [str(date) for date in event_dates]
+        recorded_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                found = self._existing(digests)
+                claimed = np.fromiter((digest not in found for digest in digests), dtype=bool,
+                                      count=len(digests))
+                # INSERT OR IGNORE also handles a digest repeated within the batch
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO ledger (digest, event, event_date, recorded_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(digest, event, date, recorded_at)
+                     for digest, date, new in zip(digests, event_dates, claimed) if new])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def release_many(self, digests):
+        """
+        Forget digests whose send failed so they can be retried
+
+        Args:
+            digests (numpy.ndarray): Digests to remove
+        """
+        with self._lock:
+            self._conn.executemany("DELETE FROM ledger WHERE digest = ?",
+                                   [(int(digest),) for digest in digests])
+
+    def confirm_many(self, digests, sids):
+        """
+        Store the provider message sids of claimed events that were delivered
+
+        Args:
+            digests (iterable): Claimed digests
+            sids (iterable): Message sids aligned with digests
+        """
+        with self._lock:
+            self._conn.executemany("UPDATE ledger SET sid = ? WHERE digest = ?",
+                                   [(sid, int(digest)) for digest, sid in zip(digests, sids)])
+
+    def claim(self, event, event_date, passport, phone):
+        """
+        Record a single event unless it was already notified
+
+        Args:
+            event (str): Event type
+            event_date (str): Event date as 'YYYY-MM-DD'
+            passport (str): Passport number
+            phone (str): Phone number, used when there is no passport number
+
+        Returns:
+            bool: True if the event was recorded by this call
+        """
+        digests = event_digests(event, event_date, [passport], [phone])
+        return bool(self.claim_many(digests, event, event_date)[0])
+
+    def release(self, event, event_date, passport, phone):
+        """
+        Forget a single event whose send failed
+
+        Args:
+            event (str): Event type
+            event_date (str): Event date as 'YYYY-MM-DD'
+            passport (str): Passport number
+            phone (str): Phone number, used when there is no passport number
+        """
+        self.release_many(event_digests(event, event_date, [passport], [phone]))
+
+    def prune(self, before):
+        """
+        Drop events dated before a given date
+
+        Args:
+            before (str): Date as 'YYYY-MM-DD'
+
+        Returns:
+            int: Number of removed entries
+        """
+        with self._lock:
+            return self._conn.execute("DELETE FROM ledger WHERE event_date < ?",
+                                      (str(before),)).rowcount
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+def get_ledger():
+    """
+    Get the process-wide notification ledger
+
+    Returns:
+        NotificationLedger: Shared ledger backed by DB_FILE
+    """
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = NotificationLedger()
+        return _ledger
@@ -0,0 +1,288 @@
+import sqlite3
+import datetime
+import threading
+import pandas as pd
+
+# SQLite database holding the notification history and sent messages
+DB_FILE = "notifications.db"
+
+NOTIFICATION_COLUMNS = ['date', 'name', 'phone', 'type', 'status']
+MESSAGE_COLUMNS = ['timestamp', 'phone', 'message', 'type']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    name TEXT,
+    phone TEXT,
+    type TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_date ON notifications(date);
+CREATE INDEX IF NOT EXISTS idx_notifications_phone ON notifications(phone);
+CREATE INDEX IF NOT EXISTS idx_notifications_type ON notifications(type);
+CREATE INDEX IF NOT EXISTS idx_notifications_status ON notifications(status);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    phone TEXT,
+    message TEXT,
+    type TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_phone ON messages(phone);
+"""
+
+def _now():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+class NotificationStore:
+    """
+    Append-only notification log in SQLite (WAL mode)
+
+    Every record is committed as soon as it is added, so other processes
+    see it at once and a crash loses nothing that was reported as logged.
+    Callers recording many outcomes at once use the bulk methods, which
+    write them in a single transaction.
+    """
+
+    def __init__(self, path=DB_FILE):
+        """
+        Open (and create if needed) the store
+
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def add_notification(self, name, phone, type, status, date=None):
+        """
+        Record a notification event
+
+        Args:
+            name (str): Recipient name
+            phone (str): Recipient phone number
+            type (str): Notification type, e.g. 'Birthday' or 'Expiry'
+            status (str): Outcome, e.g. 'Sent' or 'Failed'
+            date (str): Event time as 'YYYY-MM-DD HH:MM:SS', now if None
+        """
+        self.add_notifications([{'name': name, 'phone': phone, 'type': type,
+                                 'status': status, 'date': date}])
+
+    def add_notifications(self, records):
+        """
+        Record several notification events in one transaction
+
+        Args:
+            records (iterable): Dictionaries with name, phone, type and status
+                keys, and an optional date ('YYYY-MM-DD HH:MM:SS', now if missing)
+        """
+        now = _now()
+        rows = [(record.get('date') or now, record['name'], record['phone'],
+                 record['type'], record['status']) for record in records]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO notifications (date, name, phone, type, status) VALUES (?, ?, ?, ?, ?)",
+                rows)
+
+    def add_message(self, phone, message, message_type="Direct", timestamp=None):
+        """
+        Record the content of a message
+
+        Args:
+            phone (str): Phone number the message was sent to
+            message (str): Message content
+            message_type (str): Type of message
+            timestamp (str): Time as 'YYYY-MM-DD HH:MM:SS', now if None
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO messages (timestamp, phone, message, type) VALUES (?, ?, ?, ?)",
+                (timestamp or _now(), phone, message, message_type))
+
+    def _where(self, type=None, status=None, phone=None, since=None, until=None):
+        clauses = []
+        params = []
+        for column, value in (('type', type), ('status', status), ('phone', phone)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("date >= ?")
+            params.append(str(since))
+        if until is not None:
+            clauses.append("date < ?")
+            params.append(str(until))
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def count_notifications(self, **filters):
+        """
+        Count notifications matching the filters
+
+        Args:
+            **filters: Optional type, status, phone, since and until filters
+
+        Returns:
+            int: Number of matching notifications
+        """
+        where, params = self._where(**filters)
+        return self._query(f"SELECT COUNT(*) FROM notifications{where}", params)[0][0]
+
+    def query_notifications(self, limit=50, offset=0, **filters):
+        """
+        Get one page of notifications, newest first
+
+        Args:
+            limit (int): Page size
+            offset (int): Number of notifications to skip
+            **filters: Optional type, status, phone, since and until filters
+
+        Returns:
+            pandas.DataFrame: Notifications with the NOTIFICATION_COLUMNS columns
+        """
+        where, params = self._where(**filters)
+        rows = self._query(
+            f"SELECT date, name, phone, type, status FROM notifications{where} "
+            "ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset])
+        return pd.DataFrame(rows, columns=NOTIFICATION_COLUMNS)
+
+    def status_counts(self, **filters):
+        """
+        Count notifications per status
+
+        Args:
+            **filters: Optional type, status, phone, since and until filters
+
+        Returns:
+            dict: Number of notifications keyed by status
+        """
+        where, params = self._where(**filters)
+        rows = self._query(
+            f"SELECT status, COUNT(*) FROM notifications{where} GROUP BY status", params)
+        return dict(rows)
+
+    def daily_status_counts(self, **filters):
+        """
+        Count notifications per day and status
+
+        Args:
+            **filters: Optional type, status, phone, since and until filters
+
+        Returns:
+            pandas.DataFrame: Columns date_only, status and count
+        """
+        where, params = self._where(**filters)
+        rows = self._query(
+            f"SELECT substr(date, 1, 10) AS day, status, COUNT(*) FROM notifications{where} "
+            "GROUP BY day, status ORDER BY day", params)
+        counts = pd.DataFrame(rows, columns=['date_only', 'status', 'count'])
+        counts['date_only'] = pd.to_datetime(counts['date_only']).dt.date
+        return counts
+
+    def distinct_values(self, column):
+        """
+        Get the distinct values of an indexed notification column
+
+        Args:
+            column (str): One of 'type', 'status' or 'phone'
+
+        Returns:
+            list: Sorted distinct values
+        """
+        if column not in ('type', 'status', 'phone'):
+            raise ValueError(f"Unsupported column: {column}")
+        rows = self._query(f"SELECT DISTINCT {column} FROM notifications ORDER BY {column}")
+        return [row[0] for row in rows if row[0] is not None]
+
+    def iter_notifications(self, chunk_size=10000, **filters):
+        """
+        Stream all matching notifications in chunks, oldest first
+
+        Args:
+            chunk_size (int): Rows per chunk
+            **filters: Optional type, status, phone, since and until filters
+
+        Yields:
+            pandas.DataFrame: Chunks with the NOTIFICATION_COLUMNS columns
+        """
+        where, params = self._where(**filters)
+        last_id = 0
+        while True:
+            clause = f"{where} AND id > ?" if where else " WHERE id > ?"
+            rows = self._query(
+                f"SELECT id, date, name, phone, type, status FROM notifications{clause} "
+                "ORDER BY id LIMIT ?", params + [last_id, chunk_size])
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield pd.DataFrame([row[1:] for row in rows], columns=NOTIFICATION_COLUMNS)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """
+    Get the process-wide notification store
+
+    Returns:
+        NotificationStore: Shared store backed by DB_FILE
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = NotificationStore()
+        return _store
+
+def log_notification(name, phone, type, status, date=None):
+    """
+    Record a notification event in the shared store
+
+    Args:
+        name (str): Recipient name
+        phone (str): Recipient phone number
+        type (str): Notification type
+        status (str): Outcome
+        date (str): Event time, now if None
+
+    Returns:
+        bool: True if recorded successfully, False otherwise
+    """
+    try:
+        get_store().add_notification(name, phone, type, status, date)
+        return True
+    except Exception as e:
+        print(f"Error logging notification: {e}")
+        return False
+
+def log_notifications(records):
+    """
+    Record several notification events in the shared store at once
+
+    Args:
+        records (list): Dictionaries with name, phone, type, status and
+            optional date keys
+
+    Returns:
+        bool: True if recorded successfully, False otherwise
+    """
+    try:
+        get_store().add_notifications(records)
+        return True
+    except Exception as e:
+        print(f"Error logging notifications: {e}")
+        return False
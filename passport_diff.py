@@ -0,0 +1,212 @@
+import numpy as np
+import pandas as pd
+
+from compact_layout import expand_passport_frame, is_compact
+from data_cache import file_content_hash
+from passport_index import build_indexes, patch_indexes
+from passport_service import load_passport_data, REQUIRED_COLUMNS
+
+# Patch the loaded data only while fewer than this share of rows changed,
+# larger changes are cheaper to load from scratch
+MAX_PATCH_FRACTION = 0.5
+
+def row_keys(df):
+    """
+    Hash the identity of each passport record
+
+    Records are keyed by passport number, or by name and date of birth when
+    the passport number is missing. Repeated keys are told apart by their
+    order of appearance.
+
+    Args:
+        df (pandas.DataFrame): Cleaned passport data, in either layout
+
+    Returns:
+        numpy.ndarray: uint64 key per row
+    """
+    df = expand_passport_frame(df)
+    passport = df["Passport"].astype(object)
+    text = passport.astype(str).str.strip()
+    missing = passport.isna() | (text == "")
+    fallback = ("name:" + df["Name"].astype(str) + "|"
+                + df["DOB"].dt.strftime("%Y-%m-%d").astype(object))
+    keys = text.where(~missing, fallback)
+    occurrence = keys.groupby(keys).cumcount()
+    keys = keys + "#" + occurrence.astype(str)
+    return pd.util.hash_array(keys.to_numpy(dtype=object))
+
+def row_hashes(df):
+    """
+    Hash the content of the workbook columns of each row
+
+    Args:
+        df (pandas.DataFrame): Cleaned passport data, in either layout
+
+    Returns:
+        numpy.ndarray: uint64 hash per row
+    """
+    df = expand_passport_frame(df)
+    columns = {}
+    for column in REQUIRED_COLUMNS:
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            columns[column] = values.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        else:
+            columns[column] = values.to_numpy(dtype=object)
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy()
+
+class PassportDiff:
+    """
+    Rows added, changed and removed between two versions of the passport data
+
+    Positions refer to rows of the old frame (removed, changed_old,
+    matched_old) or of the new frame (added, changed_new, matched_new).
+    result_added and result_changed locate the added and changed rows in the
+    data returned by refresh_passport_data.
+    """
+
+    def __init__(self, old_rows, new_rows, matched_old, matched_new, changed, added):
+        self.old_rows = old_rows
+        self.new_rows = new_rows
+        self.matched_old = matched_old
+        self.matched_new = matched_new
+        self.changed_old = matched_old[changed]
+        self.changed_new = matched_new[changed]
+        self.added = added
+        self.result_added = added
+        self.result_changed = self.changed_new
+
+        kept = np.zeros(old_rows, dtype=bool)
+        kept[matched_old] = True
+        self.removed = np.flatnonzero(~kept)
+
+    @property
+    def size(self):
+        """Number of rows added, changed or removed"""
+        return len(self.added) + len(self.changed_old) + len(self.removed)
+
+    def summary(self):
+        """
+        Returns:
+            dict: Number of added, changed, removed and unchanged rows
+        """
+        return {
+            'added': len(self.added),
+            'changed': len(self.changed_old),
+            'removed': len(self.removed),
+            'unchanged': len(self.matched_old) - len(self.changed_old),
+        }
+
+    def details(self, old_df, result_df, limit=100):
+        """
+        List the affected records
+
+        Args:
+            old_df (pandas.DataFrame): Data the diff was computed from
+            result_df (pandas.DataFrame): Data returned by refresh_passport_data
+            limit (int): Maximum number of records per kind of change
+
+        Returns:
+            pandas.DataFrame: Columns Change, Name and Passport
+        """
+        parts = []
+        for change, frame, rows in (('Added', result_df, self.result_added),
+                                    ('Changed', result_df, self.result_changed),
+                                    ('Removed', old_df, self.removed)):
+            selected = frame.iloc[rows[:limit]][["Name", "Passport"]]
+            parts.append(selected.assign(Change=change))
+        return pd.concat(parts, ignore_index=True)[["Change", "Name", "Passport"]]
+
+def diff_passport_frames(old_df, new_df):
+    """
+    Compare two versions of the passport data with vectorized hashes
+
+    Compact frames are compared on their expanded values, so the two
+    versions may use either layout.
+
+    Args:
+        old_df (pandas.DataFrame): Loaded passport data
+        new_df (pandas.DataFrame): Passport data from a re-uploaded workbook
+
+    Returns:
+        PassportDiff: Differences, or None if the old keys are not unique
+    """
+    old_df = expand_passport_frame(old_df)
+    new_df = expand_passport_frame(new_df)
+    old_keys = pd.Index(row_keys(old_df))
+    if not old_keys.is_unique:
+        return None
+
+    match = old_keys.get_indexer(row_keys(new_df))
+    found = match >= 0
+    matched_new = np.flatnonzero(found)
+    matched_old = match[found]
+    changed = row_hashes(old_df)[matched_old] != row_hashes(new_df)[matched_new]
+
+    # Keep the old row order so unchanged index entries stay sorted
+    order = np.argsort(matched_old, kind='stable')
+    return PassportDiff(len(old_df), len(new_df), matched_old[order], matched_new[order],
+                        changed[order], np.flatnonzero(~found))
+
+def apply_passport_diff(old_df, new_df, diff):
+    """
+    Build the patched passport data and carry the derived indexes over
+
+    Kept rows stay in their old order with their new values, added rows are
+    appended, and the indexes of the old frame are patched for the changed
+    rows only.
+
+    Args:
+        old_df (pandas.DataFrame): Loaded passport data
+        new_df (pandas.DataFrame): Passport data from a re-uploaded workbook
+        diff (PassportDiff): Output of diff_passport_frames
+
+    Returns:
+        pandas.DataFrame: Patched passport data
+    """
+    patched = new_df.iloc[np.concatenate((diff.matched_new, diff.added))]
+
+    dropped = np.zeros(diff.old_rows, dtype=bool)
+    dropped[diff.removed] = True
+    dropped[diff.changed_old] = True
+    kept_rows = len(diff.matched_old)
+    diff.result_changed = diff.changed_old - np.searchsorted(diff.removed, diff.changed_old)
+    diff.result_added = np.arange(kept_rows, kept_rows + len(diff.added))
+    inserted_rows = np.concatenate((diff.result_changed, diff.result_added))
+
+    patch_indexes(old_df, patched, dropped, diff.removed, inserted_rows)
+    return patched
+
+def refresh_passport_data(current_df, file_path):
+    """
+    Load a re-uploaded workbook by patching the currently loaded data
+
+    The workbook is loaded in the layout of the current data.
+
+    Args:
+        current_df (pandas.DataFrame): Loaded passport data, or None
+        file_path (str): Path to the new Excel file
+
+    Returns:
+        tuple: (passport data, PassportDiff or None). The diff is None when
+        nothing was loaded before or the file is the one already loaded;
+        the data is None if the file could not be loaded
+    """
+    if current_df is None:
+        return load_passport_data(file_path), None
+    try:
+        if current_df.attrs.get('source_hash') == file_content_hash(file_path):
+            return current_df, None
+    except OSError as e:
+        print(f"Error reading {file_path}: {e}")
+        return None, None
+
+    new_df = load_passport_data(file_path, build_index=False, compact=is_compact(current_df))
+    if new_df is None:
+        return None, None
+
+    diff = diff_passport_frames(current_df, new_df)
+    if diff is None or diff.size > MAX_PATCH_FRACTION * max(len(new_df), 1):
+        build_indexes(new_df)
+        return new_df, diff
+    return apply_passport_diff(current_df, new_df, diff), diff
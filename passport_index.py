@@ -0,0 +1,367 @@
+import weakref
+import datetime
+import calendar
+import numpy as np
+
+from compact_layout import date_column
+from search_index import SearchIndex
+from duplicate_detection import DuplicateIndex
+from instrumentation import stage
+
+# Birthdays are bucketed by day of a leap year so Feb 29 keeps its own slot
+DAYS_IN_LEAP_YEAR = 366
+_MONTH_STARTS = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+FEB_28_SLOT = 58
+FEB_29_SLOT = 59
+
+# Derived indexes per loaded DataFrame, keyed by id() and dropped with the frame
+_INDEXES = {}
+
+def birthday_slot(month, day):
+    """
+    Get the day-of-year slot of a (month, day) pair in a leap-year calendar
+
+    Args:
+        month (int): Month
+        day (int): Day of the month
+
+    Returns:
+        int: Slot between 0 and 365
+    """
+    return int(_MONTH_STARTS[month - 1]) + day - 1
+
+def _dob_slots(dob):
+    valid = dob.notna().to_numpy()
+    rows = np.flatnonzero(valid)
+    months = dob.dt.month.to_numpy()[valid].astype(np.int64)
+    days = dob.dt.day.to_numpy()[valid].astype(np.int64)
+    return rows, _MONTH_STARTS[months - 1] + days - 1
+
+def _kept_entries(positions, dropped, removed):
+    """
+    Drop index entries of dropped rows and shift the remaining positions
+    past the removed rows
+
+    Args:
+        positions (numpy.ndarray): Row positions stored in an index
+        dropped (numpy.ndarray): Boolean mask over the old rows, True for
+            rows whose entries go away (removed or changed rows)
+        removed (numpy.ndarray): Sorted positions of rows removed from the frame
+
+    Returns:
+        tuple: (mask over positions of the kept entries, their new positions)
+    """
+    keep = ~dropped[positions]
+    kept = positions[keep]
+    return keep, kept - np.searchsorted(removed, kept)
+
+class BirthdayIndex:
+    """
+    Row positions grouped by birthday, stored as one int array sorted by
+    day-of-year slot plus an offsets array, so the rows for a slot are
+    positions[offsets[slot]:offsets[slot + 1]]
+    """
+
+    def __init__(self, dob=None):
+        """
+        Build the index from a DOB column
+
+        Args:
+            dob (pandas.Series): Parsed dates of birth, None for an empty index
+        """
+        if dob is None:
+            self._set(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+            return
+        rows, slots = _dob_slots(dob)
+        order = np.argsort(slots, kind='stable')
+        self._set(rows[order], slots[order])
+
+    def _set(self, positions, sorted_slots):
+        self.positions = positions
+        counts = np.bincount(sorted_slots, minlength=DAYS_IN_LEAP_YEAR)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def patched(self, dropped, removed, inserted_rows, inserted_dob, total_rows):
+        """
+        Build the index of a patched frame from this one without rescanning
+        the unchanged rows
+
+        Args:
+            dropped (numpy.ndarray): Boolean mask over the old rows whose entries go away
+            removed (numpy.ndarray): Sorted positions of rows removed from the frame
+            inserted_rows (numpy.ndarray): New positions of the changed and added rows
+            inserted_dob (pandas.Series): Dates of birth of those rows
+            total_rows (int): Number of rows of the patched frame
+
+        Returns:
+            BirthdayIndex: Index of the patched frame
+        """
+        slots = np.repeat(np.arange(DAYS_IN_LEAP_YEAR), self.counts)
+        keep, positions = _kept_entries(self.positions, dropped, removed)
+        # (slot, position) pairs as one sortable key
+        width = max(total_rows, 1)
+        kept_keys = slots[keep] * width + positions
+
+        valid, new_slots = _dob_slots(inserted_dob)
+        new_keys = np.sort(new_slots * width + np.asarray(inserted_rows)[valid])
+        keys = np.insert(kept_keys, np.searchsorted(kept_keys, new_keys), new_keys)
+
+        index = BirthdayIndex()
+        index._set(keys % width, keys // width)
+        return index
+
+    @property
+    def counts(self):
+        """Number of birthdays per day-of-year slot"""
+        return np.diff(self.offsets)
+
+    def _slots(self, first, last):
+        return self.positions[self.offsets[first]:self.offsets[last + 1]]
+
+    def lookup(self, month, day, year=None):
+        """
+        Get row positions of people born on a given day of the year
+
+        In non-leap years, Feb 29 birthdays are celebrated on Feb 28.
+
+        Args:
+            month (int): Month
+            day (int): Day of the month
+            year (int): Year the birthday falls in, used for the Feb 29 fold
+
+        Returns:
+            numpy.ndarray: Row positions (a view into the index)
+        """
+        slot = birthday_slot(month, day)
+        if slot == FEB_28_SLOT and year is not None and not calendar.isleap(year):
+            return self._slots(FEB_28_SLOT, FEB_29_SLOT)
+        return self._slots(slot, slot)
+
+    def lookup_range(self, start_date, end_date):
+        """
+        Get row positions of people with a birthday between two dates, inclusive
+
+        Args:
+            start_date (datetime.date): First date
+            end_date (datetime.date): Last date
+
+        Returns:
+            numpy.ndarray: Row positions in calendar order
+        """
+        if end_date < start_date:
+            return self.positions[:0]
+        if (end_date - start_date).days >= DAYS_IN_LEAP_YEAR - 1:
+            # Every birthday, in calendar order from start_date's
+            split = self.offsets[birthday_slot(start_date.month, start_date.day)]
+            return np.concatenate((self.positions[split:], self.positions[:split]))
+
+        segments = []
+        for year in range(start_date.year, end_date.year + 1):
+            first = start_date if year == start_date.year else datetime.date(year, 1, 1)
+            last = end_date if year == end_date.year else datetime.date(year, 12, 31)
+            first_slot = birthday_slot(first.month, first.day)
+            last_slot = birthday_slot(last.month, last.day)
+            if last_slot == FEB_28_SLOT and not calendar.isleap(year):
+                last_slot = FEB_29_SLOT
+            segments.append(self._slots(first_slot, last_slot))
+
+        if len(segments) == 1:
+            return segments[0]
+        return np.concatenate(segments)
+
+class ExpiryIndex:
+    """
+    Expiry dates sorted once, with the row position of each date, so date
+    ranges are answered with a binary search
+    """
+
+    def __init__(self, expiry):
+        """
+        Build the index from an Expiry column
+
+        Args:
+            expiry (pandas.Series): Parsed passport expiry dates
+        """
+        values, rows = self._valid(expiry, None)
+        order = np.argsort(values, kind='stable')
+        self.values = values[order]
+        self.positions = rows[order]
+
+    @staticmethod
+    def _valid(expiry, rows):
+        values = expiry.to_numpy(dtype='datetime64[ns]')
+        valid = ~np.isnat(values)
+        rows = np.flatnonzero(valid) if rows is None else np.asarray(rows)[valid]
+        return values[valid], rows
+
+    def patched(self, dropped, removed, inserted_rows, inserted_expiry):
+        """
+        Build the index of a patched frame from this one without re-sorting
+        the unchanged rows
+
+        Args:
+            dropped (numpy.ndarray): Boolean mask over the old rows whose entries go away
+            removed (numpy.ndarray): Sorted positions of rows removed from the frame
+            inserted_rows (numpy.ndarray): New positions of the changed and added rows
+            inserted_expiry (pandas.Series): Expiry dates of those rows
+
+        Returns:
+            ExpiryIndex: Index of the patched frame
+        """
+        keep, positions = _kept_entries(self.positions, dropped, removed)
+        values = self.values[keep]
+
+        new_values, new_rows = self._valid(inserted_expiry, inserted_rows)
+        order = np.argsort(new_values, kind='stable')
+        at = np.searchsorted(values, new_values[order], side='right')
+
+        index = ExpiryIndex.__new__(ExpiryIndex)
+        index.values = np.insert(values, at, new_values[order])
+        index.positions = np.insert(positions, at, new_rows[order])
+        return index
+
+    def between(self, start, end):
+        """
+        Get row positions of passports expiring after start and up to end
+
+        Args:
+            start (pandas.Timestamp): Exclusive lower bound
+            end (pandas.Timestamp): Inclusive upper bound
+
+        Returns:
+            numpy.ndarray: Row positions sorted by expiry date (a view into the index)
+        """
+        start = np.datetime64(start, 'ns')
+        end = np.datetime64(end, 'ns')
+        low = np.searchsorted(self.values, start, side='right')
+        high = np.searchsorted(self.values, end, side='right')
+        return self.positions[low:max(low, high)]
+
+def _get_index(df, name, build):
+    key = id(df)
+    indexes = _INDEXES.get(key)
+    if indexes is None:
+        indexes = {}
+        _INDEXES[key] = indexes
+        weakref.finalize(df, _INDEXES.pop, key, None)
+    if name not in indexes:
+        with stage(f"index.{name}", rows=len(df)):
+            indexes[name] = build()
+    return indexes[name]
+
+def get_birthday_index(df):
+    """
+    Get the birthday index of a passport DataFrame, building it on first use
+
+    Args:
+        df (pandas.DataFrame): Passport data
+
+    Returns:
+        BirthdayIndex: Index over the DOB column
+    """
+    return _get_index(df, 'birthday', lambda: BirthdayIndex(date_column(df, "DOB")))
+
+def get_expiry_index(df):
+    """
+    Get the expiry index of a passport DataFrame, building it on first use
+
+    Args:
+        df (pandas.DataFrame): Passport data
+
+    Returns:
+        ExpiryIndex: Index over the Expiry column
+    """
+    return _get_index(df, 'expiry', lambda: ExpiryIndex(date_column(df, "Expiry")))
+
+def get_birthday_calendar(df):
+    """
+    Get birthday counts per calendar day of a passport DataFrame, computed
+    once per DataFrame from the birthday index
+
+    Args:
+        df (pandas.DataFrame): Passport data
+
+    Returns:
+        numpy.ndarray: 12x31 float matrix of counts by (month, day), NaN for
+        days that do not exist (Feb 29 is kept)
+    """
+    def build():
+        counts = get_birthday_index(df).counts
+        matrix = np.full((12, 31), np.nan)
+        for month in range(1, 13):
+            days = calendar.monthrange(2024, month)[1]  # 2024 is a leap year
+            start = int(_MONTH_STARTS[month - 1])
+            matrix[month - 1, :days] = counts[start:start + days]
+        return matrix
+
+    return _get_index(df, 'birthday_calendar', build)
+
+def get_search_index(df):
+    """
+    Get the name, passport and phone search index of a passport DataFrame,
+    building it on first use
+
+    Args:
+        df (pandas.DataFrame): Passport data
+
+    Returns:
+        SearchIndex: Search index over the frame
+    """
+    return _get_index(df, 'search', lambda: SearchIndex(df))
+
+def get_duplicate_index(df):
+    """
+    Get the scored duplicate candidate pairs of a passport DataFrame,
+    finding them on first use
+
+    Args:
+        df (pandas.DataFrame): Passport data
+
+    Returns:
+        DuplicateIndex: Candidate pairs over the frame
+    """
+    return _get_index(df, 'duplicates', lambda: DuplicateIndex(df))
+
+def build_indexes(df):
+    """
+    Build all derived indexes of a passport DataFrame
+
+    Args:
+        df (pandas.DataFrame): Passport data
+    """
+    get_birthday_index(df)
+    get_expiry_index(df)
+
+def patch_indexes(old_df, new_df, dropped, removed, inserted_rows):
+    """
+    Carry the indexes of a DataFrame over to a patched copy of it
+
+    Indexes the old frame has not built yet are left to be built on first
+    use; the birthday calendar is rebuilt from the patched birthday index.
+
+    Args:
+        old_df (pandas.DataFrame): Frame the patch was applied to
+        new_df (pandas.DataFrame): Patched frame
+        dropped (numpy.ndarray): Boolean mask over the old rows whose entries go away
+        removed (numpy.ndarray): Sorted positions of rows removed from the frame
+        inserted_rows (numpy.ndarray): Positions in new_df of the changed and added rows
+    """
+    indexes = _INDEXES.get(id(old_df), {})
+    inserted = new_df.iloc[inserted_rows]
+    if 'birthday' in indexes:
+        _get_index(new_df, 'birthday', lambda: indexes['birthday'].patched(
+            dropped, removed, inserted_rows, date_column(inserted, "DOB"), len(new_df)))
+    if 'expiry' in indexes:
+        _get_index(new_df, 'expiry', lambda: indexes['expiry'].patched(
+            dropped, removed, inserted_rows, date_column(inserted, "Expiry")))
+
+def invalidate_indexes(df):
+    """
+    Drop the derived indexes of a DataFrame after it was modified in place
+
+    Args:
+        df (pandas.DataFrame): Passport data
+    """
+    indexes = _INDEXES.get(id(df))
+    if indexes is not None:
+        indexes.clear()
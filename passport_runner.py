@@ -0,0 +1,405 @@
+"""
+Headless notification runner
+
+Usage:
+    python -m passport_runner daily [--file passports.xlsx ...] [--days 90] [--backend link] [--metrics stages.prom]
+    python -m passport_runner scheduler [--backend link] [--batch-size 100]
+
+The daily command loads the passport workbook, selects today's birthdays and
+the passports expiring soon, renders all messages in bulk and hands them to
+a sender backend. The scheduler command runs the daemon that delivers the
+messages scheduled from the app. Nothing on these paths imports Streamlit.
+"""
+import sys
+import time
+import asyncio
+import argparse
+import datetime
+import pandas as pd
+
+from passport_service import (load_passport_sources, get_todays_birthdays,
+                              get_expiring_passports, collapse_duplicate_customers,
+                              PHONE_VALID, SOURCE_COLUMN)
+from message_templates import get_templates, generate_messages
+from notification_store import get_store
+from notification_ledger import get_ledger, event_digests
+from scheduler import Scheduler, get_job_store, DEFAULT_BATCH_SIZE, DEFAULT_CHECK_INTERVAL
+from senders import (SENDERS, TwilioSender, get_sender, dispatch,
+                     STATUS_FAILED, STATUS_UNKNOWN, DEFAULT_CONCURRENCY)
+from instrumentation import stage, enable, export_prometheus, export_json
+
+# Workbook used when no file is given
+DEFAULT_FILE = "passports.xlsx"
+
+# Template and notification type for each campaign
+CAMPAIGNS = {
+    'birthday': 'Birthday',
+    'expiry': 'Expiry',
+}
+
+def build_recipients(df, now=None):
+    """
+    Build template data for the rows of a passport DataFrame that have a valid phone
+
+    Args:
+        df (pandas.DataFrame): Passport data selected for a campaign
+        now (pandas.Timestamp): Reference time for days_left, now if None
+
+    Returns:
+        pandas.DataFrame: Columns name, passport, expiry, days_left and phone,
+        indexed like df
+    """
+    now = now or pd.Timestamp.now()
+    df = df[df["PhoneStatus"] == PHONE_VALID]
+    expiry = df["Expiry"]
+    return pd.DataFrame({
+        'name': df["Name"],
+        'passport': df["Passport"].astype(object).where(df["Passport"].notna(), "N/A"),
+        'expiry': expiry.dt.strftime("%d-%m-%Y").astype(object).where(expiry.notna(), "N/A"),
+        'days_left': (expiry - now).dt.days.astype('Int64'),
+        'phone': "+" + df["PhoneE164"].astype(str),
+    }, index=df.index)
+
+def _event_dates(campaign, selected, now):
+    if campaign == 'expiry':
+        return selected["Expiry"].dt.strftime("%Y-%m-%d").astype(object)
+    return now.strftime("%Y-%m-%d")
+
+def plan_daily_campaigns(df, days=90, now=None, ledger=None, collapse=True):
+    """
+    Select the recipients of today's birthday and expiry campaigns
+
+    A birthday is one event per day, a passport expiry one event per expiry
+    date. Rows already notified for their event in the ledger are dropped
+    before any message is built, and so are the other records of customers
+    entered more than once.
+
+    Args:
+        df (pandas.DataFrame): Passport data
+        days (int): Expiry window in days
+        now (pandas.Timestamp): Reference time, now if None
+        ledger (NotificationLedger): Ledger of events already notified, if any
+        collapse (bool): Keep one record per duplicate customer cluster
+
+    Returns:
+        dict: Recipient DataFrames keyed by campaign ('birthday', 'expiry'),
+        with event_key and event_date columns, plus the number of selected
+        rows without a valid phone under 'skipped', of rows notified before
+        under 'already_notified' and of duplicate records under 'duplicates'
+    """
+    now = now or pd.Timestamp.now()
+    selections = {
+        'birthday': get_todays_birthdays(df),
+        'expiry': get_expiring_passports(df, days=days),
+    }
+    plan = {'skipped': 0, 'already_notified': 0, 'duplicates': 0}
+    for campaign, selected in selections.items():
+        if collapse:
+            selected, duplicates = collapse_duplicate_customers(df, selected)
+            plan['duplicates'] += duplicates
+        valid = selected[selected["PhoneStatus"] == PHONE_VALID]
+        plan['skipped'] += len(selected) - len(valid)
+
+        event_dates = _event_dates(campaign, valid, now)
+        keys = event_digests(CAMPAIGNS[campaign], event_dates, valid["Passport"], valid["PhoneE164"])
+        if ledger is not None and len(keys):
+            notified = ledger.contains_many(keys)
+            plan['already_notified'] += int(notified.sum())
+            valid = valid[~notified]
+            keys = keys[~notified]
+            if not isinstance(event_dates, str):
+                event_dates = event_dates[~notified]
+
+        recipients = build_recipients(valid, now)
+        recipients['event_key'] = keys
+        recipients['event_date'] = event_dates
+        plan[campaign] = recipients
+    return plan
+
+async def run_campaign(campaign, recipients, sender, templates, store=None,
+                       concurrency=DEFAULT_CONCURRENCY, rate_limit=None, ledger=None):
+    """
+    Render and send one campaign
+
+    Args:
+        campaign (str): Template name, a CAMPAIGNS key
+        recipients (pandas.DataFrame): A campaign of plan_daily_campaigns
+        sender (senders.Sender): Backend used to deliver messages
+        templates (dict): Message templates
+        store (NotificationStore): Store the outcomes are logged to, if any
+        concurrency (int): Number of sends in flight at once
+        rate_limit (float): Sends per second, the backend default if None
+        ledger (NotificationLedger): Ledger the events are claimed in, if any
+
+    Returns:
+        dict: Counts and timings of the campaign
+    """
+    notification_type = CAMPAIGNS[campaign]
+    stats = {'recipients': len(recipients), 'sent': 0, 'failed': 0, 'unknown': 0,
+             'already_notified': 0}
+    if ledger is not None and len(recipients):
+        # Another run may have sent some of these since planning
+        claimed = ledger.claim_many(recipients['event_key'], notification_type,
+                                    recipients['event_date'])
+        stats['already_notified'] = int((~claimed).sum())
+        recipients = recipients[claimed]
+
+    started = time.perf_counter()
+    with stage(f"render.{campaign}_messages", rows=len(recipients)):
+        messages, missing = generate_messages(templates[campaign], recipients)
+    stats['render_seconds'] = time.perf_counter() - started
+    stats['missing_data'] = int(missing.sum())
+
+    started = time.perf_counter()
+    today = datetime.date.today().isoformat()
+    names = recipients['name'].tolist()
+    phones = recipients['phone'].tolist()
+
+    # The key identifies the send of this event in the results
+    jobs = ((f"{campaign}:{passport}:{phone}:{today}", phone, message)
+            for passport, phone, message in zip(recipients['passport'], phones, messages))
+    with stage(f"send.{campaign}", rows=len(recipients)):
+        results = await dispatch(jobs, sender, concurrency=concurrency, rate_limit=rate_limit)
+
+    failed_keys = []
+    sent_keys, sids = [], []
+    notifications = []
+    for name, phone, event_key, result in zip(names, phones, recipients['event_key'], results):
+        if result['status'] == STATUS_FAILED:
+            print(f"Error sending {campaign} message to {phone}: {result.get('error')}")
+            stats['failed'] += 1
+            failed_keys.append(event_key)
+        elif result['status'] == STATUS_UNKNOWN:
+            # May have been delivered, so the event stays claimed
+            print(f"Unknown outcome of {campaign} message to {phone}, check before resending: "
+                  f"{result.get('error')}")
+            stats['unknown'] += 1
+        else:
+            stats['sent'] += 1
+            if result.get('sid'):
+                sent_keys.append(event_key)
+                sids.append(result['sid'])
+        notifications.append({'name': name, 'phone': phone, 'type': notification_type,
+                              'status': result['status']})
+    if store is not None:
+        store.add_notifications(notifications)
+    if ledger is not None and sent_keys:
+        ledger.confirm_many(sent_keys, sids)
+    if ledger is not None and failed_keys:
+        # Failed sends are retried by the next run
+        ledger.release_many(failed_keys)
+    stats['send_seconds'] = time.perf_counter() - started
+    return stats
+
+async def _run_campaigns(plan, sender, templates, store, concurrency, rate_limit, ledger):
+    stats = {}
+    try:
+        for campaign in CAMPAIGNS:
+            stats[campaign] = await run_campaign(campaign, plan[campaign], sender,
+                                                 templates, store, concurrency, rate_limit,
+                                                 ledger)
+    finally:
+        await sender.close()
+    return stats
+
+def _make_sender(backend, concurrency):
+    options = {}
+    if issubclass(SENDERS[backend], TwilioSender):
+        # One pooled connection per concurrent send
+        options['pool_size'] = concurrency
+    return get_sender(backend, **options)
+
+def run_daily(file_path=DEFAULT_FILE, days=90, backend='link', log=True,
+              concurrency=DEFAULT_CONCURRENCY, rate_limit=None, dedup=True, compact=False,
+              collapse=True, sheets=(0,), workers=None):
+    """
+    Run today's birthday and expiry campaigns
+
+    Args:
+        file_path (str or list): Passport workbooks, directories of workbooks
+            or glob patterns, see passport_service.load_passport_sources
+        days (int): Expiry window in days
+        backend (str): Sender backend name
+        log (bool): Record outcomes in the notification store
+        concurrency (int): Number of sends in flight at once
+        rate_limit (float): Sends per second, the backend default if None
+        dedup (bool): Skip events already notified according to the ledger
+        compact (bool): Keep the passport data in the compact layout
+        collapse (bool): Send one message per duplicate customer cluster
+        sheets (list): Names or positions of the sheets to load from each
+            workbook, the first sheet by default and all sheets if None
+        workers (int): Number of processes parsing workbooks, the CPU count if None
+
+    Returns:
+        dict: Statistics of the run, or None if the data could not be loaded
+    """
+    stats = {}
+    started = time.perf_counter()
+    df = load_passport_sources(file_path, sheets=sheets, max_workers=workers, compact=compact)
+    stats['load_seconds'] = time.perf_counter() - started
+    if df is None:
+        print(f"Error: could not load passport data from {file_path}")
+        return None
+    stats['rows'] = len(df)
+    stats['sources'] = len(df[SOURCE_COLUMN].cat.categories)
+    stats['skipped_sources'] = df.attrs.get('skipped_sources', [])
+    if 'memory_report' in df.attrs:
+        stats['memory_report'] = df.attrs['memory_report']
+
+    ledger = get_ledger() if dedup else None
+    started = time.perf_counter()
+    plan = plan_daily_campaigns(df, days=days, ledger=ledger, collapse=collapse)
+    stats['plan_seconds'] = time.perf_counter() - started
+    stats['skipped_invalid_phone'] = plan['skipped']
+    stats['already_notified'] = plan['already_notified']
+    stats['duplicates'] = plan['duplicates']
+
+    templates = get_templates()
+    store = get_store() if log else None
+    sender = _make_sender(backend, concurrency)
+    stats.update(asyncio.run(_run_campaigns(plan, sender, templates, store,
+                                            concurrency, rate_limit, ledger)))
+    return stats
+
+async def _run_scheduler(scheduler):
+    try:
+        await scheduler.run()
+    finally:
+        await scheduler.sender.close()
+
+def run_scheduler(backend='link', batch_size=DEFAULT_BATCH_SIZE,
+                  concurrency=DEFAULT_CONCURRENCY, check_interval=DEFAULT_CHECK_INTERVAL,
+                  log=True):
+    """
+    Run the scheduler daemon until interrupted
+
+    Args:
+        backend (str): Sender backend name
+        batch_size (int): Maximum number of jobs dispatched together
+        concurrency (int): Number of sends in flight at once
+        check_interval (float): Longest sleep before checking for new jobs
+        log (bool): Record outcomes in the notification store
+
+    Returns:
+        dict: Job counts per status when the daemon stopped
+    """
+    store = get_job_store()
+    scheduler = Scheduler(store, _make_sender(backend, concurrency), batch_size=batch_size,
+                          check_interval=check_interval, concurrency=concurrency,
+                          notification_store=get_store() if log else None)
+    print(f"Scheduler started with {store.counts().get('pending', 0)} pending jobs")
+    try:
+        asyncio.run(_run_scheduler(scheduler))
+    except KeyboardInterrupt:
+        print("Scheduler stopped")
+    print(f"Dispatched {scheduler.stats['dispatched']} jobs: "
+          f"{scheduler.stats['sent']} sent, {scheduler.stats['failed']} failed, "
+          f"{scheduler.stats['unknown']} unknown")
+    return store.counts()
+
+def print_stats(stats):
+    """
+    Print run statistics with throughput
+
+    Args:
+        stats (dict): Output of run_daily
+    """
+    print(f"Loaded {stats['rows']} records from {stats['sources']} sources "
+          f"in {stats['load_seconds']:.3f}s")
+    if stats['skipped_sources']:
+        print(f"Skipped sources without passport data: {', '.join(stats['skipped_sources'])}")
+    if 'memory_report' in stats:
+        report = stats['memory_report']
+        print(f"Compact layout: {report['after']:.1f} bytes per row "
+              f"(regular layout {report['before']:.1f})")
+    print(f"Planned campaigns in {stats['plan_seconds']:.3f}s "
+          f"({stats['skipped_invalid_phone']} recipients skipped for invalid phones, "
+          f"{stats['already_notified']} already notified, "
+          f"{stats['duplicates']} duplicate records merged)")
+
+    total_sent = 0
+    total_seconds = stats['load_seconds'] + stats['plan_seconds']
+    for campaign in CAMPAIGNS:
+        campaign_stats = stats[campaign]
+        seconds = campaign_stats['render_seconds'] + campaign_stats['send_seconds']
+        rate = campaign_stats['recipients'] / seconds if seconds > 0 else 0.0
+        print(f"{CAMPAIGNS[campaign]}: {campaign_stats['recipients']} recipients, "
+              f"{campaign_stats['sent']} sent, {campaign_stats['failed']} failed, "
+              f"{campaign_stats['unknown']} unknown, {campaign_stats['missing_data']} with missing data | "
+              f"render {campaign_stats['render_seconds']:.3f}s, "
+              f"send {campaign_stats['send_seconds']:.3f}s, {rate:.1f} msg/s")
+        total_sent += campaign_stats['sent']
+        total_seconds += seconds
+
+    print(f"Total: {total_sent} messages in {total_seconds:.3f}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="passport_runner",
+                                     description="Headless passport notification runner")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    daily = commands.add_parser("daily", help="Send today's birthday and expiry messages")
+    daily.add_argument("--file", nargs="+", default=[DEFAULT_FILE],
+                       help="Passport workbooks, directories of workbooks or glob patterns")
+    daily.add_argument("--sheet", action="append",
+                       help="Sheet to load from each workbook, may be repeated "
+                            "(default: the first sheet)")
+    daily.add_argument("--all-sheets", action="store_true",
+                       help="Load every sheet with passport data, e.g. one sheet per branch")
+    daily.add_argument("--workers", type=int, default=None,
+                       help="Number of processes parsing workbooks (default: CPU count)")
+    daily.add_argument("--days", type=int, default=90, help="Expiry window in days")
+    daily.add_argument("--backend", choices=sorted(SENDERS), default='link',
+                       help="Sender backend")
+    daily.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                       help="Number of sends in flight at once")
+    daily.add_argument("--rate", type=float, default=None,
+                       help="Sends per second (default: backend limit)")
+    daily.add_argument("--no-log", action="store_true",
+                       help="Do not record notifications in the history store")
+    daily.add_argument("--no-dedup", action="store_true",
+                       help="Send even to customers already notified for the same event")
+    daily.add_argument("--compact", action="store_true",
+                       help="Keep the passport data in the compact memory layout")
+    daily.add_argument("--keep-duplicates", action="store_true",
+                       help="Message every record, even ones detected as the same customer")
+    daily.add_argument("--metrics",
+                       help="Write the stage timings to this file, as JSON if it ends "
+                            "in .json and in the Prometheus text format otherwise")
+
+    scheduler = commands.add_parser("scheduler", help="Deliver scheduled messages when they are due")
+    scheduler.add_argument("--backend", choices=sorted(SENDERS), default='link',
+                           help="Sender backend")
+    scheduler.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                           help="Maximum number of jobs dispatched together")
+    scheduler.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                           help="Number of sends in flight at once")
+    scheduler.add_argument("--check-interval", type=float, default=DEFAULT_CHECK_INTERVAL,
+                           help="Seconds between checks for newly scheduled jobs")
+    scheduler.add_argument("--no-log", action="store_true",
+                           help="Do not record notifications in the history store")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "daily":
+        if args.metrics:
+            enable()
+        stats = run_daily(args.file, days=args.days, backend=args.backend,
+                          log=not args.no_log, concurrency=args.concurrency,
+                          rate_limit=args.rate, dedup=not args.no_dedup,
+                          compact=args.compact, collapse=not args.keep_duplicates,
+                          sheets=None if args.all_sheets else args.sheet or (0,),
+                          workers=args.workers)
+        if args.metrics:
+            export = export_json if args.metrics.endswith(".json") else export_prometheus
+            export(args.metrics)
+        if stats is None:
+            return 1
+        print_stats(stats)
+    elif args.command == "scheduler":
+        run_scheduler(args.backend, batch_size=args.batch_size, concurrency=args.concurrency,
+                      check_interval=args.check_interval, log=not args.no_log)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
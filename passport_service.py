@@ -1,79 +1,498 @@
+import os
+import glob
+import zipfile
+import hashlib
+import functools
+import multiprocessing
+import concurrent.futures
+import numpy as np
 import pandas as pd
 import datetime
 import re
+import xml.etree.ElementTree as ET
 
-def load_passport_data(file_path):
+from date_parser import parse_date_column
+from data_cache import file_content_hash, load_cached_frame, store_cached_frame
+from passport_index import (build_indexes, get_birthday_index, get_expiry_index,
+                            get_search_index, get_duplicate_index)
+from search_index import DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT
+from duplicate_detection import (collapse_duplicates,
+                                 DEFAULT_THRESHOLD as DEFAULT_DUPLICATE_THRESHOLD)
+from compact_layout import (compact_passport_frame, expand_passport_frame,
+                            is_compact, memory_report)
+from instrumentation import stage, timed
+
+# Columns every passport workbook must provide
+REQUIRED_COLUMNS = ['Name', 'DOB', 'Passport', 'Expiry', 'Phone']
+
+# Phone validation outcomes stored in the PhoneStatus column
+PHONE_VALID = 'Valid'
+PHONE_INVALID = 'Invalid'
+PHONE_MISSING = 'Missing'
+PHONE_STATUSES = [PHONE_VALID, PHONE_INVALID, PHONE_MISSING]
+
+# Number of rows per chunk when streaming a workbook
+DEFAULT_CHUNK_SIZE = 50000
+
+# Files picked up when a directory of workbooks is loaded
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+
+# Column naming the workbook (and sheet) each row of combined data comes from
+SOURCE_COLUMN = 'Source'
+
+def clean_passport_frame(df):
+    """
+    Clean raw passport data: strip column names, parse dates, drop rows
+    without a valid DOB, add the normalised phone columns and turn columns
+    of mixed cells (e.g. Phone, Passport) into text
+    
+    The formats found in each date column are counted per cell and stored in
+    df.attrs['date_formats'].
+    
+    Args:
+        df (pandas.DataFrame): Raw passport data
+        
+    Returns:
+        pandas.DataFrame: Cleaned passport data, or None if required columns are missing
+    """
+    # Clean column names
+    df.columns = df.columns.astype(str).str.strip()
+    
+    # Check for required columns
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    
+    if missing_columns:
+        print(f"Missing required columns: {missing_columns}")
+        return None
+    
+    with stage("parse.dates", rows=len(df)) as span:
+        # Parse DOB and Expiry columns - each cell may use a different format
+        date_formats = {}
+        for column in ["DOB", "Expiry"]:
+            df[column], date_formats[column] = parse_date_column(df[column])
+        span.details['date_formats'] = date_formats
+    
+    # Remove rows with invalid DOB
+    df = df[df["DOB"].notna()]
+
+    with stage("parse.phones", rows=len(df)):
+        # Normalise phone numbers once so the UI never parses them per row
+        phone_columns = normalize_phone_column(df["Phone"])
+        for column in phone_columns.columns:
+            df[column] = phone_columns[column]
+
+    # The same types whether the data is parsed or read from the cache
+    for column in df.columns[df.dtypes == object]:
+        df[column] = text_column(df[column])
+    df.attrs['date_formats'] = date_formats
+
+    return df
+
+def iter_passport_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream passport data from an Excel file in cleaned chunks
+    
+    Rows are read with openpyxl in read-only mode, so memory use is bounded by
+    the chunk size instead of the size of the workbook.
+    
+    Args:
+        file_path (str): Path to Excel file
+        chunk_size (int): Maximum number of rows per chunk
+        
+    Yields:
+        pandas.DataFrame: Cleaned passport data for consecutive row ranges,
+        indexed by row position like load_passport_data
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        columns = [f"Unnamed: {i}" if value is None else str(value).strip()
+                   for i, value in enumerate(header)]
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {missing_columns}")
+
+        start = 0
+        buffer = []
+
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) < chunk_size:
+                continue
+
+            chunk = pd.DataFrame(buffer, columns=columns,
+                                 index=pd.RangeIndex(start, start + len(buffer)))
+            start += len(buffer)
+            buffer = []
+
+            chunk = clean_passport_frame(chunk)
+            if not chunk.empty:
+                yield chunk
+
+        if buffer:
+            chunk = pd.DataFrame(buffer, columns=columns,
+                                 index=pd.RangeIndex(start, start + len(buffer)))
+            chunk = clean_passport_frame(chunk)
+            if not chunk.empty:
+                yield chunk
+    finally:
+        workbook.close()
+
+def _filter_chunks(chunks, select):
+    """
+    Apply a row selection to each chunk of a stream and combine the matches
+    """
+    matches = []
+    empty = None
+    for chunk in chunks:
+        match = select(chunk)
+        if match.empty:
+            empty = match
+        else:
+            matches.append(match)
+
+    if matches:
+        return pd.concat(matches)
+    if empty is not None:
+        return empty
+    return pd.DataFrame(columns=REQUIRED_COLUMNS)
+
+def _prepare_frame(df, build_index, compact):
+    """
+    Convert loaded passport data to the requested layout and index it
+    """
+    if compact:
+        with stage("load.compact", rows=len(df)) as span:
+            compact_df = compact_passport_frame(df)
+            report = memory_report(df, compact_df)
+            compact_df.attrs['memory_report'] = report
+            span.details['bytes_per_row'] = report['after']
+        df = compact_df
+    if build_index:
+        build_indexes(df)
+    return df
+
+def load_passport_data(file_path, use_cache=True, build_index=True, compact=False):
     """
     Load passport data from Excel file
     
+    The content hash of the file is kept in df.attrs['source_hash'] when the
+    cache is used. With compact=True the data uses the layout of
+    compact_layout.compact_passport_frame, df.attrs['memory_report'] compares
+    its bytes per row with the regular layout, and the query functions of
+    this module return rows in the regular layout.
+    
     Args:
         file_path (str): Path to Excel file
+        use_cache (bool): Reuse the cleaned data cached for identical file content
+        build_index (bool): Build the derived indexes right away
+        compact (bool): Return the compact layout
         
     Returns:
         pandas.DataFrame: Loaded and processed passport data
     """
     try:
-        print(f"DEBUG: Loading passport data from {file_path}")
+        with stage("load") as span:
+            df = _load_passport_frame(file_path, use_cache, span)
+            if df is None:
+                return None
+            span.rows = len(df)
+            return _prepare_frame(df, build_index, compact)
+    
+    except Exception as e:
+        print(f"Error loading passport data: {e}")
+        return None
+
+def _load_passport_frame(file_path, use_cache, span):
+    """
+    Read and clean a workbook, or take its cleaned data from the cache
+    """
+    cache_key = None
+    if use_cache:
+        try:
+            with stage("load.cache") as cache_span:
+                cache_key = file_content_hash(file_path)
+                cached_df = load_cached_frame(cache_key)
+                cache_span.details['hit'] = cached_df is not None
+            if cached_df is not None:
+                span.details['cached'] = True
+                cached_df.attrs['source_hash'] = cache_key
+                return cached_df
+        except OSError as e:
+            print(f"Passport cache unavailable: {e}")
+
+    with stage("load.read") as read_span:
         df = pd.read_excel(file_path)
+        read_span.rows = len(df)
+
+    with stage("parse", rows=len(df)):
+        df = clean_passport_frame(df)
+    if df is None:
+        return None
+
+    if cache_key is not None:
+        df.attrs['source_hash'] = cache_key
+        store_cached_frame(cache_key, df)
+    return df
+
+def _list_workbooks(source):
+    if isinstance(source, str) and os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    elif isinstance(source, str) and glob.has_magic(source):
+        paths = glob.glob(source)
+    else:
+        return [source]
+    # Skip the lock files Excel leaves next to open workbooks
+    return sorted(path for path in paths
+                  if path.lower().endswith(WORKBOOK_EXTENSIONS)
+                  and not os.path.basename(path).startswith("~$"))
+
+def workbook_sheet_names(file_path):
+    """
+    List the sheets of a workbook without loading it
+    
+    Args:
+        file_path (str): Path to Excel file
         
-        print(f"DEBUG: Raw data loaded, {len(df)} records found")
-        print(f"DEBUG: Columns found: {df.columns.tolist()}")
-        
-        # Clean column names
-        df.columns = df.columns.str.strip()
-        
-        # Check for required columns
-        required_columns = ['Name', 'DOB', 'Passport', 'Expiry', 'Phone']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            print(f"DEBUG: Missing required columns: {missing_columns}")
-            return None
-        
-        # Show raw date formats
-        if not df.empty:
-            print(f"DEBUG: Raw DOB format examples: {df['DOB'].head().tolist()}")
-        
-        # Parse DOB and Expiry columns - handle both formats (dot and slash)
-        print(f"DEBUG: Converting date columns to datetime")
-        # Try to detect the date format
-        if not df.empty:
-            sample_dob = str(df["DOB"].iloc[0])
-            if '/' in sample_dob:
-                print(f"DEBUG: Using '%d/%m/%Y' date format")
-                date_format = '%d/%m/%Y'
-            else:
-                print(f"DEBUG: Using '%d.%m.%Y' date format")
-                date_format = '%d.%m.%Y'
-                
-            print(f"DEBUG: Sample date: {sample_dob}")
-        else:
-            # Default format
-            date_format = '%d.%m.%Y'
-            
-        df["DOB"] = pd.to_datetime(df["DOB"], format=date_format, errors='coerce')
-        df["Expiry"] = pd.to_datetime(df["Expiry"], format=date_format, errors='coerce')
-        
-        # Check for parsing issues
-        dob_null_count = df["DOB"].isna().sum()
-        print(f"DEBUG: {dob_null_count} records with invalid DOB format")
-        
-        # Remove rows with invalid DOB
-        df = df[df["DOB"].notna()]
-        print(f"DEBUG: {len(df)} valid records after cleaning")
-        
-        # Print a sample of converted dates
-        if not df.empty:
-            print(f"DEBUG: Parsed DOB examples: {df['DOB'].iloc[:5].tolist()}")
-            print(f"DEBUG: DOB day examples: {df['DOB'].dt.day.iloc[:5].tolist()}")
-            print(f"DEBUG: DOB month examples: {df['DOB'].dt.month.iloc[:5].tolist()}")
+    Returns:
+        list: Sheet names in tab order
+    """
+    if zipfile.is_zipfile(file_path):
+        # The sheet list of xlsx files is in a small part of the archive,
+        # opening the workbook would read all of its shared strings
+        with zipfile.ZipFile(file_path) as archive:
+            root = ET.fromstring(archive.read("xl/workbook.xml"))
+        return [sheet.get("name") for sheet in root.iter()
+                if sheet.tag.rsplit("}", 1)[-1] == "sheet"]
+    with pd.ExcelFile(file_path) as workbook:
+        return workbook.sheet_names
+
+def resolve_passport_sources(sources, sheets=None):
+    """
+    Expand directories, glob patterns and workbooks into the sheets to load
+    
+    Args:
+        sources (str or list): A workbook, a directory of workbooks or a glob
+            pattern, a (workbook, sheet name or list of names) tuple, or a
+            list of these
+        sheets (str, int or list): Names or positions of the sheets to load
+            from workbooks given without sheets, e.g. [0] for the first
+            sheet like load_passport_data; all sheets if None
         
-        return df
+    Returns:
+        list: (workbook path, sheet name, source label) per sheet, in order.
+        Labels are the workbook paths relative to their common directory,
+        followed by the sheet name for workbooks with several sheets loaded
+    """
+    if isinstance(sources, (str, tuple)):
+        sources = [sources]
+    if isinstance(sheets, (str, int)):
+        sheets = [sheets]
+
+    selected = []
+    for source in sources:
+        if isinstance(source, tuple):
+            path, names = source
+            selected.append((path, [names] if isinstance(names, str) else list(names)))
+            continue
+        for path in _list_workbooks(source):
+            names = workbook_sheet_names(path)
+            if sheets is not None:
+                names = [name for position, name in enumerate(names)
+                         if name in sheets or position in sheets]
+                if not names:
+                    print(f"No sheet named {sheets} in {path}")
+            selected.append((path, names))
+
+    # The same sheet given twice is loaded once
+    sheets_of = {}
+    for path, names in selected:
+        loaded = sheets_of.setdefault(os.path.abspath(path), (path, []))[1]
+        loaded.extend(name for name in names if name not in loaded)
+
+    directories = [os.path.dirname(path) for path, (_, names) in sheets_of.items() if names]
+    common = os.path.commonpath(directories) if directories else ""
+    resolved = []
+    for absolute, (path, names) in sheets_of.items():
+        label = os.path.relpath(absolute, common)
+        for name in names:
+            resolved.append((path, name, f"{label} / {name}" if len(names) > 1 else label))
+    return resolved
+
+def _read_passport_sheet(file_path, sheet_name):
+    """
+    Read and clean one sheet, in a worker process of load_passport_sources
+    """
+    return clean_passport_frame(pd.read_excel(file_path, sheet_name=sheet_name))
+
+def _sheet_cache_key(file_hash, sheet_name, first_sheet):
+    # The first sheet shares the cache entry of load_passport_data
+    if sheet_name == first_sheet:
+        return file_hash
+    return hashlib.sha256(f"{file_hash}:{sheet_name}".encode()).hexdigest()
+
+def _process_pool(workers):
+    """
+    Process pool for parsing workbooks
+
+    Workers are forked from a server process started before any of the
+    caller's threads could hold a lock, with this module already imported.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context("spawn")
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+def _combine_date_formats(frames):
+    combined = {}
+    for frame in frames:
+        for column, formats in frame.attrs.get('date_formats', {}).items():
+            counts = combined.setdefault(column, {})
+            for name, count in formats.items():
+                counts[name] = counts.get(name, 0) + count
+    return combined
+
+def load_passport_sources(sources, sheets=None, max_workers=None, use_cache=True,
+                          build_index=True, compact=False):
+    """
+    Load passport data from several workbooks and sheets in parallel
+    
+    Every sheet is parsed in a process pool and cleaned like
+    load_passport_data, so the time taken grows with the number of sheets
+    per core. The rows are concatenated in source order and the SOURCE_COLUMN
+    column tells where each comes from. Sheets without the required columns
+    and workbooks that cannot be read are skipped; their labels are kept in
+    df.attrs['skipped_sources'].
     
+    Args:
+        sources (str or list): Workbooks, directories, glob patterns or
+            (workbook, sheets) tuples, see resolve_passport_sources
+        sheets (str, int or list): Names or positions of the sheets to load
+            from each workbook, all if None
+        max_workers (int): Number of worker processes, the CPU count if None
+        use_cache (bool): Reuse the cleaned data cached for identical sheets
+        build_index (bool): Build the derived indexes right away
+        compact (bool): Return the compact layout
+        
+    Returns:
+        pandas.DataFrame: Combined passport data, or None if no sheet could
+        be loaded
+    """
+    try:
+        with stage("load.sources") as span:
+            tasks = resolve_passport_sources(sources, sheets)
+            frames, keys, skipped = _load_sheets(tasks, max_workers, use_cache)
+            span.details['sheets'] = len(tasks)
+            if skipped:
+                print(f"Skipped {len(skipped)} sources without passport data: {skipped}")
+            if not frames:
+                return None
+
+            labels = list(frames)
+            df = pd.concat(list(frames.values()), ignore_index=True)
+            df[SOURCE_COLUMN] = pd.Categorical.from_codes(
+                np.repeat(np.arange(len(labels)), [len(frame) for frame in frames.values()]),
+                categories=labels)
+            df.attrs = {'date_formats': _combine_date_formats(frames.values()),
+                        'skipped_sources': skipped}
+            if use_cache and len(keys) == len(tasks):
+                df.attrs['source_hash'] = hashlib.sha256(":".join(keys).encode()).hexdigest()
+            span.rows = len(df)
+            return _prepare_frame(df, build_index, compact)
+
     except Exception as e:
         print(f"Error loading passport data: {e}")
         return None
 
+def _load_sheets(tasks, max_workers, use_cache):
+    """
+    Load the cleaned frame of each sheet, from the cache or a worker
+
+    Returns:
+        tuple: (dict of label to frame in task order, cache keys of the
+        loaded sheets, labels of the skipped sheets)
+    """
+    results = {}
+    keys = {}
+    workbooks = {}
+    pending = []
+    for path, sheet, label in tasks:
+        if use_cache:
+            try:
+                if path not in workbooks:
+                    workbooks[path] = (file_content_hash(path), workbook_sheet_names(path)[0])
+                file_hash, first_sheet = workbooks[path]
+                keys[label] = _sheet_cache_key(file_hash, sheet, first_sheet)
+                cached_df = load_cached_frame(keys[label])
+                if cached_df is not None:
+                    results[label] = cached_df
+                    continue
+            except Exception as e:
+                print(f"Passport cache unavailable for {label}: {e}")
+        pending.append((path, sheet, label))
+
+    workers = min(max_workers or os.cpu_count() or 1, len(pending))
+    with stage("load.parse_sheets", rows=len(pending)):
+        if workers > 1:
+            with _process_pool(workers) as pool:
+                futures = [pool.submit(_read_passport_sheet, path, sheet)
+                           for path, sheet, label in pending]
+                parsed = [_sheet_result(future.result, label)
+                          for future, (path, sheet, label) in zip(futures, pending)]
+        else:
+            parsed = [_sheet_result(functools.partial(_read_passport_sheet, path, sheet), label)
+                      for path, sheet, label in pending]
+
+    for (path, sheet, label), df in zip(pending, parsed):
+        results[label] = df
+        if df is not None and label in keys:
+            store_cached_frame(keys[label], df)
+
+    frames = {label: results[label] for path, sheet, label in tasks
+              if results.get(label) is not None}
+    skipped = [label for path, sheet, label in tasks if results.get(label) is None]
+    loaded_keys = [keys[label] for label in frames if label in keys]
+    return frames, loaded_keys, skipped
+
+def _sheet_result(read, label):
+    try:
+        return read()
+    except Exception as e:
+        print(f"Error reading {label}: {e}")
+        return None
+
+def text_column(values):
+    """
+    Turn a column of mixed Excel cells into text, keeping missing cells
+    
+    Numeric cells lose their trailing '.0', so 9876543210.0 becomes
+    '9876543210'.
+    
+    Args:
+        values (pandas.Series): Raw values
+        
+    Returns:
+        pandas.Series: Text column with the default string dtype, or the
+        column unchanged if every cell is missing
+    """
+    cells = values.to_numpy(dtype=object)
+    present = values.notna().to_numpy()
+    other = present & np.fromiter((not isinstance(value, str) for value in cells),
+                                  dtype=bool, count=len(cells))
+    if other.any():
+        cells = cells.copy()
+        text = pd.Series(cells[other]).astype(str).str.replace(r"\.0$", "", regex=True)
+        cells[other] = text.to_numpy(dtype=object)
+    return pd.Series(cells, index=values.index, name=values.name).where(present).infer_objects()
+
 def clean_phone_number(phone_raw):
     """
     Clean phone number by removing non-digit characters
@@ -103,57 +522,134 @@ def validate_phone_number(phone_digits):
     else:
         return f"Valid (+91{phone_digits})"
 
+def normalize_phone_column(phones):
+    """
+    Normalise and validate a whole column of phone numbers at once
+    
+    Numeric Excel cells are converted without their trailing '.0', text cells
+    are reduced to digits, and a leading '91' country code or '0' trunk prefix
+    is dropped. A number is valid when 10 digits remain and it starts with
+    7, 8 or 9.
+    
+    Args:
+        phones (pandas.Series): Raw phone values
+        
+    Returns:
+        pandas.DataFrame: Columns PhoneDigits (str), PhoneStatus (categorical
+        of PHONE_STATUSES) and PhoneE164 (Int64 with country code, e.g. 919876543210)
+    """
+    # Numeric Excel cells turn into text like '9876543210.0', the trailing
+    # decimal zeros are removed together with every non-digit character
+    digits = phones.astype(object).where(phones.notna(), "").astype(str)
+    digits = digits.str.replace(r"\.0+$|\D", "", regex=True)
+
+    lengths = digits.str.len()
+    digits = digits.mask((lengths == 12) & digits.str.startswith("91"), digits.str[2:])
+    digits = digits.mask((lengths == 11) & digits.str.startswith("0"), digits.str[1:])
+
+    lengths = digits.str.len()
+    valid = (lengths == 10) & digits.str[:1].isin(["7", "8", "9"])
+    status = np.where(lengths == 0, PHONE_MISSING,
+                      np.where(valid, PHONE_VALID, PHONE_INVALID))
+
+    # Valid numbers are exactly 10 digits, so the country code is an offset
+    e164 = digits.where(valid, "0").astype('int64') + 91 * 10**10
+    return pd.DataFrame({
+        'PhoneDigits': digits,
+        'PhoneStatus': pd.Categorical(status, categories=PHONE_STATUSES),
+        'PhoneE164': e164.astype('Int64').where(valid),
+    }, index=phones.index)
+
+def format_phone_status(status, e164):
+    """
+    Describe a normalised phone number the way validate_phone_number does
+    
+    Args:
+        status (str): Value of the PhoneStatus column
+        e164 (int): Value of the PhoneE164 column
+        
+    Returns:
+        str: Validation status message
+    """
+    if status == PHONE_VALID:
+        return f"Valid (+{e164})"
+    elif status == PHONE_INVALID:
+        return "Invalid phone number"
+    else:
+        return "No phone number"
+
+def _take(df, positions):
+    rows = df.iloc[positions]
+    return expand_passport_frame(rows) if is_compact(df) else rows
+
+def _select_birthdays(df, day, month, year=None):
+    return _take(df, get_birthday_index(df).lookup(month, day, year))
+
+def _select_expiring(df, start, end):
+    return _take(df, get_expiry_index(df).between(start, end))
+
+@timed("query.todays_birthdays")
 def get_todays_birthdays(df):
     """
     Get people who have birthdays today
     
     Args:
-        df (pandas.DataFrame): Passport data
+        df (pandas.DataFrame or iterable): Passport data, or a stream of
+            chunks from iter_passport_chunks
         
     Returns:
         pandas.DataFrame: People with birthdays today
     """
     today = datetime.date.today()
-    today_day = today.day
-    today_month = today.month
-    
-    print(f"DEBUG: Today's date: Day={today_day}, Month={today_month}")
-    print(f"DEBUG: Total records in dataframe: {len(df)}")
-    
-    # Check DOB formats
-    if not df.empty:
-        print(f"DEBUG: First few DOB values: {df['DOB'].head().tolist()}")
-        print(f"DEBUG: DOB data type: {df['DOB'].dtype}")
-    
-    # Get birthdays
-    birthdays = df[(df["DOB"].dt.day == today_day) & (df["DOB"].dt.month == today_month)]
-    
-    print(f"DEBUG: Found {len(birthdays)} birthdays today")
-    if not birthdays.empty:
-        print(f"DEBUG: Birthday people: {birthdays['Name'].tolist()}")
-    
-    return birthdays
 
-def get_future_birthdays(df, day, month):
+    if not isinstance(df, pd.DataFrame):
+        return _filter_chunks(
+            df, lambda chunk: _select_birthdays(chunk, today.day, today.month, today.year))
+    return _select_birthdays(df, today.day, today.month, today.year)
+
+@timed("query.future_birthdays")
+def get_future_birthdays(df, day, month, year=None):
     """
     Get people who have birthdays on a specific date
     
     Args:
-        df (pandas.DataFrame): Passport data
+        df (pandas.DataFrame or iterable): Passport data, or a stream of
+            chunks from iter_passport_chunks
         day (int): Day of the month
         month (int): Month
+        year (int): Year of the date; Feb 29 birthdays fall on Feb 28 in
+            non-leap years
         
     Returns:
         pandas.DataFrame: People with birthdays on the specified date
     """
-    return df[(df["DOB"].dt.day == day) & (df["DOB"].dt.month == month)]
+    if not isinstance(df, pd.DataFrame):
+        return _filter_chunks(df, lambda chunk: _select_birthdays(chunk, day, month, year))
+    return _select_birthdays(df, day, month, year)
+
+@timed("query.birthdays_between")
+def get_birthdays_between(df, start_date, end_date):
+    """
+    Get people who have birthdays between two dates
+    
+    Args:
+        df (pandas.DataFrame): Passport data
+        start_date (datetime.date): First date (inclusive)
+        end_date (datetime.date): Last date (inclusive)
+        
+    Returns:
+        pandas.DataFrame: People with birthdays in the range, in calendar order
+    """
+    return _take(df, get_birthday_index(df).lookup_range(start_date, end_date))
 
+@timed("query.expiring_passports")
 def get_expiring_passports(df, days=90):
     """
     Get passports that are expiring within a specified number of days
     
     Args:
-        df (pandas.DataFrame): Passport data
+        df (pandas.DataFrame or iterable): Passport data, or a stream of
+            chunks from iter_passport_chunks
         days (int): Number of days to check for expiration
         
     Returns:
@@ -162,12 +658,70 @@ def get_expiring_passports(df, days=90):
     today = pd.Timestamp.now()
     expiry_date = today + pd.Timedelta(days=days)
     
-    # Get passports expiring within the specified period
-    mask = (df["Expiry"] > today) & (df["Expiry"] <= expiry_date)
-    expiring_df = df[mask].copy()
+    # Get passports expiring within the specified period, the index keeps
+    # them sorted by expiry date (ascending)
+    if isinstance(df, pd.DataFrame):
+        return _select_expiring(df, today, expiry_date)
+
+    expiring_df = _filter_chunks(
+        df, lambda chunk: _select_expiring(chunk, today, expiry_date))
     
-    # Sort by expiry date (ascending)
+    # Chunks are sorted individually, merge them by expiry date
     if not expiring_df.empty:
-        expiring_df = expiring_df.sort_values(by="Expiry")
+        expiring_df = expiring_df.sort_values(by="Expiry", kind='stable')
     
     return expiring_df
+
+@timed("query.search")
+def search_passports(df, field, query, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    Search passport records through the search index of the DataFrame
+    
+    Args:
+        df (pandas.DataFrame): Passport data
+        field (str): 'name', 'passport' or 'phone', all matched as
+            substrings and ranked
+        query (str): Search term
+        limit (int): Maximum number of records returned, None for all
+        
+    Returns:
+        tuple: (matching records best first, total number of matches)
+    """
+    positions, total = get_search_index(df).search(field, query, limit)
+    return _take(df, positions), total
+
+@timed("query.duplicates")
+def find_duplicate_customers(df, threshold=DEFAULT_DUPLICATE_THRESHOLD):
+    """
+    Find records that are probably the same customer entered more than once
+    
+    Args:
+        df (pandas.DataFrame): Passport data
+        threshold (float): Minimum confidence of a match, between 0 and 1
+        
+    Returns:
+        pandas.DataFrame: The records in duplicate clusters with Cluster,
+        Confidence and Size columns, ordered by cluster
+    """
+    clusters = get_duplicate_index(df).clusters(threshold)
+    rows = df.loc[clusters.index]
+    rows = expand_passport_frame(rows) if is_compact(df) else rows
+    return clusters.join(rows).sort_values(["Cluster"], kind='stable')
+
+def collapse_duplicate_customers(df, selected, threshold=DEFAULT_DUPLICATE_THRESHOLD):
+    """
+    Keep one record per customer among records selected for a send, so a
+    customer entered several times gets a single message
+    
+    Args:
+        df (pandas.DataFrame): Passport data the records were selected from
+        selected (pandas.DataFrame): Selected records, e.g. today's birthdays
+        threshold (float): Minimum confidence of a match, between 0 and 1
+        
+    Returns:
+        tuple: (selected records, preferring ones with a valid phone in each
+        cluster, number of duplicate records dropped)
+    """
+    clusters = get_duplicate_index(df).clusters(threshold)
+    preferred = (selected["PhoneStatus"] == PHONE_VALID).to_numpy() if not selected.empty else None
+    return collapse_duplicates(selected, clusters, preferred)
@@ -0,0 +1,402 @@
+import time
+import uuid
+import heapq
+import asyncio
+import sqlite3
+import datetime
+import threading
+
+from senders import dispatch, STATUS_FAILED, STATUS_UNKNOWN, DEFAULT_CONCURRENCY
+
+# SQLite database holding scheduled messages
+JOBS_DB_FILE = "scheduled_jobs.db"
+
+# Job states
+JOB_PENDING = 'pending'
+JOB_SENDING = 'sending'
+JOB_SENT = 'sent'
+JOB_FAILED = 'failed'
+# Interrupted or answered ambiguously while sending, may have been delivered
+JOB_UNKNOWN = 'unknown'
+
+# Job state of each send outcome, any other outcome counts as sent
+JOB_STATUSES = {STATUS_FAILED: JOB_FAILED, STATUS_UNKNOWN: JOB_UNKNOWN}
+
+# Number of due jobs dispatched together
+DEFAULT_BATCH_SIZE = 100
+
+# Number of upcoming jobs kept in the in-memory timer heap
+DEFAULT_LOOKAHEAD = 1000
+
+# Longest sleep between checks for jobs added by other processes
+DEFAULT_CHECK_INTERVAL = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    due_at REAL NOT NULL,
+    phone TEXT NOT NULL,
+    message TEXT NOT NULL,
+    name TEXT,
+    type TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL,
+    result TEXT,
+    sid TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_due ON jobs(status, due_at, id);
+"""
+
+class JobStore:
+    """
+    Durable store of scheduled messages in SQLite (WAL mode)
+
+    A job moves from pending to sending when it is claimed for dispatch and
+    to sent (with the provider's message sid) or failed once the sender
+    answered. The provider has no idempotency key, so a job left in sending
+    by a crash may or may not have been delivered: recovery moves it to
+    unknown for manual review instead of sending it again.
+    """
+
+    def __init__(self, path=JOBS_DB_FILE):
+        """
+        Open (and create if needed) the store
+
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # Stores created before sids were recorded
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if 'sid' not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN sid TEXT")
+
+    def schedule(self, phone, message, due_at, key=None, name=None, type='Scheduled'):
+        """
+        Add a job, ignoring it if a job with the same key already exists
+
+        Args:
+            phone (str): Phone number with country code
+            message (str): Message to send
+            due_at (datetime.datetime or float): When to send, as datetime or Unix time
+            key (str): Idempotency key, random if None
+            name (str): Recipient name for the notification history
+            type (str): Notification type for the notification history
+
+        Returns:
+            int: Job id, or None if the key was already scheduled
+        """
+        if isinstance(due_at, datetime.datetime):
+            due_at = due_at.timestamp()
+        key = key or uuid.uuid4().hex
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (key, due_at, phone, message, name, type, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, due_at, phone, message, name, type, time.time()))
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def schedule_many(self, jobs, type='Scheduled'):
+        """
+        Add many jobs in one transaction, ignoring keys already scheduled
+
+        Args:
+            jobs (iterable): (phone, message, due_at, key, name) tuples
+            type (str): Notification type for the notification history
+
+        Returns:
+            int: Number of jobs added
+        """
+        now = time.time()
+        rows = [(key or uuid.uuid4().hex,
+                 due_at.timestamp() if isinstance(due_at, datetime.datetime) else due_at,
+                 phone, message, name, type, now)
+                for phone, message, due_at, key, name in jobs]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (key, due_at, phone, message, name, type, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            return self._conn.total_changes - before
+
+    def pending_after(self, due_at, job_id, limit):
+        """
+        Get the next pending jobs in (due_at, id) order after a cursor
+
+        Args:
+            due_at (float): Cursor due time
+            job_id (int): Cursor job id
+            limit (int): Maximum number of jobs
+
+        Returns:
+            list: (due_at, id) tuples
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT due_at, id FROM jobs WHERE status = ? AND (due_at, id) > (?, ?) "
+                "ORDER BY due_at, id LIMIT ?",
+                (JOB_PENDING, due_at, job_id, limit)).fetchall()
+
+    def pending_since(self, job_id, until=None):
+        """
+        Get pending jobs added after a job id
+
+        Args:
+            job_id (int): Highest job id already seen
+            until (tuple): Only jobs at or before this (due_at, id) cursor
+
+        Returns:
+            list: (due_at, id) tuples
+        """
+        query = "SELECT due_at, id FROM jobs WHERE id > ? AND status = ?"
+        params = [job_id, JOB_PENDING]
+        if until is not None:
+            query += " AND (due_at, id) <= (?, ?)"
+            params.extend(until)
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def max_id(self):
+        """
+        Returns:
+            int: Highest job id, 0 if there are no jobs
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM jobs").fetchone()[0]
+
+    def claim(self, job_ids):
+        """
+        Mark pending jobs as sending and return them
+
+        Jobs already claimed by another dispatcher are skipped.
+
+        Args:
+            job_ids (list): Job ids to claim
+
+        Returns:
+            list: (id, key, phone, message, name, type) tuples of the claimed jobs
+        """
+        if not job_ids:
+            return []
+        placeholders = ",".join("?" * len(job_ids))
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                f"SELECT id, key, phone, message, name, type FROM jobs "
+                f"WHERE id IN ({placeholders}) AND status = ?",
+                list(job_ids) + [JOB_PENDING]).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(JOB_SENDING, time.time(), row[0]) for row in rows])
+        return rows
+
+    def complete(self, outcomes):
+        """
+        Record the outcome of dispatched jobs
+
+        Args:
+            outcomes (list): (id, status, result, sid) tuples, status JOB_SENT,
+                JOB_FAILED or JOB_UNKNOWN, sid the provider's message sid if any
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, result = ?, sid = ?, updated_at = ? WHERE id = ?",
+                [(status, result, sid, now, job_id) for job_id, status, result, sid in outcomes])
+
+    def recover(self):
+        """
+        Move jobs interrupted while sending to unknown
+
+        They may have reached the provider before the crash, so they are
+        left for manual review rather than sent again.
+
+        Returns:
+            int: Number of interrupted jobs
+        """
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE status = ?",
+                (JOB_UNKNOWN, "Interrupted while sending", time.time(), JOB_SENDING)).rowcount
+
+    def unknown(self):
+        """
+        Get the jobs whose delivery is unknown, for manual review
+
+        Returns:
+            list: (id, key, phone, name, due_at, result) tuples
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, key, phone, name, due_at, result FROM jobs WHERE status = ? "
+                "ORDER BY due_at, id", (JOB_UNKNOWN,)).fetchall()
+
+    def counts(self):
+        """
+        Returns:
+            dict: Number of jobs per status
+        """
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+class Scheduler:
+    """
+    Dispatches due jobs from a JobStore to a sender
+
+    Only the next `lookahead` pending jobs are kept in a heap ordered by due
+    time, loaded page by page from the (status, due_at) index, and the loop
+    sleeps until the earliest one is due. Jobs added later, by this or other
+    processes, are found by a cheap check on the highest job id: those due
+    before the paging cursor go straight to the heap, the others are paged
+    in once the heap drains.
+    """
+
+    def __init__(self, store, sender, batch_size=DEFAULT_BATCH_SIZE,
+                 lookahead=DEFAULT_LOOKAHEAD, check_interval=DEFAULT_CHECK_INTERVAL,
+                 concurrency=DEFAULT_CONCURRENCY, notification_store=None):
+        """
+        Args:
+            store (JobStore): Job store
+            sender (senders.Sender): Backend used to deliver messages
+            batch_size (int): Maximum number of jobs dispatched together
+            lookahead (int): Number of upcoming jobs kept in memory
+            check_interval (float): Longest sleep before checking for new jobs
+            concurrency (int): Number of sends in flight at once
+            notification_store (NotificationStore): Store outcomes are logged to, if any
+        """
+        self.store = store
+        self.sender = sender
+        self.batch_size = batch_size
+        self.lookahead = lookahead
+        self.check_interval = check_interval
+        self.concurrency = concurrency
+        self.notification_store = notification_store
+        self.stats = {'dispatched': 0, 'sent': 0, 'failed': 0, 'unknown': 0}
+
+        self._heap = []
+        self._queued = set()
+        self._cursor = (float('-inf'), 0)
+        self._exhausted = False
+        self._max_id = 0
+        self._stopped = False
+
+    def _push(self, due_at, job_id):
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            heapq.heappush(self._heap, (due_at, job_id))
+
+    def _refill(self):
+        if self._heap or self._exhausted:
+            return
+        rows = self.store.pending_after(*self._cursor, self.lookahead)
+        for due_at, job_id in rows:
+            self._push(due_at, job_id)
+        if rows:
+            self._cursor = rows[-1]
+        self._exhausted = len(rows) < self.lookahead
+
+    def _check_new_jobs(self):
+        max_id = self.store.max_id()
+        if max_id == self._max_id:
+            return
+        # The paged cursor already went past these
+        for due_at, job_id in self.store.pending_since(self._max_id, self._cursor):
+            self._push(due_at, job_id)
+        # Later ones are reached by paging on, even after a short last page
+        self._exhausted = False
+        self._max_id = max_id
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            _, job_id = heapq.heappop(self._heap)
+            self._queued.discard(job_id)
+            due.append(job_id)
+        return due
+
+    async def _dispatch(self, job_ids):
+        jobs = self.store.claim(job_ids)
+        if not jobs:
+            return
+        results = await dispatch(((key, phone, message) for _, key, phone, message, _, _ in jobs),
+                                 self.sender, concurrency=self.concurrency)
+
+        outcomes = []
+        notifications = []
+        for (job_id, _, phone, _, name, notification_type), result in zip(jobs, results):
+            status = JOB_STATUSES.get(result['status'], JOB_SENT)
+            outcomes.append((job_id, status, result.get('error') or result['status'],
+                             result.get('sid')))
+            self.stats[status] += 1
+            notifications.append({'name': name, 'phone': phone, 'type': notification_type,
+                                  'status': result['status']})
+        self.store.complete(outcomes)
+        if self.notification_store is not None:
+            self.notification_store.add_notifications(notifications)
+        self.stats['dispatched'] += len(jobs)
+
+    async def run_once(self, now=None):
+        """
+        Dispatch every job that is due
+
+        Args:
+            now (float): Unix time to compare due times with, current time if None
+
+        Returns:
+            int: Number of jobs taken from the heap
+        """
+        now = now or time.time()
+        self._check_new_jobs()
+        handled = 0
+        while True:
+            self._refill()
+            due = self._pop_due(now)
+            if not due:
+                return handled
+            await self._dispatch(due)
+            handled += len(due)
+
+    async def run(self):
+        """
+        Run until stop() is called, sleeping until the next job is due
+        """
+        interrupted = self.store.recover()
+        if interrupted:
+            print(f"{interrupted} jobs were interrupted while sending, "
+                  f"marked {JOB_UNKNOWN} for review")
+        self._max_id = self.store.max_id()
+        while not self._stopped:
+            await self.run_once()
+            self._refill()
+            delay = self.check_interval
+            if self._heap:
+                delay = min(delay, max(0.0, self._heap[0][0] - time.time()))
+            await asyncio.sleep(delay)
+
+    def stop(self):
+        """
+        Ask the run loop to finish after its current iteration
+        """
+        self._stopped = True
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+def get_job_store():
+    """
+    Get the process-wide job store
+
+    Returns:
+        JobStore: Shared store backed by JOBS_DB_FILE
+    """
+    global _job_store
+    with _job_store_lock:
+        if _job_store is None:
+            _job_store = JobStore()
+        return _job_store
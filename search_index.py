@@ -0,0 +1,328 @@
+import re
+import numpy as np
+import pandas as pd
+
+from compact_layout import is_compact, unpack_passports
+
+# Fields the index answers queries on
+SEARCH_FIELDS = ['name', 'passport', 'phone']
+
+# Results returned when no limit is given
+DEFAULT_LIMIT = 100
+
+# Characters that separate the words of a name
+_SEPARATORS = " .,-'()/&_"
+
+def fold_names(values):
+    """
+    Fold names for matching: Unicode compatibility decomposition without
+    combining marks, case folding and single spaces
+
+    Args:
+        values (pandas.Series): Names
+
+    Returns:
+        pandas.Series: Folded names, '' for missing values
+    """
+    text = values.astype(object).where(values.notna(), "").astype(str)
+    # Only names with non-ASCII characters need the Unicode decomposition
+    accented = ~text.str.isascii()
+    if accented.any():
+        decomposed = text[accented].str.normalize('NFKD')
+        text = text.mask(accented, decomposed.str.replace("[\u0300-\u036f]", "", regex=True))
+    return text.str.casefold().str.replace(r"\s+", " ", regex=True).str.strip()
+
+def fold_query(query):
+    """
+    Fold a name query the same way as fold_names
+
+    Args:
+        query (str): Search term
+
+    Returns:
+        str: Folded search term
+    """
+    return fold_names(pd.Series([query])).iloc[0]
+
+def _code_points(text):
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+class _SubstringIndex:
+    """
+    Trigram index over short strings (passport numbers, phone digits) with
+    the row each one came from, for substring lookups
+
+    Keys are every run of three characters, packed with the row into one
+    sorted int64 array. Queries of three or more characters intersect the
+    rows of their trigrams and confirm the substring on the candidates;
+    shorter queries scan the strings.
+    """
+
+    def __init__(self, values, rows):
+        self.values = values
+        self.rows = rows
+        self.count = len(values)
+        codes = _code_points("\x00".join(values) + "\x00")
+        present = np.zeros(int(codes.max()) + 1, dtype=bool)
+        present[codes] = True
+        self._char_ids = np.cumsum(present) - 1
+        self._char_ids[~present] = -1
+        self._alphabet = size = int(present.sum())
+
+        ids = self._char_ids[codes].astype(np.int64)
+        boundary = codes == 0
+        index = np.cumsum(boundary) - boundary
+        whole = ~(boundary[:-2] | boundary[1:-1] | boundary[2:])
+        keys = ((ids[:-2] * size + ids[1:-1]) * size + ids[2:])[whole]
+        positions = index[:-2][whole]
+        width = max(self.count, 1)
+        if size ** 3 * width < 2 ** 63:
+            packed = np.sort(keys * width + positions)
+            if len(packed):
+                packed = packed[np.concatenate(([True], packed[1:] != packed[:-1]))]
+            keys = packed // width
+            positions = packed % width
+        else:
+            order = np.lexsort((positions, keys))
+            keys = keys[order]
+            positions = positions[order]
+            unique = np.ones(len(keys), dtype=bool)
+            unique[1:] = (keys[1:] != keys[:-1]) | (positions[1:] != positions[:-1])
+            keys = keys[unique]
+            positions = positions[unique]
+        self._keys = keys
+        self._positions = positions
+
+    def _candidates(self, query):
+        codes = _code_points(query)
+        if codes.max() >= len(self._char_ids) or (self._char_ids[codes] < 0).any():
+            return np.empty(0, dtype=np.int64)
+        ids = self._char_ids[codes].astype(np.int64)
+        size = self._alphabet
+        candidates = None
+        for key in np.unique((ids[:-2] * size + ids[1:-1]) * size + ids[2:]).tolist():
+            low, high = np.searchsorted(self._keys, [key, key + 1])
+            positions = self._positions[low:high]
+            candidates = positions if candidates is None else np.intersect1d(
+                candidates, positions, assume_unique=True)
+            if not len(candidates):
+                break
+        # The trigrams may occur in another order, confirm the substring
+        return np.array([at for at in candidates.tolist() if query in self.values[at]],
+                        dtype=np.int64)
+
+    def lookup(self, query):
+        """
+        Find the strings containing a query
+
+        Args:
+            query (str): Substring to look for
+
+        Returns:
+            numpy.ndarray: Rows of the strings starting with the query, then
+            of those ending with it, then of the others, each in row order
+        """
+        if not self.count:
+            return self.rows[:0]
+        if len(query) < 3:
+            found = np.flatnonzero(np.char.find(self.values, query) >= 0)
+        else:
+            found = self._candidates(query)
+        values = self.values[found]
+        starts = np.char.startswith(values, query)
+        ends = np.char.endswith(values, query) & ~starts
+        return np.concatenate([np.sort(self.rows[found[group]])
+                               for group in (starts, ends, ~(starts | ends))])
+
+class SearchIndex:
+    """
+    Search index over the names, passport numbers and phone numbers of a
+    passport DataFrame
+
+    Names are folded (case, diacritics, spacing) and indexed in an inverted
+    index stored as sorted arrays: unique keys, offsets and the rows holding
+    each key. Keys are every trigram of a name plus the first one and two
+    characters of each word. Queries of three or more characters intersect
+    the posting lists of their trigrams and confirm the substring on the
+    remaining candidates; shorter queries match the start of a word.
+    Passport numbers and phone digits are indexed by trigram as well, so
+    they match anywhere.
+    """
+
+    def __init__(self, df):
+        """
+        Build the index
+
+        Args:
+            df (pandas.DataFrame): Passport data, in either layout
+        """
+        self.rows = len(df)
+        self.names = fold_names(df["Name"]).to_numpy(dtype=object)
+        self._build_postings()
+
+        passports = df["Passport"]
+        if is_compact(df) and passports.dtype == np.int64:
+            passports = pd.Series(unpack_passports(passports))
+        passports = (passports.astype(object).where(passports.notna(), "")
+                     .astype(str).str.strip().str.upper().to_numpy(dtype=str))
+        rows = np.arange(self.rows)
+        present = passports != ""
+        self.passports = _SubstringIndex(passports[present], rows[present])
+
+        if is_compact(df):
+            phones = df["Phone"].astype(str).where(df["Phone"] != 0, "")
+        else:
+            phones = df["PhoneDigits"].astype(str)
+        phones = phones.to_numpy(dtype=str)
+        present = phones != ""
+        self.phones = _SubstringIndex(phones[present], rows[present])
+
+    def _build_postings(self):
+        # All names in one code point array, separated by 0 so no key spans
+        # two names
+        codes = _code_points("\x00".join(self.names) + "\x00")
+
+        # Dense ids for the characters in use keep keys small enough to
+        # be packed with the row into one int64
+        present = np.zeros(int(codes.max()) + 1, dtype=bool)
+        present[codes] = True
+        self._char_ids = np.cumsum(present) - 1
+        self._char_ids[~present] = -1
+        self._alphabet = int(present.sum())
+        size = self._alphabet
+        ids = self._char_ids[codes].astype(np.int64)
+
+        boundary = codes == 0
+        row_of = np.cumsum(boundary) - boundary
+        separator = boundary | np.isin(codes, _code_points(_SEPARATORS))
+
+        keys = []
+        rows = []
+        if len(codes) >= 3:
+            # Every run of three characters within a name
+            whole = ~(boundary[:-2] | boundary[1:-1] | boundary[2:])
+            keys.append(((ids[:-2] * size + ids[1:-1]) * size + ids[2:])[whole])
+            rows.append(row_of[:-2][whole])
+
+        # The first one and two characters of every word
+        starts = ~separator
+        starts[1:] &= separator[:-1]
+        one = np.flatnonzero(starts)
+        keys.append(size ** 3 + ids[one])
+        rows.append(row_of[one])
+        two = one[one + 1 < len(codes)]
+        two = two[~separator[two + 1]]
+        keys.append(size ** 3 + size + ids[two] * size + ids[two + 1])
+        rows.append(row_of[two])
+
+        keys = np.concatenate(keys)
+        rows = np.concatenate(rows)
+        width = max(len(self.names), 1)
+        if (size ** 3 + size + size ** 2) * width < 2 ** 63:
+            packed = np.sort(keys * width + rows)
+            packed = packed[np.concatenate(([True], packed[1:] != packed[:-1]))]
+            keys = packed // width
+            rows = packed % width
+        else:
+            order = np.lexsort((rows, keys))
+            keys = keys[order]
+            rows = rows[order]
+            unique = np.ones(len(keys), dtype=bool)
+            unique[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+            keys = keys[unique]
+            rows = rows[unique]
+
+        first = np.flatnonzero(np.diff(keys)) + 1
+        first = np.concatenate(([0], first)) if len(keys) else first
+        self.posting_keys = keys[first]
+        self.posting_offsets = np.append(first, len(keys))
+        self.posting_rows = rows
+
+    def _postings(self, key):
+        at = np.searchsorted(self.posting_keys, key)
+        if at == len(self.posting_keys) or self.posting_keys[at] != key:
+            return self.posting_rows[:0]
+        return self.posting_rows[self.posting_offsets[at]:self.posting_offsets[at + 1]]
+
+    def _query_keys(self, query):
+        codes = _code_points(query)
+        if codes.max() >= len(self._char_ids):
+            return None
+        ids = self._char_ids[codes].astype(np.int64)
+        if (ids < 0).any():
+            return None
+
+        size = self._alphabet
+        if len(ids) == 1:
+            return [size ** 3 + ids[0]]
+        if len(ids) == 2:
+            return [size ** 3 + size + ids[0] * size + ids[1]]
+        return np.unique((ids[:-2] * size + ids[1:-1]) * size + ids[2:])
+
+    def _name_candidates(self, query):
+        keys = self._query_keys(query)
+        if keys is None:
+            return np.empty(0, dtype=np.int64)
+
+        postings = sorted((self._postings(key) for key in keys), key=len)
+        candidates = postings[0]
+        for rows in postings[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+        if len(query) < 3:
+            return candidates
+        # The trigrams may occur in another order, confirm the substring
+        return np.array([row for row in candidates if query in self.names[row]],
+                        dtype=np.int64)
+
+    def _rank_names(self, query, candidates):
+        names = pd.Series(self.names[candidates])
+        word_start = names.str.contains(r"(?:^|\W)" + re.escape(query), regex=True)
+        score = ((names == query).to_numpy() * 4 + names.str.startswith(query).to_numpy() * 2
+                 + word_start.to_numpy())
+        order = np.lexsort((candidates, names.str.len().to_numpy(), -score))
+        return candidates[order]
+
+    def search(self, field, query, limit=DEFAULT_LIMIT):
+        """
+        Find rows matching a query, best matches first
+
+        Names match anywhere (words starting with the query for one or two
+        characters) and rank exact names, then names starting with the
+        query, then words starting with it, shorter names first. Passport
+        numbers and phone digits match anywhere, the ones starting with the
+        query first, then the ones ending with it.
+
+        Args:
+            field (str): One of SEARCH_FIELDS
+            query (str): Search term
+            limit (int): Maximum number of rows returned, None for all
+
+        Returns:
+            tuple: (row positions, total number of matches)
+        """
+        if field == 'name':
+            query = fold_query(query)
+            if not query:
+                return np.empty(0, dtype=np.int64), 0
+            matches = self._rank_names(query, self._name_candidates(query))
+        elif field == 'passport':
+            query = query.strip().upper()
+            if not query:
+                return np.empty(0, dtype=np.int64), 0
+            matches = self.passports.lookup(query)
+        elif field == 'phone':
+            digits = re.sub(r"\D", "", query)
+            if len(digits) > 10 and digits.startswith("91"):
+                digits = digits[2:]
+            if not digits:
+                return np.empty(0, dtype=np.int64), 0
+            matches = self.phones.lookup(digits)
+        else:
+            raise ValueError(f"Unsupported search field: {field}")
+
+        total = len(matches)
+        if limit is not None:
+            matches = matches[:limit]
+        return matches, total
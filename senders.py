@@ -0,0 +1,500 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import datetime
+import threading
+import email.utils
+import urllib.parse
+import concurrent.futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Outcome statuses recorded in the notification history
+STATUS_SENT = 'Sent'
+STATUS_FAILED = 'Failed'
+STATUS_LINK = 'Link Generated'
+# The provider may or may not have delivered the message, see UncertainSendError
+STATUS_UNKNOWN = 'Unknown'
+
+# Twilio REST API, the mock server mimics the same messages endpoint
+TWILIO_API_URL = "https://api.twilio.com"
+TWILIO_MESSAGES_PATH = "/2010-04-01/Accounts/{account_sid}/Messages.json"
+
+# Dispatch defaults
+DEFAULT_CONCURRENCY = 20
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+
+def build_whatsapp_link(phone_number, message):
+    """
+    Build a wa.me link that opens WhatsApp with a prefilled message
+
+    Args:
+        phone_number (str): Phone number with country code, with or without '+'
+        message (str): Message to send
+
+    Returns:
+        str: WhatsApp web link
+    """
+    if phone_number.startswith('+'):
+        phone_number = phone_number[1:]
+    return f"https://wa.me/{phone_number}?text={urllib.parse.quote(message)}"
+
+def parse_retry_after(value, now=None):
+    """
+    Parse a Retry-After header, given in seconds or as an HTTP date
+
+    Args:
+        value (str): Header value
+        now (datetime.datetime): Current time in UTC, for HTTP dates
+
+    Returns:
+        float: Seconds to wait, or None if the value cannot be parsed
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(0.0, seconds) if math.isfinite(seconds) else None
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+class RetryableSendError(Exception):
+    """
+    Temporary delivery failure where the provider did not accept the message
+    (rate limited, unavailable, connection not established)
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class UncertainSendError(Exception):
+    """
+    Failure after the request reached the provider (read timeout, server
+    error), so the message may have been delivered
+
+    The Messages API has no idempotency key, so such sends are never
+    retried: a retry could deliver the message twice. They are reported
+    with STATUS_UNKNOWN for manual review instead.
+    """
+
+class TokenBucket:
+    """
+    Asyncio token bucket limiting the rate of sends to one provider
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum burst size, defaults to one second of tokens
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Wait until a token is available and take it
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class Sender:
+    """
+    Base class of asynchronous message sender backends
+    """
+
+    # Name used to select the backend, e.g. on the command line
+    name = None
+
+    # Default sends per second allowed by the provider, None for unlimited
+    rate_limit = None
+
+    async def send(self, phone_number, message, idempotency_key=None):
+        """
+        Send one message
+
+        Args:
+            phone_number (str): Phone number with country code
+            message (str): Message to send
+            idempotency_key (str): Key identifying the send, for backends
+                that can drop duplicates
+
+        Returns:
+            dict: Result with 'status' and backend specific details, e.g.
+            the provider's message 'sid'
+
+        Raises:
+            RetryableSendError: If the send failed temporarily and may be retried
+            UncertainSendError: If the message may have been delivered anyway
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """
+        Release resources held by the backend
+        """
+
+class LinkSender(Sender):
+    """
+    Generates wa.me links instead of delivering messages
+    """
+
+    name = 'link'
+
+    def __init__(self):
+        self.links = []
+
+    async def send(self, phone_number, message, idempotency_key=None):
+        link = build_whatsapp_link(phone_number, message)
+        self.links.append(link)
+        return {'status': STATUS_LINK, 'link': link}
+
+class TwilioSender(Sender):
+    """
+    Sends WhatsApp messages through the Twilio REST API
+
+    Requests go through one pooled requests.Session on a dedicated thread
+    pool, so keep-alive connections are reused across sends.
+    """
+
+    name = 'twilio'
+    rate_limit = 80
+
+    def __init__(self, account_sid=None, auth_token=None, from_number=None,
+                 base_url=TWILIO_API_URL, pool_size=DEFAULT_CONCURRENCY, timeout=10):
+        """
+        Args:
+            account_sid (str): Account SID, from TWILIO_ACCOUNT_SID if None
+            auth_token (str): Auth token, from TWILIO_AUTH_TOKEN if None
+            from_number (str): WhatsApp sender number, from TWILIO_FROM if None
+            base_url (str): API root URL
+            pool_size (int): Maximum number of pooled connections and threads
+            timeout (float): Request timeout in seconds
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.account_sid = account_sid or os.environ.get("TWILIO_ACCOUNT_SID", "")
+        self.auth_token = auth_token or os.environ.get("TWILIO_AUTH_TOKEN", "")
+        self.from_number = from_number or os.environ.get("TWILIO_FROM", "")
+        self.url = base_url.rstrip("/") + TWILIO_MESSAGES_PATH.format(account_sid=self.account_sid)
+        self.timeout = timeout
+
+        self._session = requests.Session()
+        self._session.auth = (self.account_sid, self.auth_token)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=pool_size)
+
+    def _post(self, phone_number, message, idempotency_key):
+        import requests
+
+        # The Messages API ignores idempotency tokens, so duplicates are
+        # prevented by never retrying a request the provider may have processed
+        data = {
+            'From': f"whatsapp:{self.from_number}",
+            'To': f"whatsapp:{phone_number}",
+            'Body': message,
+        }
+        try:
+            response = self._session.post(self.url, data=data, timeout=self.timeout)
+        except requests.ConnectTimeout as e:
+            raise RetryableSendError(f"Request failed: {e}")
+        except requests.RequestException as e:
+            raise UncertainSendError(f"Request failed: {e}")
+
+        # Rate limited or unavailable: the message was refused, not created
+        if response.status_code in (429, 503):
+            # Without a usable Retry-After the retry backs off exponentially
+            raise RetryableSendError(f"HTTP {response.status_code}",
+                                     parse_retry_after(response.headers.get('Retry-After')))
+        if response.status_code >= 500:
+            raise UncertainSendError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            return {'status': STATUS_FAILED, 'error': f"HTTP {response.status_code}: {response.text[:200]}"}
+        return {'status': STATUS_SENT, 'sid': response.json().get('sid')}
+
+    async def send(self, phone_number, message, idempotency_key=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._post, phone_number,
+                                          message, idempotency_key)
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+        self._session.close()
+
+class MockHTTPServer:
+    """
+    Local HTTP server mimicking the Twilio messages endpoint, for tests and
+    offline runs
+
+    Every accepted request is recorded as a delivered message, like the real
+    API it has no idempotency key. Optional latency and failure injection
+    exercise the retry path.
+    """
+
+    def __init__(self, latency=0.0, fail_every=0, fail_status=429, retry_after=None,
+                 host="127.0.0.1", port=0):
+        """
+        Args:
+            latency (float): Seconds to wait before answering each request
+            fail_every (int): Answer every n-th request with fail_status, 0 to disable
+            fail_status (int): HTTP status of the failed requests
+            retry_after (str): Retry-After header of the failed requests, if any
+            host (str): Interface to listen on
+            port (int): Port to listen on, 0 picks a free port
+        """
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.messages = []
+        self._requests = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                form = urllib.parse.parse_qs(self.rfile.read(length).decode())
+                status, body, headers = server._handle(form)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL to pass to TwilioSender"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        """Number of requests answered so far"""
+        return self._requests
+
+    def _handle(self, form):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._requests += 1
+            if self.fail_every and self._requests % self.fail_every == 0:
+                headers = {'Retry-After': self.retry_after} if self.retry_after is not None else {}
+                return self.fail_status, {'message': 'Request failed'}, headers
+            sid = f"SM{len(self.messages):032d}"
+            self.messages.append({
+                'sid': sid,
+                'to': form.get('To', [''])[0],
+                'body': form.get('Body', [''])[0],
+            })
+        return 201, {'sid': sid, 'status': 'queued'}, {}
+
+    def start(self):
+        """
+        Start serving in a background thread
+
+        Returns:
+            MockHTTPServer: self
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving and close the socket
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+class MockSender(TwilioSender):
+    """
+    TwilioSender talking to its own MockHTTPServer
+    """
+
+    name = 'mock'
+    rate_limit = None
+
+    def __init__(self, latency=0.0, fail_every=0, fail_status=429, retry_after=None,
+                 pool_size=DEFAULT_CONCURRENCY):
+        self.server = MockHTTPServer(latency=latency, fail_every=fail_every,
+                                     fail_status=fail_status, retry_after=retry_after).start()
+        super().__init__(account_sid="ACmock", auth_token="mock", from_number="+10000000000",
+                         base_url=self.server.url, pool_size=pool_size)
+
+    async def close(self):
+        await super().close()
+        self.server.stop()
+
+# Available backends by name
+SENDERS = {
+    LinkSender.name: LinkSender,
+    TwilioSender.name: TwilioSender,
+    MockSender.name: MockSender,
+}
+
+def get_sender(name, **options):
+    """
+    Create a sender backend by name
+
+    Args:
+        name (str): One of the SENDERS keys
+        **options: Backend specific options
+
+    Returns:
+        Sender: New sender instance
+
+    Raises:
+        ValueError: If there is no backend with that name
+    """
+    if name not in SENDERS:
+        raise ValueError(f"Unknown sender backend '{name}', expected one of {sorted(SENDERS)}")
+    return SENDERS[name](**options)
+
+async def _send_with_retry(sender, bucket, job, max_retries, backoff):
+    key, phone_number, message = job
+    attempt = 0
+    while True:
+        attempt += 1
+        if bucket is not None:
+            await bucket.acquire()
+        try:
+            result = await sender.send(phone_number, message, idempotency_key=key)
+        except RetryableSendError as e:
+            if attempt > max_retries:
+                return {'key': key, 'status': STATUS_FAILED, 'error': str(e), 'attempts': attempt}
+            if e.retry_after is not None:
+                # Never sooner than the server asked, jitter only adds to it
+                delay = e.retry_after * random.uniform(1, 1.5)
+            else:
+                delay = backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            await asyncio.sleep(delay)
+            continue
+        except UncertainSendError as e:
+            return {'key': key, 'status': STATUS_UNKNOWN, 'error': str(e), 'attempts': attempt}
+        except Exception as e:
+            return {'key': key, 'status': STATUS_FAILED, 'error': str(e), 'attempts': attempt}
+
+        result = dict(result)
+        result['key'] = key
+        result['attempts'] = attempt
+        return result
+
+async def dispatch(jobs, sender, concurrency=DEFAULT_CONCURRENCY, rate_limit=None,
+                   max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF, on_result=None):
+    """
+    Send many messages through a bounded asyncio queue
+
+    Args:
+        jobs (iterable): (key, phone_number, message) tuples; key is passed to
+            the sender and returned with the result
+        sender (Sender): Backend used to deliver messages
+        concurrency (int): Number of sends in flight at once
+        rate_limit (float): Sends per second, the sender's default if None
+        max_retries (int): Retries of temporary failures per message
+        backoff (float): Base delay in seconds, doubled after each retry
+        on_result (callable): Called with each result as soon as it is known;
+            an exception it raises stops the dispatch and is raised
+
+    Returns:
+        list: One result dict per job, in job order, each with 'key',
+        'status' and 'attempts'; a STATUS_UNKNOWN send is not retried as it
+        may have been delivered
+    """
+    rate_limit = rate_limit or sender.rate_limit
+    bucket = TokenBucket(rate_limit) if rate_limit else None
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    results = {}
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            position, job = item
+            result = await _send_with_retry(sender, bucket, job, max_retries, backoff)
+            results[position] = result
+            if on_result is not None:
+                on_result(result)
+            queue.task_done()
+
+    async def producer():
+        count = 0
+        for count, job in enumerate(jobs, 1):
+            await queue.put((count - 1, job))
+        for _ in workers:
+            await queue.put(None)
+        return count
+
+    # Awaited together, so an error in a worker (e.g. raised by on_result)
+    # stops the producer instead of leaving it blocked on a full queue
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    tasks = [asyncio.create_task(producer())] + workers
+    try:
+        count = (await asyncio.gather(*tasks))[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return [results[position] for position in range(count)]
+
+def dispatch_sync(jobs, sender, **options):
+    """
+    Run dispatch from synchronous code
+
+    Args:
+        jobs (iterable): (key, phone_number, message) tuples
+        sender (Sender): Backend used to deliver messages
+        **options: Options passed to dispatch
+
+    Returns:
+        list: One result dict per job, in job order
+    """
+    return asyncio.run(dispatch(jobs, sender, **options))
@@ -0,0 +1,28 @@
+import io
+
+from PIL import Image
+
+from asset_cache import AssetCache, ORIGINAL_SUFFIX
+
+# Nothing listens on the discard port, so the download fails at once
+URL = "http://127.0.0.1:9/header.png"
+
+def png(width, height):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), 'navy').save(output, format='PNG')
+    return output.getvalue()
+
+def test_no_image_until_downloaded(tmp_path):
+    cache = AssetCache(cache_dir=str(tmp_path), timeout=1)
+    assert cache.image(URL, width=100) is None
+    assert cache.wait(5)
+    # The failed download is not retried right away and nothing is shown
+    assert cache.image(URL, width=100) is None
+
+def test_downloaded_image_is_served_as_thumbnail(tmp_path):
+    cache = AssetCache(cache_dir=str(tmp_path))
+    with open(cache._path(URL, ORIGINAL_SUFFIX), 'wb') as f:
+        f.write(png(400, 200))
+
+    thumbnail = Image.open(io.BytesIO(cache.image(URL, width=100)))
+    assert thumbnail.size == (100, 50)
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from compact_layout import compact_passport_frame, expand_passport_frame, PHONE_TEXT_COLUMN
+from passport_service import clean_passport_frame
+
+def passport_frame():
+    return clean_passport_frame(pd.DataFrame({
+        'Name': ["Asha Shah", "Ravi Jain", "Meera Iyer", "Kiran Patel", "Anand Desai", "Asha Shah"],
+        'DOB': ["29.02.1980", "01/06/1975", "1990-03-01", "12.12.2001", "31.12.1968", "01.01.1992"],
+        'Phone': [9876543210, "+91 98765 43211", "0123456789", "call office", np.nan,
+                  "1234567890123456789012"],
+        'Gmail': [np.nan, "ravi@example.com", np.nan, np.nan, "anand@example.com", np.nan],
+        'Passport': ["A1234567", 7654321, np.nan, "Z7654321", np.nan, "A7654321"],
+        'Expiry': ["01.01.2030", np.nan, "2028-02-29", "31.12.2026", np.nan, "05.05.2031"],
+    }))
+
+def test_expand_restores_compacted_frame():
+    df = passport_frame()
+    compact = compact_passport_frame(df)
+
+    assert compact["Phone"].dtype == np.int64
+    pd.testing.assert_frame_equal(expand_passport_frame(compact), df)
+    # Selected rows expand the same way
+    pd.testing.assert_frame_equal(expand_passport_frame(compact.iloc[[3, 0, 2]]),
+                                  df.iloc[[3, 0, 2]])
+
+def test_phones_keep_leading_zeros_and_workbook_text():
+    df = passport_frame()
+    expanded = expand_passport_frame(compact_passport_frame(df))
+
+    assert expanded["Phone"].tolist()[1:4] == ["+91 98765 43211", "0123456789", "call office"]
+    assert expanded["PhoneDigits"].tolist()[2:4] == ["0123456789", ""]
+    assert expanded["PhoneDigits"].iloc[5] == "1234567890123456789012"
+    assert PHONE_TEXT_COLUMN not in expanded.columns
+
+def test_passports_that_do_not_pack_stay_text():
+    df = passport_frame()
+    df["Passport"] = df["Passport"].astype(object)
+    df.loc[0, "Passport"] = " A1234567"
+    compact = compact_passport_frame(df)
+
+    assert isinstance(compact["Passport"].dtype, pd.CategoricalDtype)
+    assert expand_passport_frame(compact)["Passport"].iloc[0] == " A1234567"
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_cache import load_cached_frame, store_cached_frame
+from passport_service import clean_passport_frame, text_column
+
+def raw_passport_frame():
+    # Cells as read from Excel: numbers and text mixed in the same column
+    return pd.DataFrame({
+        'Name': ["Asha Shah", "Ravi Jain", "Zoë Müller", "Meera Iyer"],
+        'DOB': ["29.02.1980", "01/06/1975", "1990-03-01", "12.12.2001"],
+        'Phone': [9876543210, "+91 98765 43211", np.nan, 9876543212.0],
+        'Gmail': [np.nan, "ravi@example.com", 12345, np.nan],
+        'Passport': ["A1234567", 7654321, np.nan, "Z7654321"],
+        'Expiry': ["01.01.2030", np.nan, "2028-02-29", "31.12.2026"],
+    })
+
+def test_cached_frame_matches_uncached(tmp_path):
+    df = clean_passport_frame(raw_passport_frame())
+    assert store_cached_frame("key", df, cache_dir=str(tmp_path))
+    cached = load_cached_frame("key", cache_dir=str(tmp_path))
+
+    pd.testing.assert_frame_equal(cached, df)
+    for column in df.columns:
+        assert cached[column].map(type).tolist() == df[column].map(type).tolist(), column
+    assert cached.attrs['date_formats'] == df.attrs['date_formats']
+
+def test_mixed_cells_become_text():
+    df = clean_passport_frame(raw_passport_frame())
+    assert df["Phone"].tolist()[:2] == ["9876543210", "+91 98765 43211"]
+    assert df["Phone"].tolist()[3] == "9876543212"
+    assert df["Passport"].tolist()[1] == "7654321"
+    assert df["Gmail"].isna().tolist() == [True, False, False, True]
+    assert pd.api.types.is_string_dtype(df["Passport"])
+
+def test_text_column_keeps_all_missing_column():
+    values = pd.Series([np.nan, None], dtype=object)
+    assert text_column(values).isna().all()
+
+@pytest.mark.parametrize("dtype", ["str", object])
+def test_text_roundtrip(tmp_path, dtype):
+    values = pd.Series(["", "plain", np.nan, "Zoë Müller ✈", "x" * 1000], dtype=dtype)
+    df = pd.DataFrame({'text': values})
+    assert store_cached_frame("key", df, cache_dir=str(tmp_path))
+
+    cached = load_cached_frame("key", cache_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(cached, df)
+
+def test_text_is_not_stored_fixed_width(tmp_path):
+    df = pd.DataFrame({'text': ["x" * 10000] + ["y"] * 999})
+    assert store_cached_frame("key", df, cache_dir=str(tmp_path))
+    data = np.load(tmp_path / "key" / "0.npy")
+    assert data.dtype == np.uint8
+    assert data.nbytes == 10000 + 999
+
+def test_mixed_object_column_is_not_cached(tmp_path, capsys):
+    df = pd.DataFrame({'mixed': pd.Series(["a", 1], dtype=object)})
+    assert not store_cached_frame("key", df, cache_dir=str(tmp_path))
+    assert load_cached_frame("key", cache_dir=str(tmp_path)) is None
+    assert "mixes text" in capsys.readouterr().out
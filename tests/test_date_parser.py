@@ -0,0 +1,70 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from date_parser import parse_date_column
+
+def parse(values):
+    parsed, counts = parse_date_column(pd.Series(values, dtype=object))
+    dates = [None if pd.isna(value) else value.date() for value in parsed]
+    return dates, counts
+
+@pytest.mark.parametrize("text, label", [
+    ("15/08/1990", '%d/%m/%Y'),
+    ("5/8/1990", '%d/%m/%Y'),
+    ("15.08.1990", '%d.%m.%Y'),
+    ("15-08-1990", '%d-%m-%Y'),
+    ("1990-08-15", '%Y-%m-%d'),
+    ("1990-08-15 00:00:00", 'datetime'),
+    ("33100", 'excel_serial'),
+    ("33100.0", 'excel_serial'),
+])
+def test_each_text_format(text, label):
+    dates, counts = parse([text])
+    expected = datetime.date(1990, 8, 5) if text == "5/8/1990" else datetime.date(1990, 8, 15)
+    assert dates == [expected]
+    assert counts == {label: 1, 'missing': 0, 'invalid': 0}
+
+def test_ambiguous_dates_are_day_first():
+    dates, counts = parse(["03/04/2020", "03.04.2020", "03-04-2020", "12/01/2020"])
+    assert dates == [datetime.date(2020, 4, 3)] * 3 + [datetime.date(2020, 1, 12)]
+    assert counts['invalid'] == 0
+
+def test_month_first_and_impossible_dates_are_invalid():
+    dates, counts = parse(["04/13/2020", "31.02.2021", "2021-02-29", "29/02/2020"])
+    assert dates == [None, None, None, datetime.date(2020, 2, 29)]
+    assert counts == {'%d/%m/%Y': 1, '%d.%m.%Y': 0, '%Y-%m-%d': 0, 'missing': 0, 'invalid': 3}
+
+def test_blank_and_unrecognised_cells():
+    dates, counts = parse([None, np.nan, "", "   ", "n/a", "15 Aug 1990", " 15/08/1990 "])
+    assert dates == [None] * 6 + [datetime.date(1990, 8, 15)]
+    assert counts == {'%d/%m/%Y': 1, 'missing': 4, 'invalid': 2}
+
+def test_dates_out_of_range_are_invalid():
+    # Typos such as a year of 1190 do not fit datetime64[ns]
+    dates, counts = parse(["02.08.1190", "01.01.9999", "2958465", "01.01.2000"])
+    assert dates == [None, None, None, datetime.date(2000, 1, 1)]
+    assert counts == {'%d.%m.%Y': 1, 'excel_serial': 0, 'missing': 0, 'invalid': 3}
+
+def test_counts_cover_every_cell():
+    values = ["15/08/1990", "15.08.1990", "1990-08-15", "33100", None, "bad", "16/08/1990"]
+    _, counts = parse(values)
+    assert counts == {'%d/%m/%Y': 2, '%d.%m.%Y': 1, '%Y-%m-%d': 1, 'excel_serial': 1,
+                      'missing': 1, 'invalid': 1}
+    assert sum(counts.values()) == len(values)
+
+def test_excel_serial_numbers():
+    parsed, counts = parse_date_column(pd.Series([33100.0, 1.0, np.nan, 0.0, -5.0]))
+    assert parsed.dtype == 'datetime64[ns]'
+    assert parsed.iloc[0] == pd.Timestamp("1990-08-15")
+    assert parsed.iloc[1] == pd.Timestamp("1899-12-31")
+    assert counts == {'excel_serial': 2, 'missing': 1, 'invalid': 2}
+
+def test_native_datetimes():
+    values = pd.Series([pd.Timestamp("1990-08-15"), pd.NaT], dtype="datetime64[s]")
+    parsed, counts = parse_date_column(values)
+    assert parsed.dtype == 'datetime64[ns]'
+    assert parsed.iloc[0] == pd.Timestamp("1990-08-15")
+    assert counts == {'datetime': 1, 'missing': 1, 'invalid': 0}
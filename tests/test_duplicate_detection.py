@@ -0,0 +1,42 @@
+import pandas as pd
+
+from duplicate_detection import DuplicateIndex, collapse_duplicates
+from passport_service import normalize_phone_column
+
+def passport_frame(rows):
+    df = pd.DataFrame(rows, columns=["Name", "DOB", "Phone", "Passport"])
+    df["DOB"] = pd.to_datetime(df["DOB"])
+    return pd.concat([df, normalize_phone_column(df["Phone"])], axis=1)
+
+def test_same_customer_entered_twice_is_merged():
+    df = passport_frame([
+        ("Mustafa Chhatriwala", "1980-05-01", "9876500001", "A1000001"),
+        ("Mr. Mustufa Chatriwalla", "1980-05-01", "9876500001", None),
+    ])
+    clusters = DuplicateIndex(df).clusters()
+    assert clusters["Cluster"].tolist() == [0, 0]
+
+def test_different_passports_are_never_merged():
+    # Twins sharing a date of birth, a parent's phone and a similar name
+    df = passport_frame([
+        ("Riya Shah", "2010-03-15", "9876500001", "A1000001"),
+        ("Rhea Shah", "2010-03-15", "9876500001", "A1000002"),
+    ])
+    index = DuplicateIndex(df)
+    assert index.scores.tolist() == [0.0]
+    assert index.clusters().empty
+
+    selected, dropped = collapse_duplicates(df, index.clusters())
+    assert dropped == 0
+    assert len(selected) == 2
+
+def test_rows_without_passport_do_not_bridge_different_passports():
+    df = passport_frame([
+        ("Riya Shah", "2010-03-15", "9876500001", "A1000001"),
+        ("Riya Shah", "2010-03-15", "9876500001", None),
+        ("Riya Shah", "2010-03-15", "9876500001", "A1000002"),
+    ])
+    clusters = DuplicateIndex(df).clusters()
+    # The record without a passport joins one of the two, never both
+    assert len(clusters) == 2
+    assert clusters["Cluster"].nunique() == 1
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from message_templates import CompiledTemplate, DEFAULT_TEMPLATES, generate_message
+
+TEMPLATE = ("Hello {name}, passport {passport} expires {expiry} in {days_left:03d} days. "
+            "Phone {phone}, score {score}, {name!r}, {expiry.year}")
+
+def recipients():
+    return pd.DataFrame({
+        'name': pd.Series(["Asha Shah", "Ravi Jain", None], dtype="str"),
+        'passport': pd.Series([1234567, pd.NA, 7654321], dtype="Int64"),
+        'expiry': pd.to_datetime(["2030-01-01", "2027-06-30", None]),
+        'days_left': pd.Series([5, 120, 7], dtype="Int64"),
+        'phone': [9876543210.0, np.nan, 9876543212.0],
+        'score': pd.Series([0.1 + 0.2, 1.5, 2.0], dtype=object),
+    })
+
+@pytest.mark.parametrize("template", [TEMPLATE] + list(DEFAULT_TEMPLATES.values()))
+def test_batch_matches_single_rendering(template):
+    df = recipients()
+    if "expiry.year" not in template:
+        df['expiry'] = df['expiry'].dt.strftime("%d-%m-%Y")
+    compiled = CompiledTemplate(template)
+
+    messages, missing = compiled.render_batch(df)
+    singles = [compiled.render(record) for record in df.to_dict('records')]
+    assert messages.tolist() == singles
+    # Ravi has no passport and phone, the last recipient no name and expiry
+    assert missing.tolist() == [False, True, True]
+
+def test_single_rendering_formats_like_str_format():
+    record = recipients().to_dict('records')[0]
+    assert CompiledTemplate(TEMPLATE).render(record) == TEMPLATE.format(**record)
+
+def test_missing_values_keep_their_placeholder():
+    record = recipients().to_dict('records')[1]
+    message = CompiledTemplate(TEMPLATE).render(record)
+    assert "passport {passport} " in message
+    assert "Phone {phone}," in message
+    assert "<NA>" not in message and "nan" not in message
+
+def test_missing_key_is_reported():
+    assert generate_message("Hello {name} {city}", {'name': "Asha"}) == \
+        "Error generating message: Missing 'city' data"
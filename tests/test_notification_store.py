@@ -0,0 +1,25 @@
+from notification_store import NotificationStore
+
+def test_records_are_visible_to_other_connections_at_once(tmp_path):
+    path = str(tmp_path / "notifications.db")
+    writer = NotificationStore(path)
+    reader = NotificationStore(path)
+
+    writer.add_notification("Asha Shah", "+919876500001", "Birthday", "Sent")
+    assert reader.count_notifications() == 1
+
+    writer.add_message("+919876500001", "Happy birthday!")
+    assert reader._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 1
+
+def test_add_notifications_writes_all_records(tmp_path):
+    store = NotificationStore(str(tmp_path / "notifications.db"))
+    store.add_notifications([
+        {'name': "Asha Shah", 'phone': "+911", 'type': "Bulk", 'status': "Link Generated",
+         'date': "2026-01-02 10:00:00"},
+        {'name': "Ravi Jain", 'phone': "+912", 'type': "Bulk", 'status': "Error: bad phone"},
+    ])
+    store.add_notifications([])
+
+    assert store.count_notifications() == 2
+    assert store.status_counts() == {"Link Generated": 1, "Error: bad phone": 1}
+    assert store.query_notifications()["name"].tolist()[-1] == "Asha Shah"
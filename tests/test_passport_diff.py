@@ -0,0 +1,120 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from compact_layout import compact_passport_frame, date_column, expand_passport_frame, is_compact
+from passport_diff import diff_passport_frames, apply_passport_diff
+from passport_index import (BirthdayIndex, ExpiryIndex, build_indexes, get_birthday_index,
+                            get_expiry_index, _INDEXES)
+from passport_service import normalize_phone_column
+
+def passport_frame(rows):
+    df = pd.DataFrame(rows, columns=["Name", "DOB", "Phone", "Gmail", "Passport", "Expiry"])
+    df["DOB"] = pd.to_datetime(df["DOB"])
+    df["Expiry"] = pd.to_datetime(df["Expiry"])
+    return df
+
+OLD_ROWS = [
+    ("Asha Shah", "1980-02-29", "9876500001", None, "A1000001", "2027-01-10"),
+    ("Ravi Jain", "1975-02-28", "9876500002", None, "A1000002", "2027-01-10"),
+    ("Meera Iyer", "1990-03-01", "9876500003", None, "A1000003", None),
+    ("Kiran Patel", None, "9876500004", None, "A1000004", "2026-12-01"),
+    ("Anand Desai", "1968-12-31", "9876500005", None, None, None),
+    ("Sneha Lad", "2000-02-29", "9876500006", None, "A1000006", "2028-02-29"),
+    ("Rohan Gada", "1985-07-15", "9876500007", None, "A1000007", "2026-12-01"),
+    ("Priya Nagda", "1992-01-01", "9876500008", None, "A1000008", "2030-05-05"),
+]
+
+NEW_ROWS = [
+    # Unchanged
+    ("Asha Shah", "1980-02-29", "9876500001", None, "A1000001", "2027-01-10"),
+    # Changed: birthday moved onto Feb 29, expiry now missing
+    ("Ravi Jain", "1976-02-29", "9876500002", None, "A1000002", None),
+    # Changed: DOB now missing, expiry added with a tie
+    ("Meera Iyer", None, "9876500003", None, "A1000003", "2026-12-01"),
+    # Kiran Patel removed
+    # Unchanged, no passport
+    ("Anand Desai", "1968-12-31", "9876500005", None, None, None),
+    # Sneha Lad removed
+    # Changed: phone only, dates kept
+    ("Rohan Gada", "1985-07-15", "9876500077", None, "A1000007", "2026-12-01"),
+    ("Priya Nagda", "1992-01-01", "9876500008", None, "A1000008", "2030-05-05"),
+    # Added
+    ("Zoe Muller", "1996-02-29", "9876500009", None, "A1000009", "2027-01-10"),
+    ("Nitul Agal", None, "9876500010", None, "A1000010", None),
+    ("Girish Thakkar", "1970-02-28", "9876500011", None, "A1000011", "2025-06-30"),
+]
+
+def expiry_entries(index):
+    """Expiry index entries ordered by (date, row), ties may come in any order"""
+    order = np.lexsort((index.positions, index.values))
+    return index.values[order], index.positions[order]
+
+@pytest.fixture
+def patched():
+    old_df = passport_frame(OLD_ROWS)
+    new_df = passport_frame(NEW_ROWS)
+    build_indexes(old_df)
+
+    diff = diff_passport_frames(old_df, new_df)
+    assert diff.summary() == {'added': 3, 'changed': 3, 'removed': 2, 'unchanged': 3}
+    result = apply_passport_diff(old_df, new_df, diff)
+    # Carried over by patching, not built on first use
+    assert {'birthday', 'expiry'} <= set(_INDEXES[id(result)])
+    return result
+
+def test_patched_birthday_index_matches_rebuilt(patched):
+    index = get_birthday_index(patched)
+    rebuilt = BirthdayIndex(patched["DOB"])
+
+    np.testing.assert_array_equal(index.positions, rebuilt.positions)
+    np.testing.assert_array_equal(index.offsets, rebuilt.offsets)
+    # Asha, Ravi and Zoe were born on Feb 29
+    assert sorted(patched["Name"].iloc[index.lookup(2, 29)]) == \
+        ["Asha Shah", "Ravi Jain", "Zoe Muller"]
+    # In a non-leap year they are celebrated on Feb 28
+    assert sorted(patched["Name"].iloc[index.lookup(2, 28, year=2027)]) == \
+        ["Asha Shah", "Girish Thakkar", "Ravi Jain", "Zoe Muller"]
+    assert len(index.positions) == patched["DOB"].notna().sum()
+
+def test_patched_expiry_index_matches_rebuilt(patched):
+    index = get_expiry_index(patched)
+    rebuilt = ExpiryIndex(patched["Expiry"])
+
+    for actual, expected in zip(expiry_entries(index), expiry_entries(rebuilt)):
+        np.testing.assert_array_equal(actual, expected)
+    assert np.all(np.diff(index.values.astype(np.int64)) >= 0)
+    assert len(index.positions) == patched["Expiry"].notna().sum()
+
+    start, end = pd.Timestamp("2026-11-01"), pd.Timestamp("2027-01-10")
+    assert sorted(index.between(start, end)) == sorted(rebuilt.between(start, end))
+
+def test_patched_frame_keeps_old_order_then_added_rows(patched):
+    assert patched["Name"].tolist() == [
+        "Asha Shah", "Ravi Jain", "Meera Iyer", "Anand Desai", "Rohan Gada", "Priya Nagda",
+        "Zoe Muller", "Nitul Agal", "Girish Thakkar",
+    ]
+    assert patched["DOB"].iloc[1] == pd.Timestamp(datetime.date(1976, 2, 29))
+
+def test_compact_frames_diff_like_regular_ones():
+    def compact_frame(rows):
+        df = passport_frame(rows)
+        df = pd.concat([df, normalize_phone_column(df["Phone"])], axis=1)
+        return compact_passport_frame(df)
+
+    old_df = compact_frame(OLD_ROWS)
+    new_df = compact_frame(NEW_ROWS)
+    build_indexes(old_df)
+
+    diff = diff_passport_frames(old_df, new_df)
+    assert diff.summary() == {'added': 3, 'changed': 3, 'removed': 2, 'unchanged': 3}
+    result = apply_passport_diff(old_df, new_df, diff)
+
+    assert is_compact(result)
+    index = get_birthday_index(result)
+    rebuilt = BirthdayIndex(date_column(result, "DOB"))
+    np.testing.assert_array_equal(index.positions, rebuilt.positions)
+    assert expand_passport_frame(result)["Name"].tolist()[-3:] == \
+        ["Zoe Muller", "Nitul Agal", "Girish Thakkar"]
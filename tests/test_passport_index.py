@@ -0,0 +1,35 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from passport_index import BirthdayIndex
+
+def birthday_index(dates):
+    return BirthdayIndex(pd.Series(pd.to_datetime(dates)))
+
+DOBS = ["1990-01-01", "1985-06-15", "2000-02-29", "1970-12-31", "1992-06-14",
+        "1980-03-01", "1975-02-28", "1999-06-15", None, "1960-09-30"]
+
+def test_lookup_range_of_a_year_starts_at_start_date():
+    index = birthday_index(DOBS)
+    start = datetime.date(2026, 6, 15)
+
+    full = index.lookup_range(start, datetime.date(2027, 6, 15))
+    dates = pd.to_datetime(pd.Series(DOBS)).iloc[full]
+    assert [(date.month, date.day) for date in dates] == [
+        (6, 15), (6, 15), (9, 30), (12, 31), (1, 1), (2, 28), (2, 29), (3, 1), (6, 14)]
+
+    # Same birthdays and order as the day-by-day path just under a year
+    np.testing.assert_array_equal(full, index.lookup_range(start, datetime.date(2027, 6, 14)))
+
+def test_lookup_range_of_a_year_from_jan_first_is_slot_order():
+    index = birthday_index(DOBS)
+    full = index.lookup_range(datetime.date(2027, 1, 1), datetime.date(2028, 1, 1))
+    np.testing.assert_array_equal(full, index.positions)
+
+def test_lookup_range_folds_feb_29_in_non_leap_years():
+    index = birthday_index(DOBS)
+    assert sorted(index.lookup_range(datetime.date(2027, 2, 27), datetime.date(2027, 2, 28))) == [2, 6]
+    assert sorted(index.lookup_range(datetime.date(2028, 2, 27), datetime.date(2028, 2, 28))) == [6]
+    assert len(index.lookup_range(datetime.date(2027, 3, 2), datetime.date(2027, 3, 1))) == 0
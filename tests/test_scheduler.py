@@ -0,0 +1,69 @@
+import time
+import asyncio
+
+from scheduler import JobStore, Scheduler, JOB_PENDING, JOB_SENT, JOB_UNKNOWN
+from senders import MockSender, LinkSender
+
+def test_recover_marks_interrupted_jobs_unknown(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    interrupted = store.schedule("+911", "Hello", time.time() - 1, key="a")
+    waiting = store.schedule("+912", "Hello", time.time() + 3600, key="b")
+    store.claim([interrupted])
+
+    assert store.recover() == 1
+    assert store.counts() == {JOB_UNKNOWN: 1, JOB_PENDING: 1}
+    assert [job[:2] for job in store.unknown()] == [(interrupted, "a")]
+    # Never handed out for sending again
+    assert store.claim([interrupted, waiting]) == [(waiting, "b", "+912", "Hello", None, "Scheduled")]
+
+def test_dispatch_records_sid_and_outcome(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    now = time.time()
+    for i in range(4):
+        store.schedule(f"+9198765{i:05d}", f"Hello {i}", now - 1, key=f"job-{i}")
+
+    sender = MockSender(fail_every=4, fail_status=500, pool_size=2)
+    scheduler = Scheduler(store, sender, concurrency=1)
+    try:
+        assert asyncio.run(scheduler.run_once(now)) == 4
+    finally:
+        asyncio.run(sender.close())
+
+    assert store.counts() == {JOB_SENT: 3, JOB_UNKNOWN: 1}
+    assert scheduler.stats == {'dispatched': 4, 'sent': 3, 'failed': 0, 'unknown': 1}
+    rows = store._conn.execute("SELECT status, sid FROM jobs ORDER BY id").fetchall()
+    assert [message['sid'] for message in sender.server.messages] == \
+        [sid for status, sid in rows if status == JOB_SENT]
+    assert all(sid is None for status, sid in rows if status != JOB_SENT)
+
+def test_link_sender_jobs_complete_without_sid(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.schedule("+911", "Hello", time.time() - 1)
+    scheduler = Scheduler(store, LinkSender())
+
+    asyncio.run(scheduler.run_once())
+    assert store.counts() == {JOB_SENT: 1}
+
+def test_jobs_scheduled_after_startup_are_dispatched(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    now = time.time()
+    for i in range(3):
+        store.schedule(f"+91{i}", "Early", now - 10, key=f"early-{i}")
+    scheduler = Scheduler(store, LinkSender(), lookahead=2)
+
+    # The last page is short, so the store looks exhausted
+    assert asyncio.run(scheduler.run_once(now)) == 3
+
+    # Later jobs are paged in, not all pushed to the heap at once
+    for i in range(5):
+        store.schedule(f"+92{i}", "Late", now + 60, key=f"late-{i}")
+    assert asyncio.run(scheduler.run_once(now)) == 0
+    assert len(scheduler._heap) <= 2
+
+    # A job due before the paging cursor is picked up as well
+    store.schedule("+930", "Urgent", now - 5, key="urgent")
+    assert asyncio.run(scheduler.run_once(now)) == 1
+
+    assert asyncio.run(scheduler.run_once(now + 120)) == 5
+    assert store.counts() == {JOB_SENT: 9}
+    assert scheduler.stats['sent'] == 9
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from search_index import SearchIndex
+from passport_service import normalize_phone_column
+
+def search_frame():
+    df = pd.DataFrame({
+        'Name': ["Asha Shah", "Ravi Jain", "Meera Iyer", "Kiran Patel", "Anand Desai"],
+        'Passport': ["A1234567", "Z7123400", None, "k9912345", "B7654321"],
+        'Phone': ["9876512345", "+91 91234 50000", "9000012399", None, "8123456789"],
+    })
+    return pd.concat([df, normalize_phone_column(df["Phone"])], axis=1)
+
+def names(df, positions):
+    return df["Name"].iloc[positions].tolist()
+
+def test_passport_matches_anywhere_prefix_first():
+    df = search_frame()
+    index = SearchIndex(df)
+
+    positions, total = index.search('passport', "1234")
+    assert names(df, positions) == ["Asha Shah", "Ravi Jain", "Kiran Patel"]
+    assert total == 3
+    # Starting with the query, then ending with it, then containing it
+    assert names(df, index.search('passport', "45")[0]) == ["Kiran Patel", "Asha Shah"]
+    assert names(df, index.search('passport', " k99 ")[0]) == ["Kiran Patel"]
+    assert names(df, index.search('passport', "7")[0]) == \
+        ["Asha Shah", "Ravi Jain", "Anand Desai"]
+    assert index.search('passport', "12345678")[1] == 0
+
+def test_phone_matches_anywhere_prefix_then_suffix():
+    df = search_frame()
+    index = SearchIndex(df)
+
+    assert names(df, index.search('phone', "12345")[0]) == \
+        ["Asha Shah", "Ravi Jain", "Anand Desai"]
+    assert names(df, index.search('phone', "912345")[0]) == ["Ravi Jain"]
+    assert names(df, index.search('phone', "23")[0]) == \
+        ["Asha Shah", "Ravi Jain", "Meera Iyer", "Anand Desai"]
+    assert index.search('phone', "77777")[1] == 0
+
+def test_limit_keeps_total():
+    index = SearchIndex(search_frame())
+    positions, total = index.search('phone', "9", limit=2)
+    assert len(positions) == 2
+    assert total == 4
+
+def test_empty_and_short_values():
+    df = search_frame()
+    df["Passport"] = ["A1", None, None, None, None]
+    index = SearchIndex(df)
+    assert names(df, index.search('passport', "a")[0]) == ["Asha Shah"]
+    assert index.search('passport', "A12")[1] == 0
+
+    df["Passport"] = None
+    assert SearchIndex(df).search('passport', "A1")[1] == 0
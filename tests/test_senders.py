@@ -0,0 +1,188 @@
+import time
+import asyncio
+import datetime
+
+import pytest
+
+from senders import (MockSender, Sender, TokenBucket, RetryableSendError, dispatch,
+                     dispatch_sync, parse_retry_after, STATUS_SENT, STATUS_FAILED,
+                     STATUS_UNKNOWN)
+
+def make_jobs(count):
+    return [(f"job-{i}", f"+9198765{i:05d}", f"Hello {i}") for i in range(count)]
+
+@pytest.fixture
+def mock_sender():
+    senders = []
+
+    def make(**options):
+        sender = MockSender(pool_size=4, **options)
+        senders.append(sender)
+        return sender
+
+    yield make
+    for sender in senders:
+        asyncio.run(sender.close())
+
+def test_dispatch_delivers_every_job_in_order(mock_sender):
+    sender = mock_sender()
+    results = dispatch_sync(make_jobs(20), sender, concurrency=4)
+
+    assert [result['key'] for result in results] == [f"job-{i}" for i in range(20)]
+    assert all(result['status'] == STATUS_SENT for result in results)
+    assert all(result['attempts'] == 1 for result in results)
+    assert len({result['sid'] for result in results}) == 20
+    assert sorted(message['to'] for message in sender.server.messages) == \
+        sorted(f"whatsapp:+9198765{i:05d}" for i in range(20))
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_refused_requests_are_retried(mock_sender, status):
+    sender = mock_sender(fail_every=2, fail_status=status, retry_after="0")
+    results = dispatch_sync(make_jobs(6), sender, concurrency=1, backoff=0.001)
+
+    assert all(result['status'] == STATUS_SENT for result in results)
+    assert sum(result['attempts'] for result in results) == sender.server.requests
+    assert sender.server.requests > 6
+    # Each message is delivered exactly once
+    assert len(sender.server.messages) == 6
+
+def test_retries_give_up_after_max_retries(mock_sender):
+    sender = mock_sender(fail_every=1, retry_after="0")
+    results = dispatch_sync(make_jobs(2), sender, concurrency=1, max_retries=2)
+
+    assert [result['status'] for result in results] == [STATUS_FAILED, STATUS_FAILED]
+    assert [result['attempts'] for result in results] == [3, 3]
+    assert results[0]['error'] == "HTTP 429"
+    assert sender.server.messages == []
+
+@pytest.mark.parametrize("status", [500, 502])
+def test_server_errors_are_not_retried(mock_sender, status):
+    sender = mock_sender(fail_every=1, fail_status=status)
+    results = dispatch_sync(make_jobs(3), sender, concurrency=1, backoff=0.001)
+
+    assert all(result['status'] == STATUS_UNKNOWN for result in results)
+    assert all(result['attempts'] == 1 for result in results)
+    assert sender.server.requests == 3
+
+def test_client_errors_fail_without_retry(mock_sender):
+    sender = mock_sender(fail_every=1, fail_status=400)
+    result, = dispatch_sync(make_jobs(1), sender)
+
+    assert result['status'] == STATUS_FAILED
+    assert result['error'].startswith("HTTP 400")
+    assert result['attempts'] == 1
+
+def test_post_reads_retry_after_seconds(mock_sender):
+    sender = mock_sender(fail_every=1, retry_after="7")
+    with pytest.raises(RetryableSendError) as error:
+        sender._post("+919876500000", "Hello", None)
+    assert error.value.retry_after == 7.0
+
+def test_post_reads_retry_after_http_date(mock_sender):
+    later = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=30)
+    sender = mock_sender(fail_every=1, retry_after=later.strftime("%a, %d %b %Y %H:%M:%S GMT"))
+    with pytest.raises(RetryableSendError) as error:
+        sender._post("+919876500000", "Hello", None)
+    assert 25 <= error.value.retry_after <= 30
+
+def test_post_ignores_unparsable_retry_after(mock_sender):
+    sender = mock_sender(fail_every=1, retry_after="soon")
+    with pytest.raises(RetryableSendError) as error:
+        sender._post("+919876500000", "Hello", None)
+    assert error.value.retry_after is None
+
+def test_parse_retry_after():
+    now = datetime.datetime(2015, 10, 21, 7, 27, 50, tzinfo=datetime.timezone.utc)
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("1.5") == 1.5
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now) == 10.0
+    # A date in the past means retry now
+    assert parse_retry_after("Wed, 21 Oct 2015 07:00:00 GMT", now) == 0.0
+    assert parse_retry_after("-5") == 0.0
+    for value in (None, "", "soon", "inf", "nan"):
+        assert parse_retry_after(value) is None
+
+def test_token_bucket_paces_acquisitions():
+    async def acquire_all(bucket, count):
+        start = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # The burst of capacity tokens is free, the others come at the rate
+    elapsed = asyncio.run(acquire_all(TokenBucket(rate=50, capacity=5), 15))
+    assert 0.18 <= elapsed < 1.0
+
+def test_dispatch_respects_rate_limit(mock_sender):
+    sender = mock_sender()
+    start = time.monotonic()
+    results = dispatch_sync(make_jobs(30), sender, concurrency=4, rate_limit=20)
+    elapsed = time.monotonic() - start
+
+    assert all(result['status'] == STATUS_SENT for result in results)
+    # A burst of 20 sends, then the other 10 at 20 per second
+    assert 0.4 <= elapsed < 2.0
+
+class FlakySender(Sender):
+    """
+    Sender failing in a different way for each phone number
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    async def send(self, phone_number, message, idempotency_key=None):
+        self.calls.append(idempotency_key)
+        if phone_number == "broken":
+            raise ValueError("bad number")
+        if phone_number == "busy":
+            raise RetryableSendError("busy", retry_after=0)
+        return {'status': STATUS_SENT, 'sid': f"SM-{idempotency_key}"}
+
+def test_worker_reports_errors_per_job():
+    sender = FlakySender()
+    jobs = [("a", "+1", "x"), ("b", "broken", "x"), ("c", "busy", "x"), ("d", "+2", "x")]
+    seen = []
+    results = dispatch_sync(jobs, sender, concurrency=2, max_retries=1, on_result=seen.append)
+
+    assert [result['key'] for result in results] == ["a", "b", "c", "d"]
+    assert [result['status'] for result in results] == \
+        [STATUS_SENT, STATUS_FAILED, STATUS_FAILED, STATUS_SENT]
+    assert results[1]['error'] == "bad number"
+    assert results[1]['attempts'] == 1
+    assert results[2]['error'] == "busy"
+    assert results[2]['attempts'] == 2
+    assert results[3]['sid'] == "SM-d"
+    assert sorted(result['key'] for result in seen) == ["a", "b", "c", "d"]
+    assert sender.calls.count("c") == 2
+
+def test_dispatch_without_jobs():
+    assert dispatch_sync([], FlakySender()) == []
+
+@pytest.mark.parametrize("retry_after, low, high", [(2.0, 2.0, 3.0), (None, 0.5, 1.5)])
+def test_retry_delay_honours_retry_after(monkeypatch, retry_after, low, high):
+    class BusySender(Sender):
+        async def send(self, phone_number, message, idempotency_key=None):
+            raise RetryableSendError("busy", retry_after=retry_after)
+
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    dispatch_sync(make_jobs(50), BusySender(), concurrency=1, max_retries=1, backoff=1.0)
+
+    assert len(delays) == 50
+    assert all(low <= delay <= high for delay in delays)
+
+def test_on_result_error_stops_dispatch():
+    def on_result(result):
+        raise RuntimeError("history store is down")
+
+    async def run():
+        return await asyncio.wait_for(
+            dispatch(make_jobs(50), FlakySender(), concurrency=2, on_result=on_result), 5)
+
+    with pytest.raises(RuntimeError, match="history store is down"):
+        asyncio.run(run())
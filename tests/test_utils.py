@@ -0,0 +1,9 @@
+from utils import format_phone_for_whatsapp
+
+def test_format_phone_for_whatsapp():
+    assert format_phone_for_whatsapp("98765 43210") == "+919876543210"
+    assert format_phone_for_whatsapp("+91-98765-43210") == "+919876543210"
+    # Any 10 digit number gets the country code, not only mobile prefixes
+    assert format_phone_for_whatsapp("22 2345 6789") == "+912223456789"
+    assert format_phone_for_whatsapp("6123456789") == "+916123456789"
+    assert format_phone_for_whatsapp("12345") == "12345"
@@ -1,13 +1,19 @@
 import time
 import datetime
 import json
+import hashlib
 import os
 import streamlit as st
 
-# Use session state instead of file for storing messages in demo mode
+from message_templates import generate_messages
+from notification_store import get_store, log_notification, log_notifications
+from senders import build_whatsapp_link
+from scheduler import get_job_store
+from instrumentation import stage, timed
+
 def save_message_log(phone_number, message, message_type="Direct"):
     """
-    Save message to session state for demo/testing purposes
+    Save message to the persistent notification store
     
     Args:
         phone_number (str): Phone number message was sent to
@@ -17,32 +23,14 @@ def save_message_log(phone_number, message, message_type="Direct"):
     Returns:
         bool: True if saved successfully, False otherwise
     """
-    print(f"DEBUG: Saving message to session state")
-    print(f"DEBUG: Phone: {phone_number}, Message type: {message_type}")
-    
     try:
-        # Create message data
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        message_data = {
-            "timestamp": timestamp,
-            "phone": phone_number,
-            "message": message,
-            "type": message_type
-        }
-        
-        # Add to session state
-        if 'sent_messages' not in st.session_state:
-            st.session_state.sent_messages = []
-            
-        st.session_state.sent_messages.append(message_data)
-        print(f"DEBUG: Added message to session state, now have {len(st.session_state.sent_messages)} messages")
-        
+        get_store().add_message(phone_number, message, message_type)
         return True
     except Exception as e:
-        print(f"Error saving message to session state: {e}")
+        print(f"Error saving message log: {e}")
         return False
 
+@timed("send.whatsapp", rows=None)
 def send_whatsapp_message(phone_number, message, wait_time=2, tab_close=True, close_time=1):
     """
     Send a WhatsApp message by redirecting to WhatsApp web
@@ -57,33 +45,20 @@ def send_whatsapp_message(phone_number, message, wait_time=2, tab_close=True, cl
     Returns:
         bool: True if message was sent successfully, False otherwise
     """
-    print(f"DEBUG: Preparing WhatsApp message to: {phone_number}")
-    print(f"DEBUG: Message length: {len(message)} characters")
-    
     try:
         # Clean the phone number (remove any '+' sign at the beginning)
         if phone_number.startswith('+'):
             phone_number = phone_number[1:]
             
-        # URL encode the message
-        import urllib.parse
-        encoded_message = urllib.parse.quote(message)
-        
         # Create WhatsApp web link
-        whatsapp_link = f"https://wa.me/{phone_number}?text={encoded_message}"
+        whatsapp_link = build_whatsapp_link(phone_number, message)
         
         # Save message to session state for record-keeping
         log_saved = save_message_log(phone_number, message)
         
         # Create a display message in the notification history
-        if 'notification_history' in st.session_state:
-            st.session_state.notification_history.append({
-                'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'name': "Recipient",  # Name would need to be passed separately
-                'phone': phone_number,
-                'type': 'WhatsApp',
-                'status': 'Redirected'
-            })
+        # (name would need to be passed separately)
+        log_notification("Recipient", phone_number, 'WhatsApp', 'Redirected')
         
         # Open WhatsApp web in a new tab
         st.markdown(f"<a href='{whatsapp_link}' target='_blank'>Click here if you aren't automatically redirected to WhatsApp</a>", unsafe_allow_html=True)
@@ -100,26 +75,21 @@ def send_whatsapp_message(phone_number, message, wait_time=2, tab_close=True, cl
         print(f"Error preparing WhatsApp message: {e}")
         
         # Log the error in notification history
-        if 'notification_history' in st.session_state:
-            st.session_state.notification_history.append({
-                'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'name': "Unknown",
-                'phone': phone_number,
-                'type': 'WhatsApp',
-                'status': f'Failed: {str(e)}'
-            })
+        log_notification("Unknown", phone_number, 'WhatsApp', f'Failed: {str(e)}')
             
         return False
 
-def schedule_whatsapp_message(phone_number, message, hour, minute):
+def schedule_whatsapp_message(phone_number, message, hour, minute, name="Scheduled"):
     """
-    Schedule a WhatsApp message by creating a reminder
+    Schedule a WhatsApp message in the job store, where the scheduler
+    daemon (python -m passport_runner scheduler) picks it up when it is due
     
     Args:
         phone_number (str): Phone number to send message to (with country code)
         message (str): Message to send
         hour (int): Hour to send message (24-hour format)
         minute (int): Minute to send message
+        name (str): Recipient name for the notification history
         
     Returns:
         bool: True if message was scheduled successfully, False otherwise
@@ -127,7 +97,7 @@ def schedule_whatsapp_message(phone_number, message, hour, minute):
     try:
         # Calculate scheduled time
         now = datetime.datetime.now()
-        schedule_time = now.replace(hour=hour, minute=minute)
+        schedule_time = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
         
         # If the time is in the past, schedule for tomorrow
         if schedule_time < now:
@@ -140,31 +110,28 @@ def schedule_whatsapp_message(phone_number, message, hour, minute):
         if phone_number.startswith('+'):
             phone_number = phone_number[1:]
             
-        # URL encode the message
-        import urllib.parse
-        encoded_message = urllib.parse.quote(message)
-        
-        # Create WhatsApp web link
-        whatsapp_link = f"https://wa.me/{phone_number}?text={encoded_message}"
-        
-        # Save to session state with scheduled note
+        # Create WhatsApp web link as a manual fallback
+        whatsapp_link = build_whatsapp_link(phone_number, message)
+        
+        # Persist the job, the key makes a repeated click schedule it only once
+        digest = hashlib.sha1(message.encode("utf-8")).hexdigest()[:16]
+        key = f"scheduled:{phone_number}:{formatted_time}:{digest}"
+        job_id = get_job_store().schedule(f"+{phone_number}", message, schedule_time,
+                                          key=key, name=name)
+        if job_id is None:
+            st.info(f"This message is already scheduled for {formatted_time}")
+            return True
+        
+        # Save to the message log with scheduled note
         scheduled_message = f"[SCHEDULED FOR {formatted_time}] {message}"
         save_message_log(phone_number, scheduled_message, "Scheduled")
         
         # Add to notification history
-        if 'notification_history' in st.session_state:
-            st.session_state.notification_history.append({
-                'date': formatted_time,
-                'name': "Scheduled",
-                'phone': phone_number,
-                'type': 'Scheduled',
-                'status': 'Pending'
-            })
+        log_notification(name, phone_number, 'Scheduled', 'Pending', date=formatted_time)
         
-        # Create a reminder message
         st.success(f"Message scheduled for {formatted_time}")
-        st.info(f"Please remember to send this message at the scheduled time by clicking the link below.")
-        st.markdown(f"<a href='{whatsapp_link}' target='_blank'>Send WhatsApp message at {formatted_time}</a>", unsafe_allow_html=True)
+        st.info("The scheduler service sends it at that time. You can also send it now with the link below.")
+        st.markdown(f"<a href='{whatsapp_link}' target='_blank'>Send WhatsApp message now</a>", unsafe_allow_html=True)
         
         return True
     
@@ -172,17 +139,11 @@ def schedule_whatsapp_message(phone_number, message, hour, minute):
         print(f"Error scheduling WhatsApp message: {e}")
         
         # Log the error
-        if 'notification_history' in st.session_state:
-            st.session_state.notification_history.append({
-                'date': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'name': "Unknown",
-                'phone': phone_number,
-                'type': 'Scheduled',
-                'status': f'Failed: {str(e)}'
-            })
+        log_notification("Unknown", phone_number, 'Scheduled', f'Failed: {str(e)}')
             
         return False
 
+@timed("send.bulk", rows=lambda result: result[0] + result[1])
 def send_bulk_messages(recipients_data, message_template):
     """
     Create WhatsApp web links for bulk messaging
@@ -194,8 +155,6 @@ def send_bulk_messages(recipients_data, message_template):
     Returns:
         tuple: (successful_count, failed_count, results)
     """
-    import urllib.parse
-    
     successful_count = 0
     failed_count = 0
     results = []
@@ -205,19 +164,16 @@ def send_bulk_messages(recipients_data, message_template):
     
     # Create a container for links
     link_container = st.container()
+
+    # Render all messages in one batch, placeholders without data are kept
+    with stage("render.bulk_messages", rows=len(recipients_data)):
+        messages, missing = generate_messages(message_template, recipients_data)
+    if missing.any():
+        st.warning(f"Missing data for template in {int(missing.sum())} messages. Using partial template.")
     
     for i, recipient in enumerate(recipients_data):
         try:
-            # Format message with recipient data
-            try:
-                message = message_template.format(**recipient)
-            except KeyError as e:
-                st.warning(f"Missing data for template: {e}. Using partial template.")
-                # Try with a simpler approach
-                message = message_template
-                for key, value in recipient.items():
-                    if isinstance(value, str):
-                        message = message.replace(f"{{{key}}}", value)
+            message = messages[i]
             
             # Get phone number
             phone = recipient.get('phone', '')
@@ -227,8 +183,7 @@ def send_bulk_messages(recipients_data, message_template):
             name = recipient.get('name', 'Unknown')
             
             # Create WhatsApp web link
-            encoded_message = urllib.parse.quote(message)
-            whatsapp_link = f"https://wa.me/{phone}?text={encoded_message}"
+            whatsapp_link = build_whatsapp_link(phone, message)
             
             # Display link in the container
             with link_container:
@@ -259,10 +214,8 @@ def send_bulk_messages(recipients_data, message_template):
                 'status': f"Error: {str(e)}"
             })
     
-    # Add to notification history
-    if 'notification_history' in st.session_state:
-        for result in results:
-            st.session_state.notification_history.append(result)
+    # Add to notification history in one write
+    log_notifications(results)
     
     st.success(f"Generated {successful_count} message links successfully. {failed_count} failed.")
     